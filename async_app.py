@@ -0,0 +1,74 @@
+"""
+Asyncio variant of app.py: the same listeners (handlers.py) on AsyncApp, so
+acks and views_open calls don't hold a worker thread while they wait on the
+network. Home tab publishes, DMs and user lookups go through the same
+outbound queues as in threaded mode. Run with APP_MODE=async python app.py,
+or python async_app.py.
+
+Listeners aren't profiled here (PROFILE_DIR still covers the outbound
+workers' home tab refreshes): profiles are thread stack samples, and every
+listener shares the event loop's thread.
+"""
+
+import asyncio
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+import logs
+from config import (
+    LOG_DEBUG_SAMPLE_EVERY,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_LEVELS,
+    LOG_MAX_LENGTH,
+    SLACK_API_URL,
+    SLACK_APP_TOKEN,
+    SLACK_BOT_TOKEN
+)
+from handlers import LISTENERS, api_scheduler, report_busy, start_services
+from instrumentation import timed_listener, use_async_timed_ack
+from scheduler import SlackBusy
+
+# Initialize your app with your bot token, its client pointed at SLACK_API_URL
+# as in app.py (AsyncApp checks the token on the first request anyway)
+app = AsyncApp(token=SLACK_BOT_TOKEN)
+app.client.base_url = SLACK_API_URL
+
+# Time each request's ack() for the listener metrics
+app.middleware(use_async_timed_ack)
+
+# Route each listener's client through the same scheduler as the outbound workers
+@app.middleware
+async def schedule_slack_calls(context, next):
+    context["client"] = api_scheduler.wrap_async(context.client)
+    await next()
+
+# Run a shared handler as an AsyncApp listener, as app.sync_listener does.
+# The handler and its then() are synchronous (store writes, which can wait
+# on SQLite's write lock, and enqueues), so they run on the loop's default
+# executor and only the ack and views_open are awaited on the loop.
+def async_listener(kind, handler):
+    async def listener(ack, body, client):
+        loop = asyncio.get_running_loop()
+        reply = await loop.run_in_executor(None, handler, body)
+        if kind != "event":
+            await ack(**reply.ack)
+        view = await loop.run_in_executor(None, reply.then) if reply.then is not None else None
+        if view is not None:
+            try:
+                await client.views_open(trigger_id=body["trigger_id"], view=view)
+            except SlackBusy as e:
+                report_busy(body["user"]["id"], e)
+    listener.__name__ = listener.__qualname__ = handler.__name__
+    return listener
+
+for kind, matcher, name, handler in LISTENERS:
+    getattr(app, kind)(matcher)(timed_listener(name)(async_listener(kind, handler)))
+
+async def main():
+    await AsyncSocketModeHandler(app, SLACK_APP_TOKEN).start_async()
+
+# Start the app
+if __name__ == "__main__":
+    logs.configure(LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_DEBUG_SAMPLE_EVERY, LOG_MAX_LENGTH)
+    start_services()
+    asyncio.run(main())
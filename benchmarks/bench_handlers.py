@@ -0,0 +1,257 @@
+"""
+Listener benchmark: drives the real Bolt listeners with synthetic payloads
+against a RecordingWebClient (no network, --latency seconds per Slack call)
+as the number of approvals grows. For each store size it reports listener
+latency (dispatch until the listener returns) and throughput including the
+home publishes and DMs the listeners queue. --json writes the results for
+comparing releases. --logging measures the cost of logging: "off" keeps
+only warnings, "sync" writes every DEBUG line from the listener threads as
+the app used to, and "queue" uses the app's logging setup (LOG_* variables)
+at --log-level. Home publishes are debounced as in production unless
+--debounce-ms says otherwise (0 publishes every refresh as it's queued).
+
+    python benchmarks/bench_handlers.py --sizes 10,1000,100000,1000000 --json handlers.json
+    python benchmarks/bench_handlers.py --sizes 1000 --logging sync --log-file /tmp/sync.log
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_slack import RecordingWebClient
+
+TEAM = {"id": "T0BENCH", "domain": "bench"}
+USERS = [f"U{i:05d}" for i in range(200)]
+
+
+def block_action(user_id, action, trigger_id="0000.0000.bench"):
+    return {
+        "type": "block_actions",
+        "team": TEAM,
+        "user": {"id": user_id, "team_id": TEAM["id"]},
+        "api_app_id": "A0BENCH",
+        "token": "bench",
+        "trigger_id": trigger_id,
+        "container": {"type": "view", "view_id": "V0HOME"},
+        "view": {"id": "V0HOME", "type": "home", "team_id": TEAM["id"]},
+        "actions": [{"block_id": "bench", "action_ts": "1700000000.000100", **action}]
+    }
+
+
+def view_submission(user_id, callback_id, values):
+    return {
+        "type": "view_submission",
+        "team": TEAM,
+        "user": {"id": user_id, "team_id": TEAM["id"]},
+        "api_app_id": "A0BENCH",
+        "token": "bench",
+        "trigger_id": "0000.0000.bench",
+        "view": {
+            "id": "V0MODAL",
+            "type": "modal",
+            "team_id": TEAM["id"],
+            "callback_id": callback_id,
+            "private_metadata": "",
+            "state": {"values": values}
+        }
+    }
+
+
+def app_home_opened(user_id):
+    return {
+        "type": "event_callback",
+        "team_id": TEAM["id"],
+        "api_app_id": "A0BENCH",
+        "token": "bench",
+        "event": {"type": "app_home_opened", "user": user_id, "channel": "D0HOME", "tab": "home", "event_ts": "1700000000.000100"},
+        "event_id": "Ev0BENCH",
+        "event_time": 1700000000
+    }
+
+
+def expense_values(i):
+    user_id = USERS[i % len(USERS)]
+    return {
+        "title_input": {"title": {"value": f"Expenses #{i}"}},
+        "requestor_input": {"requestor": {"selected_user": user_id}},
+        "amount_input": {"amount": {"value": "AUD $1,000"}},
+        "total_input": {"total": {"value": "AUD $1,000"}},
+        "date_input": {"date": {"selected_date": "2024-05-27"}},
+        "employee_input": {"employee": {"selected_user": user_id}}
+    }
+
+
+# Payload factories, each taking (event number, a random existing approval ID)
+SCENARIOS = {
+    "app_home_opened": lambda i, approval_id: app_home_opened(USERS[i % len(USERS)]),
+    "approve": lambda i, approval_id: block_action(
+        USERS[i % len(USERS)], {"type": "button", "action_id": "approve", "value": approval_id}
+    ),
+    "reject_submission": lambda i, approval_id: view_submission(
+        USERS[i % len(USERS)], f"reject_modal-{approval_id}", {"comments_input": {"comments": {"value": "Missing receipt"}}}
+    ),
+    "view_details": lambda i, approval_id: block_action(
+        USERS[i % len(USERS)], {"type": "button", "action_id": "view_details", "value": approval_id}
+    ),
+    "home_next_page": lambda i, approval_id: block_action(
+        USERS[i % len(USERS)], {"type": "button", "action_id": "home_next_page", "value": f"all|{approval_id}"}
+    ),
+    "new_expense_submission": lambda i, approval_id: view_submission(
+        USERS[i % len(USERS)], "new_expense_approval_modal", expense_values(i)
+    ),
+    "edit_submission": lambda i, approval_id: view_submission(
+        USERS[i % len(USERS)], f"edit_approval_modal-{approval_id}", expense_values(i)
+    )
+}
+
+
+# Add approvals until the store holds `count`; returns every seeded ID
+def seed(ids, count):
+    from state import generate_approval_id, store
+    with store.transaction():
+        for i in range(len(ids), count):
+            user_id = USERS[i % len(USERS)]
+            approval = store.create({
+                "id": generate_approval_id(),
+                "title": f"Expenses #{i}",
+                "requestor": user_id,
+                "amount_minor": 100000,
+                "total_minor": 100000,
+                "currency": "AUD",
+                "date": "2024-05-27",
+                "employee": USERS[(i + 1) % len(USERS)],
+                "status": "pending",
+                "file_url": "",
+                "custom_file_name": "",
+                "image_url": "",
+                "home_ts": "",
+                "type": "expense"
+            })
+            ids.append(approval["id"])
+    return ids
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+# Wait for the debouncer and both outbound queues to finish what listeners queued
+def drain():
+    import handlers
+    while handlers.home_refresh_debouncer.pending():
+        time.sleep(0.005)
+    handlers.outbound_queue.drain(timeout=600)
+    handlers.fanout_queue.drain(timeout=600)
+
+
+def run_scenario(name, ids, events, concurrency, rng):
+    from slack_bolt.request import BoltRequest
+    import app
+
+    payloads = [SCENARIOS[name](i, rng.choice(ids)) for i in range(events)]
+    RecordingWebClient.reset()
+
+    def dispatch(payload):
+        started = time.perf_counter()
+        app.app.dispatch(BoltRequest(body=payload, mode="socket_mode"))
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(dispatch, payloads))
+    drain()
+    elapsed = time.perf_counter() - started
+    return {
+        "scenario": name,
+        "events": events,
+        "elapsed_s": round(elapsed, 4),
+        "events_per_sec": round(events / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "slack_calls": dict(RecordingWebClient.calls)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,100000,1000000", help="Comma-separated approval counts")
+    parser.add_argument("--events", type=int, default=1000, help="Events dispatched per scenario and size")
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected Slack API latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=10, help="Dispatch threads, as Socket Mode would use")
+    parser.add_argument("--debounce-ms", type=int, help="HOME_PUBLISH_DEBOUNCE_MS to run with (default: as configured)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--logging", choices=("off", "sync", "queue"), default="off", help="Logging setup to measure")
+    parser.add_argument("--log-level", default="DEBUG", help="Root level for --logging queue")
+    parser.add_argument("--log-file", default=os.devnull, help="Where --logging sync or queue writes")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+    os.environ.setdefault("SLACK_APP_TOKEN", "xapp-bench")
+    if args.debounce_ms is not None:
+        os.environ["HOME_PUBLISH_DEBOUNCE_MS"] = str(args.debounce_ms)
+    # handlers.py builds the bot's WebClient at import and Bolt builds one per request; make both recording ones
+    import slack_sdk
+    import slack_bolt.app.app
+    RecordingWebClient.latency = args.latency
+    slack_sdk.WebClient = slack_bolt.app.app.WebClient = RecordingWebClient
+    import config
+    import logs
+    log_file = open(args.log_file, "a")
+    if args.logging == "sync":
+        logging.basicConfig(level=logging.DEBUG, stream=log_file, force=True)
+    elif args.logging == "queue":
+        logs.configure(args.log_level, config.LOG_LEVELS, config.LOG_FORMAT, config.LOG_DEBUG_SAMPLE_EVERY, config.LOG_MAX_LENGTH, log_file)
+    else:
+        logging.getLogger().setLevel(logging.WARNING)
+    import app
+    import handlers
+    # Return from dispatch when the listener does, not at ack(), so latency covers the listener body
+    app.app._listener_runner.process_before_response = True
+    # Slack's rate limits would dominate every number; this measures the app
+    handlers.api_scheduler.limits = dict.fromkeys(("views.publish", "views.open", "chat.postMessage", "users.info", "users.list"), 10 ** 9)
+
+    rng = random.Random(args.seed)
+    results = []
+    ids = []
+    for size in sorted(int(size) for size in args.sizes.split(",")):
+        started = time.perf_counter()
+        seed(ids, size)
+        print(f"{size:,} approvals (seeded in {time.perf_counter() - started:.1f}s)")
+        for name in args.scenarios.split(","):
+            result = {"approvals": size, **run_scenario(name, ids, args.events, args.concurrency, rng)}
+            results.append(result)
+            print(
+                f"  {name:>22}: {result['events_per_sec']:10.1f} events/sec"
+                f"  p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms"
+            )
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "events": args.events,
+                "latency": args.latency,
+                "concurrency": args.concurrency,
+                "debounce_ms": config.HOME_PUBLISH_DEBOUNCE_MS,
+                "logging": args.logging if args.logging != "queue" else f"queue {args.log_level}",
+                "store": type(handlers.store).__name__,
+                "results": results
+            }, output, indent=2)
+        print(f"wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+End-to-end load test. Starts the local Slack stand-in, runs app.py against
+it as a separate process (its SocketModeHandler connects to the stand-in
+unmodified), then fires a mix of app_home_opened, block_actions and
+view_submission envelopes at --rate events/sec for --duration seconds.
+Reports the ack rate and ack latency seen by the stand-in, and the Slack
+calls the app made, including the ones it was rate limited on.
+
+    python benchmarks/bench_load.py --rate 200 --duration 30 --latency 0.05
+    python benchmarks/bench_load.py --rate 50 --limits tier --error-rate 0.01
+    python benchmarks/bench_load.py --rate 400 --latency 0.05 --workers 4
+
+--workers runs that many worker processes (WORKERS) sharing a SQLite store
+in a temporary directory (--sqlite uses one for a single process too, to
+compare like with like); the stand-in spreads envelopes across their
+connections.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_handlers import SCENARIOS
+from fake_slack import TIER_LIMITS, FakeSlackServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The mock approval every app starts with
+APPROVAL_ID = "1"
+
+DEFAULT_MIX = "app_home_opened=3,approve=2,view_details=1,home_next_page=1,new_expense_submission=2,reject_submission=1"
+
+
+def envelope_type(scenario):
+    return "events_api" if scenario == "app_home_opened" else "interactive"
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def start_app(server, mode, log_path, workers=1, db_path=None):
+    env = {
+        **os.environ,
+        "SLACK_API_URL": server.base_url,
+        "SLACK_BOT_TOKEN": "xoxb-load",
+        "SLACK_APP_TOKEN": "xapp-load",
+        "APP_MODE": mode,
+        "WORKERS": str(workers)
+    }
+    if db_path:
+        env["APPROVALS_DB_PATH"] = db_path
+    log = open(log_path, "wb") if log_path else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, "app.py"], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+# Send envelopes on a fixed schedule; a late send goes out at once rather than shifting the rest
+def fire(server, weights, rate, duration, rng):
+    names, cumulative = list(weights), list(weights.values())
+    count = int(rate * duration)
+    sent = dict.fromkeys(names, 0)
+    started = time.perf_counter()
+    for i in range(count):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        name = rng.choices(names, cumulative)[0]
+        server.send_envelope(envelope_type(name), SCENARIOS[name](i, APPROVAL_ID))
+        sent[name] += 1
+    return sent, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=100, help="Events per second to send")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to send for")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, name=weight,...")
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected Slack API latency in seconds")
+    parser.add_argument("--limits", choices=("none", "tier"), default="none", help="Enforce Slack's per-method rate limits")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of Web API calls answered with a 429")
+    parser.add_argument("--mode", choices=("threaded", "async"), default="threaded", help="APP_MODE for the app")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes sharing a SQLite store")
+    parser.add_argument("--sqlite", action="store_true", help="Use a SQLite store even with one worker")
+    parser.add_argument("--settle", type=float, default=300, help="Longest to wait for the app's queued Slack calls to finish")
+    parser.add_argument("--app-log", help="Write the app's output to this file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    server = FakeSlackServer(
+        latency=args.latency,
+        rate_limits=TIER_LIMITS if args.limits == "tier" else None,
+        error_rate=args.error_rate,
+        seed=args.seed
+    ).start()
+    db_dir = tempfile.TemporaryDirectory() if args.workers > 1 or args.sqlite else None
+    app = start_app(server, args.mode, args.app_log, args.workers, db_dir and os.path.join(db_dir.name, "approvals.db"))
+    try:
+        if not server.wait_for_connections(args.workers, timeout=30):
+            raise SystemExit(f"The app did not open {args.workers} Socket Mode connection(s)")
+        server.reset()
+
+        started = time.monotonic()
+        sent, send_elapsed = fire(server, parse_mix(args.mix), args.rate, args.duration, random.Random(args.seed))
+        total = sum(sent.values())
+        all_acked = server.wait_for_acks(timeout=60)
+        latencies = list(server.ack_latencies)
+        # The app spaces its own calls out to fit Slack's limits, so these can trail the acks by a while
+        settled = server.wait_idle(quiet=2.0, timeout=args.settle)
+        result = {
+            "target_rate": args.rate,
+            "sent": sent,
+            "acked": len(latencies),
+            "unacked": server.unacked(),
+            "send_elapsed_s": round(send_elapsed, 3),
+            "acks_per_sec": round(len(latencies) / send_elapsed, 1),
+            "ack_p50_ms": round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+            "ack_p95_ms": round(percentile(latencies, 95) * 1000, 3) if latencies else None,
+            "ack_p99_ms": round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+            "slack_calls": dict(server.calls),
+            "slack_calls_done_s": round(server.last_call_at - started, 3) if settled and server.last_call_at else None,
+            "rate_limited": dict(server.rate_limited)
+        }
+    finally:
+        app.terminate()
+        app.wait(10)
+        server.stop()
+        if db_dir:
+            db_dir.cleanup()
+
+    print(f"sent {total} events in {result['send_elapsed_s']:.1f}s (target {args.rate:g}/sec): {sent}")
+    unacked = "" if all_acked else f" ({result['unacked']} unacked)"
+    print(
+        f"acked {result['acked']}{unacked} at {result['acks_per_sec']:.1f}/sec,"
+        f" ack p50 {result['ack_p50_ms']}ms p95 {result['ack_p95_ms']}ms p99 {result['ack_p99_ms']}ms"
+    )
+    done = f"done {result['slack_calls_done_s']}s after the first event" if settled else f"still running after {args.settle:g}s"
+    print(f"slack calls ({done}): {result['slack_calls']}")
+    if result["rate_limited"]:
+        print(f"rate limited (429): {result['rate_limited']}")
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"mode": args.mode, "workers": args.workers, "latency": args.latency, "limits": args.limits, "error_rate": args.error_rate, **result}, output, indent=2)
+        print(f"wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Modal build benchmark: how long each modal the app opens takes to build, to
+build and serialise, and optionally the whole views_open call against the
+local fake Slack API. Each is timed for the ViewTemplates in views.py and for
+the dict-literal builders they replaced (legacy_modals.py), which are checked
+to build the same views first.
+
+    python benchmarks/bench_modals.py --iterations 20000
+    python benchmarks/bench_modals.py --iterations 2000 --open
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EXPENSE = {
+    "id": "1",
+    "title": "May Expenses",
+    "requestor": "U02PGRD77E1",
+    "amount_minor": 100000,
+    "total_minor": 100000,
+    "currency": "AUD",
+    "date": "2024-05-27",
+    "employee": "U02PGRD77E1",
+    "status": "pending",
+    "file_url": "https://example.com/receipts.pdf",
+    "custom_file_name": "Receipts",
+    "image_url": "https://example.com/image.png",
+    "home_ts": "",
+    "type": "expense"
+}
+
+TIME_OFF = {
+    "id": "2",
+    "title": "Time Off Request",
+    "employee": "U02PGRD77E1",
+    "requestor": "U02PGRD77E1",
+    "request_date": "2024-05-20",
+    "time_requested": "2024-06-03 to 2024-06-07",
+    "request_type": "Vacation",
+    "summary": 5,
+    "notes": "Family trip",
+    "status": "pending",
+    "image_url": "",
+    "type": "time_off"
+}
+
+
+# Each modal's builder in `views`, views.py or legacy_modals.py
+def modal_builders(views):
+    return {
+        "reject": lambda: views.reject_modal("1", 3),
+        "bulk_reject": lambda: views.bulk_reject_modal(250),
+        "edit_expense": lambda: views.edit_approval_modal(EXPENSE),
+        "edit_time_off": lambda: views.edit_approval_modal(TIME_OFF),
+        "new_approval": views.new_approval_modal,
+        "new_expense": views.new_expense_approval_modal,
+        "new_time_off": views.new_time_off_approval_modal
+    }
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def summary(samples):
+    return (
+        f"mean {sum(samples) / len(samples) * 1e6:8.2f}us"
+        f"  p50 {percentile(samples, 50) * 1e6:8.2f}us  p99 {percentile(samples, 99) * 1e6:8.2f}us"
+    )
+
+
+def mean(samples):
+    return sum(samples) / len(samples)
+
+
+def bench_build(build, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        build()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+# Build and serialise a modal, as the SDK does before sending it
+def bench_serialize(build, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        json.dumps(build())
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_open(build, iterations, client):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        client.views_open(trigger_id="0000.0000.bench", view=build())
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--open", action="store_true", help="Time full views_open calls against the fake Slack API")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+    os.environ.setdefault("SLACK_APP_TOKEN", "xapp-bench")
+    server = client = None
+    if args.open:
+        from slack_sdk import WebClient
+        from fake_slack import FakeSlackServer
+        server = FakeSlackServer().start()
+        client = WebClient(token="xoxb-bench", base_url=server.base_url)
+
+    import legacy_modals
+    import views
+    legacy = modal_builders(legacy_modals)
+    try:
+        for name, build in modal_builders(views).items():
+            if build() != legacy[name]():
+                raise SystemExit(f"{name}: the legacy builder and the template build different views")
+            if args.open:
+                benches = [("views_open", lambda build: bench_open(build, args.iterations, client))]
+            else:
+                benches = [
+                    ("build", lambda build: bench_build(build, args.iterations)),
+                    ("build+json", lambda build: bench_serialize(build, args.iterations))
+                ]
+            for label, bench in benches:
+                before = bench(legacy[name])
+                after = bench(build)
+                print(f"{name:>14}  {label:<10}  legacy    {summary(before)}")
+                print(f"{'':>14}  {'':<10}  template  {summary(after)}  ({mean(before) / mean(after):.1f}x)")
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Threaded vs asyncio benchmark. Both apps handle the same burst of "approve"
+clicks against a local fake Slack API with injected latency. Each click
+triggers a views_publish and a chat_postMessage.
+
+    python benchmarks/bench_modes.py --events 500 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_slack import FakeSlackServer
+
+
+def approve_payload(approval_id, user_id):
+    return {
+        "type": "block_actions",
+        "team": {"id": "T0BENCH", "domain": "bench"},
+        "user": {"id": user_id, "team_id": "T0BENCH"},
+        "api_app_id": "A0BENCH",
+        "token": "bench",
+        "trigger_id": "0000.0000.bench",
+        "container": {"type": "view", "view_id": "V0HOME"},
+        "view": {"id": "V0HOME", "type": "home", "team_id": "T0BENCH"},
+        "actions": [
+            {"type": "button", "action_id": "approve", "block_id": "bench", "value": approval_id, "action_ts": "1700000000.000100"}
+        ]
+    }
+
+
+def seed_approvals(count):
+    from state import generate_approval_id, store
+    ids = []
+    for i in range(count):
+        approval = {
+            "id": generate_approval_id(),
+            "title": f"Expenses #{i}",
+            "requestor": f"U{i % 50:05d}",
+            "amount_minor": 100000,
+            "total_minor": 100000,
+            "currency": "AUD",
+            "date": "2024-05-27",
+            "employee": f"U{i % 50:05d}",
+            "status": "pending",
+            "file_url": "",
+            "custom_file_name": "",
+            "image_url": "",
+            "home_ts": "",
+            "type": "expense"
+        }
+        store.create(approval)
+        ids.append(approval["id"])
+    return ids
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def run_threaded(server, events, concurrency):
+    from slack_bolt.request import BoltRequest
+    from app import app
+
+    payloads = [approve_payload(approval_id, f"U{i % 20:05d}") for i, approval_id in enumerate(seed_approvals(events))]
+    server.reset()
+
+    def dispatch(payload):
+        started = time.perf_counter()
+        app.dispatch(BoltRequest(body=payload, mode="socket_mode"))
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    # Socket Mode hands each message to its own worker, like this pool
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        ack_latencies = list(pool.map(dispatch, payloads))
+    server.wait_for("chat.postMessage", events)
+    return time.perf_counter() - started, ack_latencies
+
+
+def run_async(server, events):
+    from slack_bolt.request.async_request import AsyncBoltRequest
+    from async_app import app
+
+    payloads = [approve_payload(approval_id, f"U{i % 20:05d}") for i, approval_id in enumerate(seed_approvals(events))]
+    server.reset()
+
+    async def dispatch(payload):
+        started = time.perf_counter()
+        await app.async_dispatch(AsyncBoltRequest(body=payload, mode="socket_mode"))
+        return time.perf_counter() - started
+
+    async def burst():
+        started = time.perf_counter()
+        ack_latencies = await asyncio.gather(*(dispatch(payload) for payload in payloads))
+        await asyncio.get_running_loop().run_in_executor(None, server.wait_for, "chat.postMessage", events)
+        return time.perf_counter() - started, ack_latencies
+
+    return asyncio.run(burst())
+
+
+def report(mode, events, elapsed, ack_latencies):
+    print(
+        f"{mode:>8}: {events / elapsed:8.1f} events/sec, all Slack calls done in {elapsed:6.2f}s,"
+        f" ack p50 {percentile(ack_latencies, 50) * 1000:7.1f}ms p99 {percentile(ack_latencies, 99) * 1000:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.1, help="Injected Slack API latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=10, help="Socket Mode dispatch threads in threaded mode")
+    parser.add_argument("--modes", default="threaded,async")
+    args = parser.parse_args()
+
+    server = FakeSlackServer(latency=args.latency).start()
+    os.environ["SLACK_API_URL"] = server.base_url
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-bench")
+    os.environ.setdefault("SLACK_APP_TOKEN", "xapp-bench")
+    import logs
+    # Log as the app does, but keep listener debug logging out of the measurement
+    logs.configure("WARNING")
+    try:
+        for mode in args.modes.split(","):
+            if mode == "threaded":
+                elapsed, ack_latencies = run_threaded(server, args.events, args.concurrency)
+            else:
+                elapsed, ack_latencies = run_async(server, args.events)
+            report(mode, args.events, elapsed, ack_latencies)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Cold-start recovery benchmark for the approval event journal. Writes a
+journal of --events changes over --approvals approvals (creates, then status
+transitions and edits), snapshotting every --snapshot-every events as the
+app does. It then times rebuilding the store by replaying the whole journal
+against loading the latest snapshot and replaying only the tail.
+
+    python benchmarks/bench_recovery.py --events 10000000 --approvals 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import SEGMENT_PATTERN, apply_event, read_events, recover, write_snapshot
+from store import ApprovalStore
+
+STATUSES = ("approved", "rejected", "pending")
+
+
+def new_approval(i):
+    return {
+        "id": str(i),
+        "title": f"Expenses #{i}",
+        "requestor": f"U{i % 500:05d}",
+        "amount_minor": 100000,
+        "total_minor": 100000,
+        "currency": "AUD",
+        "date": "2024-05-27",
+        "employee": f"U{i % 500:05d}",
+        "status": "pending",
+        "file_url": "",
+        "custom_file_name": "",
+        "image_url": "",
+        "home_ts": "",
+        "type": "expense"
+    }
+
+
+# Write the journal the way JournaledApprovalStore would, without the per-event fsync
+def generate(directory, events, approvals, snapshot_every, seed=1):
+    rng = random.Random(seed)
+    store = ApprovalStore()
+    segment = open(os.path.join(directory, SEGMENT_PATTERN.format(1)), "wb")
+    for seq in range(1, events + 1):
+        if seq <= approvals:
+            approval = store.create(new_approval(seq))
+            event = {"seq": seq, "at": 1700000000.0 + seq, "op": "create", "id": approval["id"], "actor": approval["requestor"], "approval": approval}
+        else:
+            approval_id = str(rng.randint(1, approvals))
+            if rng.random() < 0.8:
+                fields = {"status": rng.choice(STATUSES), "timestamp": "2024-05-28 09:00 UTC"}
+            else:
+                fields = {"title": f"Edited #{seq}"}
+            store.update(approval_id, **fields)
+            event = {"seq": seq, "at": 1700000000.0 + seq, "op": "update", "id": approval_id, "actor": "U00001", "fields": fields}
+        segment.write(json.dumps(event, separators=(",", ":")).encode("utf-8") + b"\n")
+        if seq % snapshot_every == 0 and seq < events:
+            segment.close()
+            write_snapshot(directory, seq, [dict(approval) for approval in store.filter("all")])
+            segment = open(os.path.join(directory, SEGMENT_PATTERN.format(seq + 1)), "wb")
+    segment.close()
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10000000)
+    parser.add_argument("--approvals", type=int, default=100000)
+    parser.add_argument("--snapshot-every", type=int, default=100000)
+    parser.add_argument("--dir", help="Journal directory to use (default: a temporary one, removed afterwards)")
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="approvals-journal-")
+    os.makedirs(directory, exist_ok=True)
+    try:
+        started = time.perf_counter()
+        expected = generate(directory, args.events, min(args.approvals, args.events), args.snapshot_every)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"wrote {args.events} events ({size / 1e6:.0f} MB) in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        replayed = ApprovalStore()
+        for event in read_events(directory):
+            apply_event(replayed, event)
+        full = time.perf_counter() - started
+        print(f"full replay:            {full:8.2f}s  ({args.events / full:,.0f} events/sec)")
+
+        started = time.perf_counter()
+        recovered = ApprovalStore()
+        recover(directory, recovered)
+        tail = time.perf_counter() - started
+        print(f"snapshot + tail replay: {tail:8.2f}s  ({full / tail:.1f}x faster)")
+
+        assert recovered.filter("all") == expected.filter("all") == replayed.filter("all")
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
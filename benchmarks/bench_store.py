@@ -0,0 +1,191 @@
+"""
+Approval store benchmark: bulk write throughput, lookup latency, App Home
+query latency (the first three pages of each of a mix of filter
+combinations) and the latency of the App Home queue summary, which should
+not grow with --rows.
+
+    python benchmarks/bench_store.py --rows 1000000 --backend sqlite
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlite_store import SQLiteApprovalStore
+from store import ApprovalStore
+
+STATUSES = ("pending", "approved", "rejected", "recalled")
+MONTHS = ("January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December")
+PURPOSES = ("travel", "client dinner", "conference", "software", "hardware", "training", "offsite")
+
+
+LEAVE_TYPES = ("annual leave", "sick leave", "parental leave")
+
+
+# Every fourth approval is a time off request, which has no amount
+def make_approval(i):
+    if i % 4 == 3:
+        return {
+            "id": str(i + 1),
+            "title": "Time Off Request",
+            "requestor": f"U{i % 500:05d}",
+            "request_date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+            "request_type": LEAVE_TYPES[i % len(LEAVE_TYPES)],
+            "notes": f"{MONTHS[i % 12]} {PURPOSES[i % len(PURPOSES)]}",
+            "employee": f"U{i % 2000:05d}",
+            "status": STATUSES[(i * 2654435761 >> 16) % len(STATUSES)],
+            "image_url": "",
+            "home_ts": "",
+            "type": "time_off"
+        }
+    return {
+        "id": str(i + 1),
+        "title": f"{MONTHS[i % 12]} {PURPOSES[i % len(PURPOSES)]}",
+        "requestor": f"U{i % 500:05d}",
+        "amount_minor": i * 37 % 5000 * 100,
+        "total_minor": i * 37 % 5000 * 100,
+        "currency": "AUD",
+        "date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        "employee": f"U{i % 2000:05d}",
+        # Hashed, so status doesn't follow the date and title the way i % 4 would
+        "status": STATUSES[(i * 2654435761 >> 16) % len(STATUSES)],
+        "file_url": "",
+        "custom_file_name": "",
+        "image_url": "",
+        "home_ts": "",
+        "type": "expense"
+    }
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def bench_writes(store, rows, batch_size):
+    started = time.perf_counter()
+    for start in range(0, rows, batch_size):
+        with store.transaction():
+            for i in range(start, min(start + batch_size, rows)):
+                store.create(make_approval(i))
+    elapsed = time.perf_counter() - started
+    return rows / elapsed
+
+
+def bench_lookups(store, rows, lookups):
+    samples = []
+    for _ in range(lookups):
+        approval_id = str(random.randint(1, rows))
+        started = time.perf_counter()
+        store.get(approval_id)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_transitions(store, rows, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        store.transition(str(random.randint(1, rows)), random.choice(STATUSES))
+    return count / (time.perf_counter() - started)
+
+
+# Filter combinations to time, name -> function making a query
+QUERIES = {
+    "status": lambda: {"status": random.choice(STATUSES)},
+    "status+type": lambda: {"status": random.choice(STATUSES), "type": "expense"},
+    "employee": lambda: {"employee": f"U{random.randrange(2000):05d}", "status": "pending"},
+    "text": lambda: {"text": random.choice(PURPOSES), "status": "pending"},
+    "two words": lambda: {"text": f"{random.choice(MONTHS)} {random.choice(PURPOSES)}"},
+    "date range": lambda: {"date_from": "2024-03-01", "date_to": "2024-03-31", "status": random.choice(STATUSES)},
+    "narrow amount": lambda: {"amount_min": str(random.randrange(4900)), "amount_max": None, "status": "pending"},
+    "wide amount": lambda: {"amount_min": "1000", "amount_max": "4000", "type": "expense"},
+    # Filters that each match many approvals but together none: time off has no amount
+    "time off amount": lambda: {"type": "time_off", "amount_min": "1"},
+    "pending time off amount": lambda: {"status": "pending", "type": "time_off", "amount_min": "5"},
+    "everything": lambda: {
+        "requestor": f"U{random.randrange(500):05d}",
+        "date_from": "2024-01-01",
+        "date_to": "2024-06-30",
+        "amount_min": "500",
+        "text": random.choice(MONTHS)
+    }
+}
+
+
+def bench_queries(store, count, pages=3):
+    results = {}
+    for name, make_query in QUERIES.items():
+        samples = []
+        for _ in range(count):
+            query = make_query()
+            if "amount_max" in query:
+                query["amount_max"] = str(float(query["amount_min"]) + 100)
+            cursor = None
+            for _ in range(pages):
+                started = time.perf_counter()
+                _, _, cursor = store.query(query, cursor)
+                samples.append(time.perf_counter() - started)
+                if cursor is None:
+                    break
+        results[name] = samples
+    return results
+
+
+def bench_queue_stats(store, count):
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        store.queue_stats()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--transitions", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=200, help="Queries of each kind to time")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="sqlite")
+    parser.add_argument("--db-path", help="SQLite file to use, defaults to a temporary file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.backend == "sqlite":
+            store = SQLiteApprovalStore(args.db_path or os.path.join(tmp, "approvals.db"))
+        else:
+            store = ApprovalStore()
+
+        writes_per_sec = bench_writes(store, args.rows, args.batch_size)
+        print(f"{args.backend}: inserted {args.rows:,} rows at {writes_per_sec:,.0f} writes/sec (batch size {args.batch_size})")
+
+        samples = bench_lookups(store, args.rows, args.lookups)
+        print(
+            f"{args.backend}: get() p50 {percentile(samples, 50) * 1e6:.1f}us"
+            f" p99 {percentile(samples, 99) * 1e6:.1f}us over {args.lookups:,} lookups"
+        )
+
+        transitions_per_sec = bench_transitions(store, args.rows, args.transitions)
+        print(f"{args.backend}: {transitions_per_sec:,.0f} single-write transitions/sec")
+
+        for name, samples in bench_queries(store, args.queries).items():
+            print(
+                f"{args.backend}: query {name:>23} p50 {percentile(samples, 50) * 1000:.2f}ms"
+                f" p99 {percentile(samples, 99) * 1000:.2f}ms"
+            )
+
+        samples = bench_queue_stats(store, args.queries)
+        print(
+            f"{args.backend}: queue_stats() p50 {percentile(samples, 50) * 1e6:.1f}us"
+            f" p99 {percentile(samples, 99) * 1e6:.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
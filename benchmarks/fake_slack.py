@@ -0,0 +1,399 @@
+"""
+Minimal local stand-ins for Slack, for benchmarks and load tests. Every Web
+API method answers {"ok": true, ...} after an injected delay, and each call
+is recorded. FakeSlackServer serves it over HTTP along with a Socket Mode
+endpoint (point the app at it with SLACK_API_URL); RecordingWebClient
+answers in-process, without a socket.
+"""
+
+import base64
+import hashlib
+import itertools
+import json
+import math
+import random
+import struct
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from slack_sdk import WebClient
+from slack_sdk.web import SlackResponse
+
+# Extra response fields per Web API method
+RESPONSES = {
+    "auth.test": {"url": "https://bench.slack.com/", "team": "Bench", "user": "approvals", "team_id": "T0BENCH", "user_id": "U0BOT", "bot_id": "B0BOT"},
+    "views.publish": {"view": {"id": "V0HOME", "type": "home"}},
+    "views.open": {"view": {"id": "V0MODAL", "type": "modal"}},
+    "chat.postMessage": {"channel": "D0DM", "ts": "1700000000.000100"},
+    "users.info": {"user": {"id": "U0USER", "name": "bench.user", "real_name": "Bench User", "tz": "UTC", "tz_offset": 0}},
+    "users.list": {"members": [{"id": "U0USER", "name": "bench.user", "real_name": "Bench User", "tz": "UTC", "tz_offset": 0}], "response_metadata": {"next_cursor": ""}}
+}
+
+
+# Response body for one Web API call. users.info answers for whichever user was asked about.
+def response_body(method, params):
+    body = {"ok": True, **RESPONSES.get(method, {})}
+    if method == "users.info" and params.get("user"):
+        body["user"] = {**body["user"], "id": params["user"], "name": params["user"].lower()}
+    return body
+
+
+# WebClient whose calls never leave the process: each is answered like
+# FakeSlackServer would, after `latency` seconds. Calls from every instance
+# are counted together, since Bolt builds a new client per request.
+class RecordingWebClient(WebClient):
+    latency = 0.0
+    calls = Counter()
+    _lock = threading.Lock()
+
+    def api_call(self, api_method, *, http_verb="POST", files=None, data=None, params=None, json=None, headers=None, auth=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls[api_method] += 1
+        request = {**(params or {}), **(data or {}), **(json or {})}
+        return SlackResponse(
+            client=self,
+            http_verb=http_verb,
+            api_url=self.base_url + api_method,
+            req_args={"params": params, "data": data, "json": json},
+            data=response_body(api_method, request),
+            headers={},
+            status_code=200
+        ).validate()
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.calls.clear()
+
+
+# Requests a minute allowed per Web API method, as Slack's tiers roughly do
+TIER_LIMITS = {
+    "views.publish": 100,
+    "views.open": 100,
+    "users.info": 100,
+    "users.list": 20,
+    "chat.postMessage": 60
+}
+
+# Connection setup calls, never failed on purpose so the app can always connect
+SETUP_METHODS = ("auth.test", "apps.connections.open")
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class RateLimiter:
+    def __init__(self, limits):
+        self.limits = limits
+        # method -> [tokens, updated]
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    # Seconds to wait before calling `method` again, 0 if this call is allowed
+    def check(self, method):
+        per_minute = self.limits.get(method)
+        if not per_minute:
+            return 0
+        rate = per_minute / 60.0
+        capacity = max(1.0, per_minute / 4.0)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(method, [capacity, now])
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+
+# One Socket Mode WebSocket connection: text frames out, acks and pings in
+class SocketModeConnection:
+    def __init__(self, server, handler):
+        self.server = server
+        self.rfile = handler.rfile
+        self.sock = handler.connection
+        self._send_lock = threading.Lock()
+        self.closed = False
+
+    def send_frame(self, opcode, payload=b""):
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        elif len(payload) < 1 << 16:
+            header += bytes([126]) + struct.pack("!H", len(payload))
+        else:
+            header += bytes([127]) + struct.pack("!Q", len(payload))
+        with self._send_lock:
+            self.sock.sendall(header + payload)
+
+    def send_json(self, message):
+        self.send_frame(0x1, json.dumps(message).encode("utf-8"))
+
+    def _read_frame(self):
+        first, second = self.rfile.read(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self.rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self.rfile.read(8))[0]
+        mask = self.rfile.read(4) if second & 0x80 else None
+        payload = self.rfile.read(length)
+        if mask:
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        return first & 0x80, first & 0x0F, payload
+
+    # Read client frames until the connection closes
+    def serve(self):
+        message = b""
+        try:
+            while True:
+                fin, opcode, payload = self._read_frame()
+                if opcode == 0x9:
+                    self.send_frame(0xA, payload)
+                elif opcode == 0x8:
+                    self.send_frame(0x8, payload[:2])
+                    return
+                elif opcode in (0x0, 0x1):
+                    message += payload
+                    if fin:
+                        self.server.received(json.loads(message))
+                        message = b""
+        except (ValueError, OSError):
+            return
+        finally:
+            self.closed = True
+            self.server.disconnected(self)
+
+
+# Local stand-in for the Slack Web API and Socket Mode. Web API calls are
+# answered after `latency` seconds, limited to `rate_limits` requests a
+# minute per method (429 with Retry-After beyond that), and other than
+# connection setup fail with a 429 at `error_rate`. apps.connections.open hands out a ws:// URL on the same
+# port, so SocketModeHandler connects unmodified; send_envelope() then
+# delivers events to it and ack latencies are recorded as acks arrive.
+class FakeSlackServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, rate_limits=None, error_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rate_limiter = RateLimiter(rate_limits or {})
+        self.calls = Counter()
+        self.rate_limited = Counter()
+        self.payloads = []
+        self.ack_latencies = []
+        self.last_call_at = None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._connections = []
+        # envelope_id -> when it was sent
+        self._unacked = {}
+        self._envelope_ids = itertools.count(1)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/"
+
+    @property
+    def socket_url(self):
+        host, port = self._server.server_address[:2]
+        return f"ws://{host}:{port}/link/"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.headers.get("Upgrade", "").lower() == "websocket":
+                    self.upgrade()
+                    return
+                method, _, query = self.path.partition("?")
+                self.reply(method.rsplit("/", 1)[-1], {key: values[-1] for key, values in parse_qs(query).items()})
+
+            def do_POST(self):
+                method = self.path.rsplit("/", 1)[-1]
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length).decode("utf-8") if length else ""
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    params = json.loads(raw or "{}")
+                else:
+                    params = {key: values[-1] for key, values in parse_qs(raw).items()}
+                self.reply(method, params)
+
+            def reply(self, method, params):
+                status, body, headers = server.respond(method, params)
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def upgrade(self):
+                key = self.headers["Sec-WebSocket-Key"]
+                accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+                self.send_response(101, "Switching Protocols")
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept", accept)
+                self.end_headers()
+                self.wfile.flush()
+                self.close_connection = True
+                connection = SocketModeConnection(server, self)
+                server.connected(connection)
+                connection.serve()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    # Returns (status, body, headers) for one Web API call
+    def respond(self, method, params):
+        if self.latency:
+            time.sleep(self.latency)
+        wait = self.rate_limiter.check(method)
+        if not wait and self.error_rate and method not in SETUP_METHODS and self._random.random() < self.error_rate:
+            wait = self.retry_after
+        if wait:
+            with self._condition:
+                self.rate_limited[method] += 1
+            return 429, {"ok": False, "error": "ratelimited"}, {"Retry-After": str(math.ceil(wait))}
+        self.record(method, params)
+        if method == "apps.connections.open":
+            return 200, {"ok": True, "url": self.socket_url}, {}
+        return 200, response_body(method, params), {}
+
+    def record(self, method, params):
+        with self._condition:
+            self.calls[method] += 1
+            self.payloads.append((method, params))
+            self.last_call_at = time.monotonic()
+            self._condition.notify_all()
+
+    def reset(self):
+        with self._condition:
+            self.calls.clear()
+            self.rate_limited.clear()
+            self.payloads.clear()
+            self.ack_latencies.clear()
+            self.last_call_at = None
+
+    # Block until `count` calls to `method` have been received
+    def wait_for(self, method, count, timeout=60):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self.calls[method] < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    # Block until no Web API call has arrived for `quiet` seconds
+    def wait_idle(self, quiet=1.0, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._condition:
+                last = self.last_call_at
+            if last is None or time.monotonic() - last >= quiet:
+                return True
+            time.sleep(min(quiet, 0.1))
+        return False
+
+    def connected(self, connection):
+        with self._condition:
+            self._connections.append(connection)
+            self._condition.notify_all()
+        connection.send_json({
+            "type": "hello",
+            "num_connections": len(self._connections),
+            "connection_info": {"app_id": "A0BENCH"},
+            "debug_info": {"host": "fake-slack", "approximate_connection_time": 18060}
+        })
+
+    def disconnected(self, connection):
+        with self._condition:
+            if connection in self._connections:
+                self._connections.remove(connection)
+
+    # Block until `count` Socket Mode connections are open
+    def wait_for_connections(self, count=1, timeout=30):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while len(self._connections) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    # Deliver one Socket Mode envelope ("events_api", "interactive", ...)
+    # to an open connection, round robin; returns its envelope ID
+    def send_envelope(self, envelope_type, payload):
+        with self._condition:
+            if not self._connections:
+                raise RuntimeError("No Socket Mode connection")
+            envelope_id = f"env-{next(self._envelope_ids)}"
+            connection = self._connections[int(envelope_id[4:]) % len(self._connections)]
+            self._unacked[envelope_id] = time.perf_counter()
+        connection.send_json({
+            "envelope_id": envelope_id,
+            "type": envelope_type,
+            "payload": payload,
+            "accepts_response_payload": envelope_type == "interactive",
+            "retry_attempt": 0,
+            "retry_reason": ""
+        })
+        return envelope_id
+
+    def received(self, message):
+        envelope_id = message.get("envelope_id")
+        with self._condition:
+            sent = self._unacked.pop(envelope_id, None)
+            if sent is not None:
+                self.ack_latencies.append(time.perf_counter() - sent)
+                self._condition.notify_all()
+
+    # Envelopes sent but not yet acked
+    def unacked(self):
+        with self._condition:
+            return len(self._unacked)
+
+    # Block until every envelope sent so far has been acked
+    def wait_for_acks(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._unacked:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.send_frame(0x8, struct.pack("!H", 1001))
+            except OSError:
+                pass
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,279 @@
+"""
+Concurrency stress test for the approval stores. Threads approve, reject,
+revert, edit, delete and create approvals while others render App Home
+pages from the same store, for --seconds. Fails (exit status 1) on any
+exception in a thread, a torn read (an approval whose fields come from two
+different writes), a lost update (an approval whose version doesn't match
+the writes that succeeded on it) or indexes that disagree with the
+approvals (or queries, or App Home queue totals, that disagree with a scan
+of them). Reports
+operations/sec per role and render latency, which should not grow with the
+number of writers.
+
+    python benchmarks/stress_store.py --threads 16 --seconds 10
+    python benchmarks/stress_store.py --backend sqlite --approvals 5000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import JournaledApprovalStore
+from query import matcher, parse_query
+from sqlite_store import SQLiteApprovalStore
+from store import PAGE_SIZE, ApprovalStore, QueueStats, VersionConflict
+from views import home_tab_page
+
+STATUSES = ("pending", "approved", "rejected")
+# App Home filters renders pick from, encoded as the App Home carries them
+HOME_FILTERS = ("all", *STATUSES, "status=pending&type=expense", "text=rev", "employee=U00007&date_from=2024-05-01")
+# Share of threads given each role
+ROLES = ("decide", "decide", "edit", "churn", "render", "render", "render", "read")
+
+
+def make_approval(approval_id):
+    return {
+        "id": str(approval_id),
+        "title": "rev 0",
+        "requestor": f"U{approval_id % 50:05d}",
+        # Always written together with title, so a read seeing them differ is torn
+        "amount": "rev 0",
+        "total": "AUD $1,000",
+        "amount_minor": approval_id % 1000 * 100,
+        "currency": ("AUD", "USD")[approval_id % 2],
+        "date": "2024-05-27",
+        "employee": f"U{approval_id % 200:05d}",
+        "status": "pending",
+        "type": "expense",
+        "home_ts": ""
+    }
+
+
+# IDs of the first PAGE_SIZE approvals a query finds, following its cursor
+# past pages the store cut short
+def first_matches(store, query):
+    found, cursor = [], None
+    while True:
+        approvals, _, cursor = store.query(query, cursor)
+        found.extend(approval["id"] for approval in approvals)
+        if cursor is None or len(found) >= PAGE_SIZE:
+            return found[:PAGE_SIZE]
+
+
+def open_store(backend, directory, approvals):
+    if backend == "sqlite":
+        return SQLiteApprovalStore(os.path.join(directory, "stress.db"), approvals)
+    if backend == "journal":
+        return JournaledApprovalStore(os.path.join(directory, "journal"), approvals)
+    return ApprovalStore(approvals)
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))] if samples else 0.0
+
+
+class Stress:
+    def __init__(self, store, ids, seed):
+        self.store = store
+        self.ids = ids
+        self.seed = seed
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.ops = Counter()
+        self.conflicts = Counter()
+        # approval ID -> writes that succeeded on it
+        self.writes = Counter()
+        self.deleted = set()
+        self.next_id = max(int(i) for i in ids) + 1
+        self.render_seconds = []
+        self.failures = []
+
+    def check(self, approval):
+        if approval is not None and approval.get("title") != approval.get("amount"):
+            raise AssertionError(f"Torn read of approval {approval['id']}: {approval['title']!r} vs {approval['amount']!r}")
+
+    # Apply a change to the version just read, as a listener acting on a rendered button would
+    def write(self, approval_id, change, **fields):
+        approval = self.store.get(approval_id)
+        if approval is None:
+            return
+        self.check(approval)
+        try:
+            updated = change(approval_id, expected_version=approval["version"], **fields)
+        except VersionConflict:
+            with self.lock:
+                self.conflicts[approval_id] += 1
+            return
+        if updated is not None:
+            with self.lock:
+                self.writes[approval_id] += 1
+
+    def decide(self, rng):
+        approval_id = rng.choice(self.ids)
+        approval = self.store.get(approval_id)
+        if approval is None:
+            return
+        if approval["status"] == "pending":
+            self.write(approval_id, self.store.transition, status=rng.choice(("approved", "rejected")))
+        else:
+            self.write(approval_id, self.store.update, status="pending")
+
+    def edit(self, rng):
+        revision = f"rev {rng.random():.6f}"
+        self.write(
+            rng.choice(self.ids),
+            self.store.update,
+            title=revision,
+            amount=revision,
+            amount_minor=rng.randrange(100000),
+            employee=f"U{rng.randrange(200):05d}"
+        )
+
+    def churn(self, rng):
+        if rng.random() < 0.5:
+            approval_id = rng.choice(self.ids)
+            if self.store.delete(approval_id) is not None:
+                with self.lock:
+                    self.deleted.add(approval_id)
+        else:
+            with self.lock:
+                approval_id = self.next_id
+                self.next_id += 1
+            self.store.create(make_approval(approval_id))
+            with self.lock:
+                self.ids.append(str(approval_id))
+
+    def render(self, rng):
+        started = time.perf_counter()
+        home_filter = rng.choice(HOME_FILTERS)
+        view, approval_ids = home_tab_page(None, self.store, home_filter, None, "next")
+        for approval_id in approval_ids:
+            self.check(self.store.get(approval_id))
+        # Walk one page on, as a user paging through would
+        _, cursor = self.store.query(parse_query(home_filter))[1:]
+        if cursor is not None:
+            home_tab_page(None, self.store, home_filter, cursor, "next")
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.render_seconds.append(elapsed)
+
+    def read(self, rng):
+        for approval in self.store.filter(rng.choice(STATUSES)):
+            self.check(approval)
+        self.store.count_by_status()
+
+    def run(self, role, index):
+        rng = random.Random(self.seed * 1000 + index)
+        action = getattr(self, role)
+        try:
+            while not self.stop.is_set():
+                action(rng)
+                with self.lock:
+                    self.ops[role] += 1
+        except Exception:
+            self.failures.append(f"{role} thread {index}:\n{traceback.format_exc()}")
+            self.stop.set()
+
+    # Every surviving approval's version accounts for exactly the writes that succeeded on it
+    def verify(self, initial_versions):
+        problems = []
+        for approval_id, version in initial_versions.items():
+            approval = self.store.get(approval_id)
+            if approval is None:
+                if approval_id not in self.deleted:
+                    problems.append(f"Approval {approval_id} vanished without being deleted")
+                continue
+            self.check(approval)
+            if approval_id not in self.deleted and approval["version"] != version + self.writes[approval_id]:
+                problems.append(
+                    f"Approval {approval_id} is at version {approval['version']},"
+                    f" expected {version} + {self.writes[approval_id]} writes"
+                )
+        everything = self.store.filter("all")
+        if len(everything) != len(self.store):
+            problems.append(f"filter('all') has {len(everything)} approvals, the store {len(self.store)}")
+        for status in STATUSES:
+            expected = sorted(approval["id"] for approval in everything if approval["status"] == status)
+            indexed = sorted(approval["id"] for approval in self.store.filter(status))
+            if expected != indexed:
+                problems.append(f"Status index for {status} has {len(indexed)} approvals, expected {len(expected)}")
+        for home_filter in HOME_FILTERS:
+            query = parse_query(home_filter)
+            expected = [approval["id"] for approval in everything if matcher(query)(approval)][:PAGE_SIZE]
+            found = first_matches(self.store, query)
+            if expected != found:
+                problems.append(f"Query {home_filter!r} found {found}, expected {expected}")
+        pending = [approval for approval in everything if approval["status"] == "pending"]
+        expected = QueueStats(pending).summary(pending[0] if pending else None)
+        found = self.store.queue_stats()
+        if found != expected:
+            problems.append(f"queue_stats() is {found}, a count of the pending approvals {expected}")
+        counts = self.store.count_by_status()
+        if sum(counts.values()) != len(self.store):
+            problems.append(f"count_by_status adds up to {sum(counts.values())}, the store has {len(self.store)}")
+        return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("memory", "sqlite", "journal"), default="memory")
+    parser.add_argument("--approvals", type=int, default=2000, help="Approvals to start with")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    # Switch threads often, so races show up in a short run
+    parser.add_argument("--switch-interval", type=float, default=1e-5, help="sys.setswitchinterval while running")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = open_store(args.backend, directory, [make_approval(i + 1) for i in range(args.approvals)])
+        ids = [str(i + 1) for i in range(args.approvals)]
+        initial_versions = {approval_id: store.get(approval_id)["version"] for approval_id in ids}
+        stress = Stress(store, ids, args.seed)
+
+        sys.setswitchinterval(args.switch_interval)
+        threads = [
+            threading.Thread(target=stress.run, args=(ROLES[i % len(ROLES)], i), daemon=True)
+            for i in range(args.threads)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        stress.stop.wait(args.seconds)
+        stress.stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        sys.setswitchinterval(0.005)
+
+        problems = stress.failures + stress.verify(initial_versions)
+        if hasattr(store, "close"):
+            store.close()
+
+    print(f"{args.backend} store, {args.threads} threads, {elapsed:.1f}s")
+    for role in sorted(stress.ops):
+        print(f"  {role:>8}: {stress.ops[role] / elapsed:10.1f} ops/sec")
+    print(
+        f"  conflicts: {sum(stress.conflicts.values())}, deletes: {len(stress.deleted)},"
+        f" render p50 {percentile(stress.render_seconds, 50) * 1000:.2f}ms"
+        f" p99 {percentile(stress.render_seconds, 99) * 1000:.2f}ms"
+    )
+    if problems:
+        print(f"FAILED with {len(problems)} problem(s):")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("OK: no torn reads, lost updates or index drift")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import signal
+import sqlite3
+import subprocess
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Slack allows an app at most this many open Socket Mode connections
+MAX_WORKERS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cluster_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    worker INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+
+# Broadcasts changes to per-process state between worker processes sharing
+# one SQLite database. publish() appends an event to a table in that
+# database; every worker polls the table every poll_interval seconds and
+# passes the events other workers wrote to the handlers subscribed to their
+# kind, in the order they were written. Events older than `retention`
+# seconds are pruned.
+class ChangeFeed:
+    def __init__(self, path, worker_id, poll_interval=0.1, retention=300, busy_timeout=5000):
+        self.path = path
+        self.worker_id = worker_id
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._handlers = {}
+        self._thread = None
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        # Only what happens from now on; earlier events describe state this process never had
+        self._last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM cluster_events").fetchone()[0]
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # Call handler(**payload) for each event of `kind` another worker publishes
+    def subscribe(self, kind, handler):
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def publish(self, kind, **payload):
+        self._connection().execute(
+            "INSERT INTO cluster_events (worker, kind, payload, created) VALUES (?, ?, ?, ?)",
+            (self.worker_id, kind, json.dumps(payload), time.time())
+        )
+        metrics.increment("cluster_events_published", kind=kind)
+
+    # Hand every new event from other workers to its handlers; returns how many there were
+    def poll(self):
+        rows = self._connection().execute(
+            "SELECT seq, worker, kind, payload FROM cluster_events WHERE seq > ? ORDER BY seq",
+            (self._last_seq,)
+        ).fetchall()
+        applied = 0
+        for seq, worker, kind, payload in rows:
+            self._last_seq = seq
+            if worker == self.worker_id:
+                continue
+            applied += 1
+            metrics.increment("cluster_events_applied", kind=kind)
+            for handler in self._handlers.get(kind, ()):
+                try:
+                    handler(**json.loads(payload))
+                except Exception as e:
+                    logger.error("Error applying %s event from worker %s: %s", kind, worker, e)
+        return applied
+
+    def prune(self):
+        self._connection().execute("DELETE FROM cluster_events WHERE created < ?", (time.time() - self.retention,))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll_loop, name="cluster-feed", daemon=True)
+            self._thread.start()
+        return self
+
+    def _poll_loop(self):
+        pruned_at = time.monotonic()
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+                if time.monotonic() - pruned_at > self.retention / 10:
+                    self.prune()
+                    pruned_at = time.monotonic()
+            except Exception as e:
+                logger.error("Error polling cluster events: %s", e)
+
+
+# Run one worker process per entry in `environments`, each started with
+# `command` and those variables on top of this process's environment, and
+# restart any that exit. SIGTERM or SIGINT stops them all.
+def run_workers(command, environments, restart_delay=1.0):
+    processes = {}
+    stopping = threading.Event()
+
+    def start(index):
+        processes[index] = subprocess.Popen(command, env={**os.environ, **environments[index]})
+        logger.info("Started worker %s (pid %s)", index, processes[index].pid)
+
+    def stop(signum, frame):
+        stopping.set()
+        for process in processes.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(len(environments)):
+        start(index)
+    while not stopping.wait(restart_delay):
+        for index, process in list(processes.items()):
+            if process.poll() is not None and not stopping.is_set():
+                logger.warning("Worker %s exited with status %s, restarting", index, process.returncode)
+                metrics.increment("worker_restarts")
+                start(index)
+    for process in processes.values():
+        process.wait()
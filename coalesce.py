@@ -0,0 +1,180 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Keep only the newest request, the default way to merge two for one key
+def latest(pending, request):
+    return request
+
+
+# Never queue a second job for a key, the default for `reissue`
+def never(queued, merged):
+    return False
+
+
+# Per-key debounce. The first request for a key after a quiet spell is
+# flushed straight away; requests that follow within `window` seconds are
+# merged into one that is flushed once the key has been quiet for `window`,
+# or `max_delay` after the first merged request at the latest. A window of 0
+# flushes every request immediately.
+#
+# flush(key, request, claim) runs on the submitting thread or the debounce
+# timer thread, so it should queue a job rather than do the work. The job
+# calls claim() when it starts and works on what that returns: until then
+# the key stays queued, and any request for it is merged into the queued
+# one rather than flushed again, however long the job waits. claim()
+# returns None if a newer job took over the key; a retried job gets back
+# what it claimed first. reissue(queued, merged) says whether a merge
+# needs a job of its own anyway (to jump a slower queue, say); the first
+# of the two jobs to start claims it. If flush returns False the job
+# wasn't queued (the queue was full): the request is kept, merged with any
+# that follow, and flushed again retry_delay later.
+class Debouncer:
+    def __init__(self, flush, window=0.3, max_delay=1.0, merge=latest, name="debounce", retry_delay=0.5, reissue=never):
+        self.flush = flush
+        self.window = window
+        self.max_delay = max_delay
+        self.merge = merge
+        self.name = name
+        self.retry_delay = retry_delay
+        self.reissue = reissue
+        self._condition = threading.Condition()
+        # key -> [request, first submitted, due]
+        self._pending = {}
+        # key -> [request, token] flushed to a job that hasn't started yet
+        self._queued = {}
+        # key -> when a request for it was last flushed, oldest first; keys
+        # quiet for a whole window are dropped, as they'd flush straight away
+        self._last_flushed = OrderedDict()
+        # Pending due times: heap of (due, sequence, key), stale entries skipped
+        self._due = []
+        self._sequence = itertools.count()
+        self._thread = None
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-timer", daemon=True)
+            self._thread.start()
+
+    def submit(self, key, request):
+        now = time.monotonic()
+        with self._condition:
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry[0] = self.merge(entry[0], request)
+                entry[2] = min(now + self.window, entry[1] + self.max_delay)
+                heapq.heappush(self._due, (entry[2], next(self._sequence), key))
+                metrics.increment(f"{self.name}_merged")
+                return
+            queued = key in self._queued
+            if not queued and now - self._last_flushed.get(key, float("-inf")) < self.window:
+                self._start()
+                self._pending[key] = [request, now, now + self.window]
+                heapq.heappush(self._due, (now + self.window, next(self._sequence), key))
+                self._condition.notify()
+                return
+            if self.window > 0 and not queued:
+                self._flushed(key, now)
+        self._flush(key, request)
+
+    # Note a flush of `key` and forget keys whose window has closed
+    def _flushed(self, key, now):
+        self._last_flushed[key] = now
+        self._last_flushed.move_to_end(key)
+        while True:
+            oldest, flushed_at = next(iter(self._last_flushed.items()))
+            if now - flushed_at < self.window:
+                break
+            del self._last_flushed[oldest]
+
+    # Requests waiting for their window to close or for their job to start
+    def pending(self):
+        with self._condition:
+            return len(self._pending) + len(self._queued)
+
+    def _flush(self, key, request):
+        with self._condition:
+            queued = self._queued.get(key)
+            if queued is not None:
+                merged = self.merge(queued[0], request)
+                reissue = self.reissue(queued[0], merged)
+                queued[0] = merged
+                if not reissue:
+                    metrics.increment(f"{self.name}_merged")
+                    return
+                request = merged
+            token = next(self._sequence)
+            self._queued[key] = [request, token]
+        if self.flush(key, request, self._claim(key, token)) is False:
+            with self._condition:
+                queued = self._queued.get(key)
+                if queued is None or queued[1] != token:
+                    # A newer job holds the key and everything merged into it
+                    return
+                del self._queued[key]
+            self._defer(key, queued[0])
+            return
+        metrics.increment(f"{self.name}_issued")
+
+    def _claim(self, key, token):
+        claimed = []
+
+        def claim():
+            with self._condition:
+                queued = self._queued.get(key)
+                if queued is not None and queued[1] == token:
+                    del self._queued[key]
+                    claimed.append(queued[0])
+                # A newer job is queued, or took over before this one started
+                elif queued is not None or not claimed:
+                    return None
+                return claimed[0]
+        return claim
+
+    # Hold on to a request the flush couldn't hand off, ahead of any that
+    # arrived for the key meanwhile
+    def _defer(self, key, request):
+        metrics.increment(f"{self.name}_deferred")
+        now = time.monotonic()
+        with self._condition:
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry[0] = self.merge(request, entry[0])
+                return
+            self._start()
+            self._pending[key] = [request, now, now + self.retry_delay]
+            heapq.heappush(self._due, (now + self.retry_delay, next(self._sequence), key))
+            self._condition.notify()
+
+    # Block until some key's window closes, then take its merged request
+    def _take_due(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._due and self._due[0][0] <= now:
+                    due, _, key = heapq.heappop(self._due)
+                    entry = self._pending.get(key)
+                    # Superseded by a later due time for the same key
+                    if entry is None or entry[2] != due:
+                        continue
+                    del self._pending[key]
+                    if self.window > 0:
+                        self._flushed(key, now)
+                    return key, entry[0]
+                self._condition.wait(self._due[0][0] - now if self._due else None)
+
+    def _run(self):
+        while True:
+            key, request = self._take_due()
+            try:
+                self._flush(key, request)
+            except Exception as e:
+                logger.error("Error flushing %s for %s: %s", self.name, key, e)
@@ -0,0 +1,55 @@
+import os
+from dotenv import load_dotenv
+
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Get environment variables
+SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
+SLACK_APP_TOKEN = os.getenv("SLACK_APP_TOKEN")
+SLACK_API_URL = os.getenv("SLACK_API_URL", "https://slack.com/api/")
+APPROVALS_DB_PATH = os.getenv("APPROVALS_DB_PATH")
+# Directory for the approval event journal and its snapshots
+APPROVALS_JOURNAL_DIR = os.getenv("APPROVALS_JOURNAL_DIR")
+JOURNAL_FSYNC_INTERVAL_MS = int(os.getenv("JOURNAL_FSYNC_INTERVAL_MS", "50"))
+JOURNAL_SNAPSHOT_EVERY = int(os.getenv("JOURNAL_SNAPSHOT_EVERY", "100000"))
+# Currency of expense amounts entered without a currency code or symbol
+DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "AUD").upper()
+# "threaded" runs the sync App on a thread pool, "async" runs AsyncApp on asyncio
+APP_MODE = os.getenv("APP_MODE", "threaded")
+# Worker processes, each with its own Socket Mode connection, sharing the
+# SQLite store; they see each other's changes within CLUSTER_POLL_MS
+WORKERS = int(os.getenv("WORKERS", "1"))
+CLUSTER_POLL_MS = int(os.getenv("CLUSTER_POLL_MS", "100"))
+# Background workers for home tab publishes and DMs, and how hard they retry
+OUTBOUND_WORKERS = int(os.getenv("OUTBOUND_WORKERS", "4"))
+OUTBOUND_QUEUE_SIZE = int(os.getenv("OUTBOUND_QUEUE_SIZE", "10000"))
+OUTBOUND_MAX_ATTEMPTS = int(os.getenv("OUTBOUND_MAX_ATTEMPTS", "5"))
+# Home tabs of other affected users republished in parallel after a change
+HOME_FANOUT_CONCURRENCY = int(os.getenv("HOME_FANOUT_CONCURRENCY", "8"))
+# Home tab publishes for one user within this window merge into one, delayed by at most the cap
+HOME_PUBLISH_DEBOUNCE_MS = int(os.getenv("HOME_PUBLISH_DEBOUNCE_MS", "300"))
+HOME_PUBLISH_MAX_DELAY_MS = int(os.getenv("HOME_PUBLISH_MAX_DELAY_MS", "1000"))
+
+# Local port for the Prometheus /metrics endpoint, unset to turn it off
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Opt-in sampling profiler: where to write profiles (unset turns it off),
+# which listeners to profile ("*" for all), and how often
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+PROFILE_LISTENERS = os.getenv("PROFILE_LISTENERS", "*")
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "100"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "0") == "1"
+PROFILE_FLUSH_SECONDS = int(os.getenv("PROFILE_FLUSH_SECONDS", "60"))
+
+# Logging: the root level, per-logger overrides ("slack_sdk=WARNING,handlers=DEBUG"),
+# json or text lines, one in LOG_DEBUG_SAMPLE_EVERY debug lines kept per call
+# site, and lines cut to LOG_MAX_LENGTH characters (0 for no limit)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_DEBUG_SAMPLE_EVERY = int(os.getenv("LOG_DEBUG_SAMPLE_EVERY", "1"))
+LOG_MAX_LENGTH = int(os.getenv("LOG_MAX_LENGTH", "4000"))
@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# The parts of a Slack user object the app shows
+def user_profile(user):
+    profile = user.get("profile") or {}
+    return {
+        "id": user["id"],
+        "name": profile.get("display_name") or user.get("real_name") or profile.get("real_name") or user.get("name") or user["id"],
+        "real_name": user.get("real_name") or profile.get("real_name") or "",
+        "tz": user.get("tz"),
+        "tz_offset": user.get("tz_offset", 0)
+    }
+
+
+# Users' names and time zones, so views can show them without a Slack API
+# call per row. Profiles are kept for `ttl` seconds in an LRU of at most
+# max_entries users; unknown users are remembered as None for negative_ttl
+# seconds so repeated misses don't hit the API. Concurrent lookups of the
+# same uncached user share one users.info call, and warm() bulk loads the
+# whole workspace with paginated users.list calls.
+class UserDirectory:
+    def __init__(self, ttl=3600, negative_ttl=300, max_entries=10000, fetch_timeout=10, clock=time.monotonic):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.fetch_timeout = fetch_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        # user ID -> (profile or None, expires at)
+        self._entries = OrderedDict()
+        # user ID -> Future for the users.info call in progress
+        self._in_flight = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, user_id, profile, ttl):
+        self._entries[user_id] = (profile, self.clock() + ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # Cached profile (or None) without calling Slack
+    def peek(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > self.clock():
+                return entry[0]
+        return None
+
+    # Whether the directory has a current answer for user_id, a profile or
+    # that Slack doesn't know them
+    def is_cached(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            return entry is not None and entry[1] > self.clock()
+
+    # Profile for user_id, fetched with users.info on a miss. None for users
+    # Slack doesn't know, or if the lookup failed.
+    def get(self, client, user_id):
+        if not user_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > self.clock():
+                self._entries.move_to_end(user_id)
+                metrics.increment("user_directory_hits" if entry[0] is not None else "user_directory_negative_hits")
+                return entry[0]
+            future = self._in_flight.get(user_id)
+            leader = future is None
+            if leader:
+                future = self._in_flight[user_id] = Future()
+        if not leader:
+            metrics.increment("user_directory_deduped")
+            try:
+                return future.result(self.fetch_timeout)
+            except Exception:
+                return None
+
+        metrics.increment("user_directory_misses")
+        profile = None
+        try:
+            profile = self._fetch(client, user_id)
+        except Exception as e:
+            logger.error("Error fetching user info for %s: %s", user_id, e)
+        finally:
+            with self._lock:
+                del self._in_flight[user_id]
+            future.set_result(profile)
+        return profile
+
+    def _fetch(self, client, user_id):
+        try:
+            response = client.users_info(user=user_id)
+        except Exception as e:
+            error_response = getattr(e, "response", None)
+            if error_response is None or error_response.get("error") != "user_not_found":
+                raise
+            with self._lock:
+                self._store(user_id, None, self.negative_ttl)
+            return None
+        profile = user_profile(response["user"])
+        with self._lock:
+            self._store(user_id, profile, self.ttl)
+        return profile
+
+    # Load every user in the workspace, page by page; returns how many were cached
+    def warm(self, client, page_size=200):
+        count = 0
+        cursor = None
+        while True:
+            response = client.users_list(limit=page_size, cursor=cursor) if cursor else client.users_list(limit=page_size)
+            profiles = [user_profile(user) for user in response.get("members", []) if not user.get("deleted")]
+            with self._lock:
+                for profile in profiles:
+                    self._store(profile["id"], profile, self.ttl)
+            count += len(profiles)
+            cursor = (response.get("response_metadata") or {}).get("next_cursor")
+            if not cursor:
+                break
+        metrics.increment("user_directory_warmed", count)
+        logger.debug("User directory warmed with %s users", count)
+        return count
+
+    # Same as warm(), logging instead of raising, for a background thread at startup
+    def warm_quietly(self, client, page_size=200):
+        try:
+            return self.warm(client, page_size)
+        except Exception as e:
+            logger.error("Error warming user directory: %s", e)
+            return 0
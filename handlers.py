@@ -0,0 +1,623 @@
+import logging
+import re
+import threading
+from slack_sdk import WebClient
+import metrics
+import profiling
+from config import (
+    HOME_FANOUT_CONCURRENCY,
+    HOME_PUBLISH_DEBOUNCE_MS,
+    HOME_PUBLISH_MAX_DELAY_MS,
+    METRICS_HOST,
+    METRICS_PORT,
+    OUTBOUND_MAX_ATTEMPTS,
+    OUTBOUND_QUEUE_SIZE,
+    OUTBOUND_WORKERS,
+    PROFILE_DIR,
+    PROFILE_FLUSH_SECONDS,
+    PROFILE_INTERVAL_MS,
+    PROFILE_LISTENERS,
+    PROFILE_SAMPLE_EVERY,
+    PROFILE_TRACEMALLOC,
+    SLACK_API_URL,
+    SLACK_BOT_TOKEN,
+    WORKERS
+)
+from coalesce import Debouncer
+from instrumentation import store_gauges
+from outbound import OutboundQueue
+from scheduler import BACKGROUND, SlackApiScheduler
+from state import (
+    InvalidSubmission,
+    change_feed,
+    expense_fields,
+    join_cluster,
+    merge_home_refresh,
+    new_expense_approval,
+    new_time_off_approval,
+    published_views,
+    reissue_home_refresh,
+    selections,
+    share_approvals,
+    share_home,
+    store,
+    time_off_fields,
+    user_directory
+)
+from query import parse_query
+from render_cache import PublishedViews
+from store import VersionConflict
+from views import (
+    apply_filter_action,
+    approval_details_modal,
+    bulk_dm_notification_message,
+    bulk_reject_modal,
+    dm_notification_message,
+    edit_approval_modal,
+    fragment_cache,
+    home_tab_page,
+    new_approval_modal,
+    new_expense_approval_modal,
+    new_time_off_approval_modal,
+    parse_versioned_value,
+    reject_modal,
+    warm_fragment
+)
+
+# The listeners of both apps. Each handler takes a request body and returns
+# a Reply; app.py runs them on the sync App and async_app.py on AsyncApp, so
+# the two modes only differ in how a listener acks and opens modals.
+# Everything after the ack (store changes, home tab publishes and DMs) is
+# the same in both, and Slack calls other than views_open are made by the
+# outbound workers. views_open never waits for rate limit capacity; if
+# there's none, the user is told on their App Home (report_busy).
+
+logger = logging.getLogger(__name__)
+
+# Every Slack API call goes through one scheduler that respects Slack's rate limits
+api_scheduler = SlackApiScheduler(workers=WORKERS)
+
+# The bot's Web API client; the outbound workers make their calls through
+# slack_client whichever app the listeners run on
+web_client = WebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_API_URL)
+slack_client = api_scheduler.wrap(web_client)
+
+# Slack calls made on behalf of listeners, so they never wait on the Slack API
+outbound_queue = OutboundQueue(
+    workers=OUTBOUND_WORKERS,
+    max_size=OUTBOUND_QUEUE_SIZE,
+    max_attempts=OUTBOUND_MAX_ATTEMPTS
+)
+
+# Home tab republishes for other users affected by a change; its worker count caps the fan-out
+fanout_queue = OutboundQueue(
+    workers=HOME_FANOUT_CONCURRENCY,
+    max_size=OUTBOUND_QUEUE_SIZE,
+    max_attempts=OUTBOUND_MAX_ATTEMPTS
+)
+
+# Store size and queue depths, read on each metrics scrape
+def collect_gauges():
+    return [
+        *store_gauges(store),
+        ("outbound_queue_depth", {"queue": "outbound"}, outbound_queue.depth()),
+        ("outbound_queue_depth", {"queue": "fanout"}, fanout_queue.depth()),
+        ("home_publish_pending", {}, home_refresh_debouncer.pending())
+    ]
+
+# What a user is told on their App Home when a modal they asked for couldn't be opened
+BUSY_NOTICE = "Slack is busy right now, so that couldn't be opened. Please try again in a moment."
+
+# What a user is told when Select All stopped at the selection limit
+SELECTION_LIMIT_NOTICE = "Only the first {limit} pending approvals were selected, the most a bulk action can take."
+
+# A notice for each user's next App Home render, cleared once it's published
+home_notices = {}
+
+# Directory lookups for a render, from what the directory already holds so
+# rendering never waits on users.info. Users it has no answer for yet are
+# added to `unknown`.
+def cached_people(unknown):
+    def people(user_id):
+        profile = user_directory.peek(user_id)
+        if profile is None and user_id and not user_directory.is_cached(user_id):
+            unknown.add(user_id)
+        return profile
+    return people
+
+# Look up users that a render of user_id's App Home had no names for, and
+# render it again if any of them turned out to have one
+def resolve_people(client, user_id, user_ids):
+    if any([user_directory.get(client, other_id) for other_id in user_ids]):
+        home_refresh_debouncer.submit(user_id, (client, None, False))
+
+# Publish a user's App Home rendered under `ticket` (see
+# PublishedViews.publishing), skipping the API call when they already have
+# this exact view or a newer render has been published since
+def publish_home(client, user_id, view, ticket, page=None, approval_ids=()):
+    view_hash = PublishedViews.view_hash(view)
+    with published_views.publishing(user_id, ticket) as newest:
+        if not newest:
+            metrics.increment("views_publish_superseded")
+            logger.debug("Home tab for user %s superseded by a newer render, skipping views_publish", user_id)
+            return None
+        if published_views.is_current(user_id, view_hash):
+            metrics.increment("views_publish_skipped")
+            logger.debug("Home tab for user %s unchanged, skipping views_publish", user_id)
+            published_views.record(user_id, view_hash, page, approval_ids)
+            return None
+        response = client.views_publish(user_id=user_id, view=view)
+        published_views.record(user_id, view_hash, page, approval_ids)
+    share_home(user_id, view_hash, page, approval_ids)
+    metrics.increment("views_publish_calls")
+    return response
+
+# Render and publish a user's App Home, by default the page they were last shown.
+# Names the directory doesn't have yet are looked up afterwards, on the
+# fan-out workers, and the App Home published again with them.
+# Errors propagate so the outbound queue can retry.
+@profiling.profiled("refresh_home_tab")
+def refresh_home_tab(client, user_id, home_filter=None, cursor=None, direction="next"):
+    if home_filter is None:
+        home_filter, cursor, direction = published_views.page(user_id) or ("all", None, "next")
+    unknown = set()
+    notice = home_notices.get(user_id)
+    ticket = published_views.ticket()
+    view, approval_ids = home_tab_page(
+        client, store, home_filter, cursor, direction, selections.get(user_id), cached_people(unknown), notice
+    )
+    if publish_home(client, user_id, view, ticket, (home_filter, cursor, direction), approval_ids) is not None:
+        logger.debug("Home tab updated for user: %s", user_id)
+    if notice is not None:
+        home_notices.pop(user_id, None)
+    if unknown:
+        fanout_queue.enqueue("resolve_people", resolve_people, client.with_priority(BACKGROUND), user_id, unknown)
+
+# Hand a debounced refresh to the outbound queue, or the fan-out queue if
+# nobody asked for it directly. Never waits for room: when the queue is
+# full the debouncer keeps the refresh and tries again.
+def issue_home_refresh(user_id, request, claim):
+    queue, name = (outbound_queue, "publish_home") if request[2] else (fanout_queue, "fan_out_home")
+    return queue.offer(name, refresh_claimed_home, user_id, claim)
+
+# Run the refresh queued for a user, as merged up to the moment it starts
+def refresh_claimed_home(user_id, claim):
+    request = claim()
+    if request is None:
+        return
+    client, page, _ = request
+    refresh_home_tab(client, user_id, *(page or ()))
+
+# Refreshes of the same user's App Home in quick succession (an approver
+# working down their queue) merge into one render and publish
+home_refresh_debouncer = Debouncer(
+    issue_home_refresh,
+    window=HOME_PUBLISH_DEBOUNCE_MS / 1000,
+    max_delay=HOME_PUBLISH_MAX_DELAY_MS / 1000,
+    merge=merge_home_refresh,
+    reissue=reissue_home_refresh,
+    name="home_publish"
+)
+
+# Queue a refresh of a user's App Home; it is rendered from the latest state when it runs
+def enqueue_home_refresh(user_id, home_filter=None, cursor=None, direction="next"):
+    page = (home_filter, cursor, direction) if home_filter is not None else None
+    home_refresh_debouncer.submit(user_id, (slack_client, page, True))
+
+# Refresh the App Home of the acting user and of everyone else who can see a
+# changed approval. The listener only queues the actor's refresh and one
+# fan-out job (refresh_affected_homes) per change, however many users it
+# reaches. `approvals` may hold None for an approval that wasn't found.
+def fan_out_home_refresh(approvals, actor_id, previous=()):
+    # Other workers drop their cached fragments for these
+    share_approvals(approvals)
+    enqueue_home_refresh(actor_id)
+    fanout_queue.enqueue("fan_out", refresh_affected_homes, approvals, actor_id, previous)
+
+# Queue a refresh for everyone but the actor who can see a changed approval:
+# its employee and requestor (before and after an edit) and anyone whose
+# current page shows it. Each changed approval is rendered once up front,
+# with the names the directory already has, so every one of those renders
+# reuses the same fragment.
+def refresh_affected_homes(approvals, actor_id, previous=()):
+    user_ids = set()
+    for approval in approvals:
+        if approval is None:
+            continue
+        warm_fragment(approval, user_directory.peek)
+        user_ids |= published_views.viewers_of(approval["id"])
+    for record in [*approvals, *previous]:
+        if record is not None:
+            user_ids.update((record.get("employee"), record.get("requestor")))
+    user_ids -= {None, "", actor_id}
+    background_client = slack_client.with_priority(BACKGROUND)
+    for user_id in user_ids:
+        home_refresh_debouncer.submit(user_id, (background_client, None, False))
+    metrics.increment("home_fanout_users", len(user_ids))
+
+# Someone else changed the approval first: leave it as they left it and
+# show this user where it stands now
+def report_conflict(user_id, conflict):
+    metrics.increment("approval_conflicts")
+    logger.info("%s, not applying the change by user %s", conflict, user_id)
+    enqueue_home_refresh(user_id)
+
+# A modal the user asked for couldn't be opened because views_open had no
+# capacity (listeners never wait for it, see scheduler.SlackBusy): tell
+# them on their App Home instead
+def report_busy(user_id, error):
+    metrics.increment("modals_busy")
+    logger.warning("Couldn't open a modal for user %s: %s", user_id, error)
+    home_notices[user_id] = BUSY_NOTICE
+    enqueue_home_refresh(user_id)
+
+# Update approval status
+def update_approval_status(approval_id, status, user_id, expected_version=None, **fields):
+    try:
+        approval = store.transition(approval_id, status, actor=user_id, expected_version=expected_version, **fields)
+    except VersionConflict as conflict:
+        report_conflict(user_id, conflict)
+        return
+    selections.set(user_id, approval_id, False)
+    fan_out_home_refresh([approval], user_id)
+    if approval is None:
+        logger.error("Approval %s not found", approval_id)
+        return
+
+    # Send DM notification, from a copy so later edits don't change what it says
+    outbound_queue.enqueue("dm_notification", send_dm_notification, slack_client, dict(approval), status)
+
+def send_dm_notification(client, approval, status):
+    employee = user_directory.get(client, approval['employee'])
+    message_blocks, text = dm_notification_message(approval, status, employee and employee["tz"])
+    client.chat_postMessage(
+        channel=approval['employee'],
+        blocks=message_blocks,
+        text=text
+    )
+
+# Decide every pending approval in approval_ids in one store transaction,
+# then refresh home tabs once and send each employee a single DM
+def apply_bulk_decision(approval_ids, status, user_id, **fields):
+    decided = []
+    with store.transaction():
+        for approval_id in approval_ids:
+            approval = store.get(approval_id)
+            # Someone may have decided or deleted it since it was selected, or be doing so now
+            if approval is None or approval["status"] != "pending":
+                continue
+            try:
+                approval = store.transition(approval_id, status, actor=user_id, expected_version=approval["version"], **fields)
+            except VersionConflict:
+                metrics.increment("approval_conflicts")
+                continue
+            if approval is not None:
+                decided.append(dict(approval))
+    logger.debug("Bulk %s: %s of %s selected approvals by user: %s", status, len(decided), len(approval_ids), user_id)
+    metrics.increment("bulk_decisions", len(decided))
+    fan_out_home_refresh(decided, user_id)
+
+    by_employee = {}
+    for approval in decided:
+        by_employee.setdefault(approval["employee"], []).append(approval)
+    for approvals in by_employee.values():
+        outbound_queue.enqueue("dm_notification", send_bulk_dm_notification, slack_client, approvals, status)
+
+def send_bulk_dm_notification(client, approvals, status):
+    employee = user_directory.get(client, approvals[0]['employee'])
+    message_blocks, text = bulk_dm_notification_message(approvals, status, employee and employee["tz"])
+    client.chat_postMessage(
+        channel=approvals[0]['employee'],
+        blocks=message_blocks,
+        text=text
+    )
+
+# What a listener does with a request: the arguments for its ack(), and
+# then() to run once Slack has the ack. then() may return a modal, which is
+# opened with the request's trigger_id.
+class Reply:
+    __slots__ = ("ack", "then")
+
+    def __init__(self, then=None, **ack):
+        self.ack = ack
+        self.then = then
+
+# App Home Opened Event
+def handle_app_home_opened(body):
+    user_id = body["event"]["user"]
+    logger.debug("App Home opened by user: %s", user_id)
+    return Reply(lambda: enqueue_home_refresh(user_id, "all"))
+
+# Button Actions
+def handle_approve(body):
+    user_id = body["user"]["id"]
+    approval_id, version = parse_versioned_value(body["actions"][0]["value"])
+    logger.debug("Approval %s approved by user: %s", approval_id, user_id)
+    return Reply(lambda: update_approval_status(approval_id, "approved", user_id, expected_version=version))
+
+def handle_reject(body):
+    user_id = body["user"]["id"]
+    approval_id, version = parse_versioned_value(body["actions"][0]["value"])
+    logger.debug("Approval %s rejected by user: %s", approval_id, user_id)
+    return Reply(lambda: reject_modal(approval_id, version))
+
+def handle_reject_submission(body):
+    user_id = body["user"]["id"]
+    state_values = body["view"]["state"]["values"]
+    approval_id = body["view"]["callback_id"].split('-')[-1]
+    version = body["view"].get("private_metadata")
+    comments = state_values["comments_input"]["comments"]["value"]
+    logger.debug("Approval %s rejection comments received", approval_id, extra={"comments": comments})
+
+    return Reply(lambda: update_approval_status(
+        approval_id,
+        "rejected",
+        user_id,
+        expected_version=int(version) if version else None,
+        comments=comments
+    ))
+
+def handle_view_details(body):
+    user_id = body["user"]["id"]
+    approval_id = body["actions"][0]["value"]
+    logger.debug("View details for approval %s requested by user: %s", approval_id, user_id)
+
+    def then():
+        approval = store.get(approval_id)
+        if approval is None:
+            logger.error("Approval %s not found", approval_id)
+            return None
+        return approval_details_modal(approval)
+    return Reply(then)
+
+def handle_overflow(body):
+    user_id = body["user"]["id"]
+    action_value = body["actions"][0]["selected_option"]["value"]
+    action, value = action_value.split('-')
+    approval_id, version = parse_versioned_value(value)
+    logger.debug("Overflow action: %s for approval %s by user: %s", action, approval_id, user_id)
+
+    def then():
+        if action == "revert":
+            try:
+                approval = store.update(approval_id, actor=user_id, expected_version=version, status="pending")
+            except VersionConflict as conflict:
+                report_conflict(user_id, conflict)
+                return None
+            if approval is not None and version is not None and approval.get("version") == version:
+                # Already pending: nothing changed, so nobody else's view has either
+                enqueue_home_refresh(user_id)
+                return None
+            fan_out_home_refresh([approval], user_id)
+        elif action == "edit":
+            approval = store.get(approval_id)
+            if approval is None:
+                logger.error("Approval %s not found", approval_id)
+                return None
+            enqueue_home_refresh(user_id)
+            return edit_approval_modal(approval)
+        elif action == "delete":
+            try:
+                approval = store.delete(approval_id, actor=user_id, expected_version=version)
+            except VersionConflict as conflict:
+                report_conflict(user_id, conflict)
+                return None
+            fragment_cache.invalidate(approval_id)
+            fan_out_home_refresh([approval], user_id)
+        return None
+    return Reply(then)
+
+def handle_new_expense_approval_submission(body):
+    user_id = body["user"]["id"]
+    state_values = body["view"]["state"]["values"]
+    try:
+        approval = new_expense_approval(state_values)
+    except InvalidSubmission as e:
+        return Reply(response_action="errors", errors=e.errors)
+    return Reply(lambda: fan_out_home_refresh([store.create(approval, actor=user_id)], user_id))
+
+def handle_new_time_off_approval_submission(body):
+    user_id = body["user"]["id"]
+    state_values = body["view"]["state"]["values"]
+    return Reply(lambda: fan_out_home_refresh([store.create(new_time_off_approval(state_values, user_id), actor=user_id)], user_id))
+
+# Dynamic handler for edit approval modals
+def handle_edit_approval_submission(body):
+    user_id = body["user"]["id"]
+    state_values = body["view"]["state"]["values"]
+    approval_id = body["view"]["callback_id"].split('-')[-1]
+    # The version the modal was opened on; modals opened before it was sent have none
+    version = body["view"].get("private_metadata")
+    approval = store.get(approval_id)
+    if approval is None:
+        logger.error("Approval %s not found", approval_id)
+        return Reply()
+    try:
+        fields = expense_fields(state_values) if approval["type"] == "expense" else time_off_fields(state_values)
+    except InvalidSubmission as e:
+        return Reply(response_action="errors", errors=e.errors)
+
+    def then():
+        try:
+            updated = store.update(approval_id, actor=user_id, expected_version=int(version) if version else None, **fields)
+        except VersionConflict as conflict:
+            report_conflict(user_id, conflict)
+            return
+        if updated is not None and updated.get("version") == approval.get("version"):
+            # Submitted without changes
+            enqueue_home_refresh(user_id)
+            return
+        fan_out_home_refresh([updated], user_id, [approval])
+    return Reply(then)
+
+# Any App Home filter control: apply the change to the filters of the page
+# the user was last shown, and go back to the first page
+# The filter of the App Home page an action was taken on, as published with
+# it (what this worker last published may be older or from another worker)
+def home_filter_of(body):
+    return body["view"].get("private_metadata") or "all"
+
+def handle_filter_approvals(body):
+    user_id = body["user"]["id"]
+    home_filter = home_filter_of(body)
+    selected_filter = apply_filter_action(home_filter, body["actions"][0])
+    logger.debug("Filter selected: %s by user: %s", selected_filter, user_id)
+    return Reply(lambda: enqueue_home_refresh(user_id, selected_filter))
+
+def handle_home_pagination(body):
+    user_id = body["user"]["id"]
+    action = body["actions"][0]
+    direction = "next" if action["action_id"] == "home_next_page" else "prev"
+    home_filter, _, cursor = action["value"].rpartition("|")
+    logger.debug("Home page %s from %s (%s) by user: %s", direction, cursor, home_filter, user_id)
+    return Reply(lambda: enqueue_home_refresh(user_id, home_filter, cursor, direction))
+
+def handle_select_approval(body):
+    user_id = body["user"]["id"]
+    action = body["actions"][0]
+    approval_id = action["block_id"].split("_", 1)[-1]
+
+    def then():
+        if not selections.set(user_id, approval_id, bool(action.get("selected_options"))):
+            logger.warning("User %s is at the bulk selection limit of %s", user_id, selections.limit)
+        enqueue_home_refresh(user_id)
+    return Reply(then)
+
+# Up to `limit` pending approvals among those a home filter shows, and
+# whether there are more. Pages the store cut short at QUERY_TIME_LIMIT are
+# followed on from their cursor, so the selection doesn't depend on how
+# long each page took.
+def pending_approvals(home_filter, limit):
+    query = {**parse_query(home_filter), "status": "pending"}
+    found, cursor = [], None
+    while True:
+        approvals, _, cursor = store.query(query, cursor, "next", limit + 1 - len(found))
+        found.extend(approvals)
+        if cursor is None or len(found) > limit:
+            return found[:limit], len(found) > limit
+
+def handle_bulk_select_all(body):
+    user_id = body["user"]["id"]
+    home_filter = home_filter_of(body)
+
+    def then():
+        pending, more = pending_approvals(home_filter, selections.limit)
+        if not selections.select_all(user_id, [approval["id"] for approval in pending]) or more:
+            logger.warning("User %s is at the bulk selection limit of %s", user_id, selections.limit)
+            home_notices[user_id] = SELECTION_LIMIT_NOTICE.format(limit=selections.limit)
+        enqueue_home_refresh(user_id)
+    return Reply(then)
+
+def handle_bulk_clear(body):
+    user_id = body["user"]["id"]
+
+    def then():
+        selections.clear(user_id)
+        enqueue_home_refresh(user_id)
+    return Reply(then)
+
+def handle_bulk_approve(body):
+    user_id = body["user"]["id"]
+    return Reply(lambda: apply_bulk_decision(selections.take(user_id), "approved", user_id))
+
+def handle_bulk_reject(body):
+    user_id = body["user"]["id"]
+
+    def then():
+        selected_count = len(selections.get(user_id))
+        if not selected_count:
+            enqueue_home_refresh(user_id)
+            return None
+        return bulk_reject_modal(selected_count)
+    return Reply(then)
+
+def handle_bulk_reject_submission(body):
+    user_id = body["user"]["id"]
+    comments = body["view"]["state"]["values"]["comments_input"]["comments"]["value"]
+    return Reply(lambda: apply_bulk_decision(selections.take(user_id), "rejected", user_id, comments=comments))
+
+def handle_actions_overflow(body):
+    user_id = body["user"]["id"]
+    selected_option = body["actions"][0]["selected_option"]["value"]
+    logger.debug("Action selected: %s by user: %s", selected_option, user_id)
+    # "edit_approval" has nothing behind it yet
+    return Reply(lambda: new_approval_modal() if selected_option == "new_approval" else None)
+
+# Swap the type picker for the chosen form in the ack, with no views_open call
+def handle_new_approval_type_selection(body):
+    state_values = body["view"]["state"]["values"]
+    approval_type = state_values["type_input"]["type"]["selected_option"]["value"]
+
+    if approval_type == "expense":
+        return Reply(response_action="update", view=new_expense_approval_modal())
+    if approval_type == "time_off":
+        return Reply(response_action="update", view=new_time_off_approval_modal())
+    return Reply()
+
+# Every listener: the Bolt decorator that registers it ("event", "action"
+# or "view"), what it matches, its name in the metrics, and its handler
+LISTENERS = [
+    ("event", "app_home_opened", "app_home_opened", handle_app_home_opened),
+    ("action", "approve", "approve", handle_approve),
+    ("action", "reject", "reject", handle_reject),
+    ("view", re.compile(r"reject_modal-\d+"), "reject_modal", handle_reject_submission),
+    ("action", "view_details", "view_details", handle_view_details),
+    ("action", "overflow", "overflow", handle_overflow),
+    ("view", "new_expense_approval_modal", "new_expense_approval_modal", handle_new_expense_approval_submission),
+    ("view", "new_time_off_approval_modal", "new_time_off_approval_modal", handle_new_time_off_approval_submission),
+    ("view", re.compile(r"edit_approval_modal-\d+"), "edit_approval_modal", handle_edit_approval_submission),
+    ("action", re.compile(r"^filter_"), "filter_approvals", handle_filter_approvals),
+    ("action", re.compile(r"home_(next|prev)_page"), "home_pagination", handle_home_pagination),
+    ("action", "select_approval", "select_approval", handle_select_approval),
+    ("action", "bulk_select_all", "bulk_select_all", handle_bulk_select_all),
+    ("action", "bulk_clear", "bulk_clear", handle_bulk_clear),
+    ("action", "bulk_approve", "bulk_approve", handle_bulk_approve),
+    ("action", "bulk_reject", "bulk_reject", handle_bulk_reject),
+    ("view", "bulk_reject_modal", "bulk_reject_modal", handle_bulk_reject_submission),
+    ("action", "actions_overflow", "actions_overflow", handle_actions_overflow),
+    ("view", "new_approval_modal", "new_approval_modal", handle_new_approval_type_selection)
+]
+
+# The LISTENERS name of the listener a request is for, as Bolt would match
+# it, or None if none is
+def listener_name(body):
+    if body.get("type") == "event_callback":
+        kind, key = "event", body.get("event", {}).get("type")
+    elif body.get("type") == "block_actions":
+        kind, key = "action", (body.get("actions") or [{}])[0].get("action_id")
+    elif body.get("type") == "view_submission":
+        kind, key = "view", body.get("view", {}).get("callback_id")
+    else:
+        return None
+    if key is None:
+        return None
+    for listener_kind, matcher, name, _ in LISTENERS:
+        if listener_kind == kind and (matcher == key if isinstance(matcher, str) else matcher.search(key)):
+            return name
+    return None
+
+# Everything a worker runs besides its Socket Mode connection: the cluster
+# feed, the metrics endpoint, the profiler and a background load of the user
+# directory (until it's done, renders look up the names they're missing
+# afterwards)
+def start_services():
+    if change_feed is not None:
+        join_cluster(change_feed)
+    metrics.register_collector(collect_gauges)
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT, METRICS_HOST)
+    if PROFILE_DIR:
+        profiling.configure(
+            PROFILE_DIR,
+            [name.strip() for name in PROFILE_LISTENERS.split(",") if name.strip()],
+            sample_every=PROFILE_SAMPLE_EVERY,
+            interval=PROFILE_INTERVAL_MS / 1000,
+            trace_allocations=PROFILE_TRACEMALLOC,
+            flush_interval=PROFILE_FLUSH_SECONDS
+        )
+    threading.Thread(
+        target=user_directory.warm_quietly,
+        args=(slack_client.with_priority(BACKGROUND),),
+        name="user-directory-warm",
+        daemon=True
+    ).start()
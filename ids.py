@@ -0,0 +1,63 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Custom epoch (2024-01-01 UTC) keeps the IDs short
+EPOCH_MS = 1704067200000
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+
+
+# Snowflake-style ID allocator: milliseconds since EPOCH_MS, then the worker
+# ID, then a per-millisecond sequence. Workers with distinct IDs never hand
+# out the same value, so several processes can allocate without talking to
+# each other. IDs only ever increase within a worker; if the clock steps
+# backwards or the sequence runs out, the allocator borrows the next
+# millisecond instead of waiting or repeating.
+class SnowflakeIdAllocator:
+    def __init__(self, worker_id, epoch_ms=EPOCH_MS, clock=time.time):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}, got {worker_id}")
+        self.worker_id = worker_id
+        self.epoch_ms = epoch_ms
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self):
+        with self._lock:
+            now_ms = int(self._clock() * 1000)
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    self._last_ms += 1
+            return (
+                ((self._last_ms - self.epoch_ms) << (WORKER_ID_BITS + SEQUENCE_BITS))
+                | (self.worker_id << SEQUENCE_BITS)
+                | self._sequence
+            )
+
+
+# Worker ID from the WORKER_ID environment variable. Without it the process ID
+# is used, which two processes can share, so that's logged as a warning when
+# the store is `shared` (other processes could write to it too).
+def worker_id_from_env(shared=False):
+    worker_id = os.getenv("WORKER_ID")
+    if worker_id is not None:
+        return int(worker_id)
+    worker_id = os.getpid() & MAX_WORKER_ID
+    if shared:
+        logger.warning(
+            "WORKER_ID is not set, using %s from the process ID; approval IDs can collide "
+            "if another process writes to the same store", worker_id
+        )
+    return worker_id
@@ -0,0 +1,119 @@
+import functools
+import inspect
+import time
+
+from slack_bolt.context.ack import Ack
+from slack_bolt.context.ack.async_ack import AsyncAck
+
+import metrics
+import profiling
+
+
+# HTTP status of a failed Slack API call, "error" for network errors and timeouts
+def _error_status(error):
+    return str(getattr(getattr(error, "response", None), "status_code", None) or "error")
+
+
+# Count and time one Web API call, and its failure if it raised
+def record_slack_call(api_method, seconds, error=None):
+    metrics.increment("slack_api_calls", method=api_method)
+    metrics.observe("slack_api_call_seconds", seconds, method=api_method)
+    if error is not None:
+        metrics.increment("slack_api_errors", method=api_method, status=_error_status(error))
+
+
+# ack() that remembers when the request came in and when it was acknowledged
+class TimedAck(Ack):
+    def __init__(self):
+        super().__init__()
+        self.received_at = time.perf_counter()
+        self.acked_at = None
+
+    def __call__(self, *args, **kwargs):
+        if self.acked_at is None:
+            self.acked_at = time.perf_counter()
+        return super().__call__(*args, **kwargs)
+
+
+class AsyncTimedAck(AsyncAck):
+    def __init__(self):
+        super().__init__()
+        self.received_at = time.perf_counter()
+        self.acked_at = None
+
+    async def __call__(self, *args, **kwargs):
+        if self.acked_at is None:
+            self.acked_at = time.perf_counter()
+        return await super().__call__(*args, **kwargs)
+
+
+# Global middleware, so each request's ack() records its timing
+def use_timed_ack(context, next):
+    context["ack"] = TimedAck()
+    next()
+
+
+async def use_async_timed_ack(context, next):
+    context["ack"] = AsyncTimedAck()
+    await next()
+
+
+# Global middleware profiling each request picked for sampling, under the
+# name listener_name(body) gives it (see profiling.start_request): the
+# middleware after it, the ack and the listener, lazy listeners included.
+# Threaded mode only; profiles are thread stack samples.
+def profile_requests(listener_name):
+    def middleware(body, next):
+        profiling.start_request(listener_name(body))
+        next()
+    return middleware
+
+
+# Times run from the request arriving, or for listeners that take no ack
+# (events are acked for them) from when the listener started
+def _observe_listener(name, ack, started, failed):
+    finished = time.perf_counter()
+    received_at = getattr(ack, "received_at", started)
+    if getattr(ack, "acked_at", None) is not None:
+        metrics.observe("listener_ack_seconds", ack.acked_at - received_at, listener=name)
+    metrics.observe("listener_duration_seconds", finished - received_at, listener=name)
+    if failed:
+        metrics.increment("listener_errors", listener=name)
+
+
+# Record a listener's ack latency and total duration (from the request
+# arriving) under `name`. Goes beneath the @app.action/@app.view decorator;
+# Bolt still sees the listener's own arguments.
+def timed_listener(name):
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_async(**kwargs):
+                started = time.perf_counter()
+                failed = True
+                try:
+                    result = await func(**kwargs)
+                    failed = False
+                    return result
+                finally:
+                    _observe_listener(name, kwargs.get("ack"), started, failed)
+            return timed_async
+
+        @functools.wraps(func)
+        def timed(**kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = func(**kwargs)
+                failed = False
+                return result
+            finally:
+                _observe_listener(name, kwargs.get("ack"), started, failed)
+        return timed
+    return decorate
+
+
+# Approvals in each status, as gauges for a metrics collector
+def store_gauges(store):
+    return [("approvals", {"status": status}, count) for status, count in store.count_by_status().items()]
+
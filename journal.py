@@ -0,0 +1,346 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+from config import DEFAULT_CURRENCY
+from money import normalize_amounts
+from store import PAGE_SIZE, ApprovalStore, BaseApprovalStore
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = "journal-{:012d}.jsonl"
+SNAPSHOT_PATTERN = "snapshot-{:012d}.jsonl"
+
+
+def _sequence_of(path):
+    return int(os.path.basename(path).split("-")[1].split(".")[0])
+
+
+def _segments(directory):
+    return sorted(glob.glob(os.path.join(directory, "journal-*.jsonl")), key=_sequence_of)
+
+
+def _snapshots(directory):
+    return sorted(glob.glob(os.path.join(directory, "snapshot-*.jsonl")), key=_sequence_of)
+
+
+def _fsync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# Cut off a partial last line left by a crash mid-write, so appends start on a fresh line
+def _truncate_torn_tail(path):
+    with open(path, "rb+") as segment:
+        end = segment.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            segment.seek(position)
+            newline = segment.read(step).rfind(b"\n")
+            if newline != -1:
+                position += newline + 1
+                break
+        if position != end:
+            logger.warning("Truncating torn journal line in %s", path)
+            segment.truncate(position)
+
+
+# Events in sequence order from every journal segment in a directory,
+# skipping those up to `after`. A torn last line from a crash mid-write is
+# ignored.
+def read_events(directory, after=0):
+    segments = _segments(directory)
+    for i, path in enumerate(segments):
+        # Segments are named after their first event; skip any that end before `after`
+        if i + 1 < len(segments) and _sequence_of(segments[i + 1]) <= after + 1:
+            continue
+        with open(path, "rb") as segment:
+            for line in segment:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    logger.warning("Ignoring torn journal line in %s", path)
+                    break
+                if event["seq"] > after:
+                    yield event
+
+
+# Every journaled change to one approval, oldest first
+def audit_trail(directory, approval_id):
+    return [event for event in read_events(directory) if event["id"] == approval_id]
+
+
+# Append-only log of approval changes. Appends go to an in-memory buffer
+# that a background thread writes and fsyncs every fsync_interval seconds,
+# so one fsync covers every change made in that window; sync() waits for a
+# change to be durable. Segments are rotated at each snapshot and kept, so
+# the journal is also the audit trail.
+class EventJournal:
+    def __init__(self, directory, last_seq=0, fsync_interval=0.05):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer = []
+        self._seq = last_seq
+        self._durable_seq = last_seq
+        self._file = None
+        self._closed = False
+        self._thread = None
+        segments = _segments(directory)
+        if segments:
+            _truncate_torn_tail(segments[-1])
+        self._open_segment(segments[-1] if segments else os.path.join(directory, SEGMENT_PATTERN.format(last_seq + 1)))
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def _open_segment(self, path):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(path, "ab")
+        _fsync_directory(self.directory)
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="journal-fsync", daemon=True)
+            self._thread.start()
+
+    # Record one change; returns its sequence number
+    def append(self, op, approval_id, actor=None, **data):
+        with self._lock:
+            self._start()
+            self._seq += 1
+            event = {"seq": self._seq, "at": round(time.time(), 3), "op": op, "id": approval_id, "actor": actor, **data}
+            self._buffer.append(json.dumps(event, separators=(",", ":")).encode("utf-8") + b"\n")
+            return self._seq
+
+    # Write and fsync everything appended so far
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+                seq = self._seq
+            if lines:
+                self._file.write(b"".join(lines))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                metrics.increment("journal_fsyncs")
+                metrics.increment("journal_events_written", len(lines))
+            self._durable_seq = seq
+
+    # Block until the change with this sequence number (default: the latest) is on disk
+    def sync(self, seq=None):
+        seq = self._seq if seq is None else seq
+        if self._durable_seq < seq:
+            self.flush()
+
+    # Start a new segment for events after `seq`, once they're all flushed
+    def rotate(self, seq):
+        self.flush()
+        with self._flush_lock:
+            self._open_segment(os.path.join(self.directory, SEGMENT_PATTERN.format(seq + 1)))
+
+    def close(self):
+        self._closed = True
+        self.flush()
+        self._file.close()
+
+    def _run(self):
+        while not self._closed:
+            time.sleep(self.fsync_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Error flushing approval journal: %s", e)
+
+
+# Approvals as of a snapshot, written atomically: a header line with the
+# sequence number it covers, then one approval per line
+def write_snapshot(directory, seq, approvals, keep=2):
+    path = os.path.join(directory, SNAPSHOT_PATTERN.format(seq))
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as snapshot:
+        snapshot.write(json.dumps({"seq": seq, "count": len(approvals)}).encode("utf-8") + b"\n")
+        for approval in approvals:
+            snapshot.write(json.dumps(approval, separators=(",", ":")).encode("utf-8") + b"\n")
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temp_path, path)
+    _fsync_directory(directory)
+    # Older snapshots are superseded; the journal segments stay for auditing
+    for old_path in _snapshots(directory)[:-keep]:
+        os.remove(old_path)
+    metrics.increment("journal_snapshots")
+    return path
+
+
+# Load the latest snapshot into store and replay the journal after it.
+# Returns the sequence number of the last event applied.
+def recover(directory, store):
+    seq = 0
+    snapshots = _snapshots(directory)
+    if snapshots:
+        with open(snapshots[-1], "rb") as snapshot:
+            seq = json.loads(snapshot.readline())["seq"]
+            for line in snapshot:
+                store.create(json.loads(line))
+    replayed = 0
+    for event in read_events(directory, after=seq):
+        apply_event(store, event)
+        seq = event["seq"]
+        replayed += 1
+    logger.debug("Recovered %s approvals from %s, replayed %s journal events", len(store), directory, replayed)
+    return seq
+
+
+def apply_event(store, event):
+    op = event["op"]
+    if op == "create":
+        store.create(event["approval"])
+    elif op == "update":
+        store.update(event["id"], **event["fields"])
+    elif op == "delete":
+        store.delete(event["id"])
+
+
+# A store holding the approvals in store with expense amounts from before
+# they were stored as numbers parsed into minor units, or None if none were
+def normalized_store(store, default_currency=DEFAULT_CURRENCY):
+    approvals = store.filter("all")
+    normalized = [normalize_amounts(approval, default_currency) for approval in approvals]
+    if not any(normalized):
+        return None
+    return ApprovalStore([
+        approval if approval is not None else original
+        for approval, original in zip(normalized, approvals)
+    ])
+
+
+# In-memory approval store whose every change is written to an EventJournal
+# first. It is rebuilt at startup from the latest snapshot plus the journal
+# after it, and snapshots itself every snapshot_every events.
+class JournaledApprovalStore(BaseApprovalStore):
+    def __init__(self, directory, approvals=None, fsync_interval=0.05, snapshot_every=100000,
+                 default_currency=DEFAULT_CURRENCY):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+        self._store = ApprovalStore()
+        last_seq = recover(directory, self._store)
+        self._snapshot_seq = _sequence_of(_snapshots(directory)[-1]) if _snapshots(directory) else 0
+        self.journal = EventJournal(directory, last_seq, fsync_interval)
+        # Serialises changes with their journal entries, and with snapshot copies
+        self._write_lock = threading.RLock()
+        self._snapshotting = False
+        # Migrated approvals are snapshotted straight away, so the text amounts
+        # in the journal before them are never replayed again
+        migrated = normalized_store(self._store, default_currency)
+        if migrated is not None:
+            self._store = migrated
+            self.snapshot()
+        if approvals and len(self._store) == 0:
+            with self.transaction():
+                for approval in approvals:
+                    self.create(approval)
+
+    def __len__(self):
+        return len(self._store)
+
+    def __contains__(self, approval_id):
+        return approval_id in self._store
+
+    # Changes made inside are fsynced together when it exits
+    @contextmanager
+    def transaction(self):
+        with self._write_lock:
+            yield self
+        self.journal.sync()
+
+    def get(self, approval_id):
+        return self._store.get(approval_id)
+
+    def create(self, approval, actor=None):
+        with self._write_lock:
+            approval = self._store.create(approval)
+            self.journal.append("create", approval["id"], actor, approval=approval)
+        self._maybe_snapshot()
+        return approval
+
+    # Updates that change nothing aren't journaled
+    def update(self, approval_id, actor=None, expected_version=None, **fields):
+        with self._write_lock:
+            current = self._store.get(approval_id)
+            approval = self._store.update(approval_id, expected_version=expected_version, **fields)
+            if approval is not None and approval is not current:
+                self.journal.append("update", approval_id, actor, fields=fields)
+        self._maybe_snapshot()
+        return approval
+
+    def delete(self, approval_id, actor=None, expected_version=None):
+        with self._write_lock:
+            approval = self._store.delete(approval_id, expected_version=expected_version)
+            if approval is not None:
+                self.journal.append("delete", approval_id, actor)
+        self._maybe_snapshot()
+        return approval
+
+    def filter(self, status="all"):
+        return self._store.filter(status)
+
+    def by_employee(self, user_id):
+        return self._store.by_employee(user_id)
+
+    def count_by_status(self):
+        return self._store.count_by_status()
+
+    def by_requestor(self, user_id):
+        return self._store.by_requestor(user_id)
+
+    def queue_stats(self):
+        return self._store.queue_stats()
+
+    def page(self, status="all", cursor=None, direction="next", limit=PAGE_SIZE):
+        return self._store.page(status, cursor, direction, limit)
+
+    def query(self, query, cursor=None, direction="next", limit=PAGE_SIZE):
+        return self._store.query(query, cursor, direction, limit)
+
+    def _maybe_snapshot(self):
+        with self._write_lock:
+            if self._snapshotting or self.journal.seq - self._snapshot_seq < self.snapshot_every:
+                return
+            self._snapshotting = True
+        threading.Thread(target=self.snapshot, name="journal-snapshot", daemon=True).start()
+
+    # Write a snapshot of the current approvals and start a new journal
+    # segment. Writers wait only while the approvals are copied.
+    def snapshot(self):
+        try:
+            with self._write_lock:
+                seq = self.journal.seq
+                approvals = [dict(approval) for approval in self._store.filter("all")]
+                self.journal.rotate(seq)
+            started = time.perf_counter()
+            write_snapshot(self.directory, seq, approvals)
+            self._snapshot_seq = seq
+            logger.debug("Snapshot of %s approvals at event %s in %.2fs", len(approvals), seq, time.perf_counter() - started)
+        except Exception as e:
+            logger.error("Error writing approval snapshot: %s", e)
+        finally:
+            self._snapshotting = False
+
+    def close(self):
+        self.journal.close()
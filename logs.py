@@ -0,0 +1,134 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Slack tokens, masked wherever they appear in a log line
+TOKEN_PATTERN = re.compile(r"\b(xox[abeoprs]|xapp)-[A-Za-z0-9-]+")
+# extra= fields whose values never reach the log
+REDACTED_FIELDS = frozenset(("token", "comments", "text", "blocks", "view"))
+# Attributes every LogRecord has, so anything else came from extra=
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# The QueueListener writing log lines, once configure() has run
+_listener = None
+
+
+# Mask tokens and cut a line down to `limit` characters (0 for no limit)
+def redact(text, limit=0):
+    text = TOKEN_PATTERN.sub(r"\1-[redacted]", text)
+    if limit and len(text) > limit:
+        text = f"{text[:limit]}... [{len(text) - limit} more characters]"
+    return text
+
+
+# One JSON object per line: time, level, logger, thread, message, any extra=
+# fields and the traceback, if any
+class JsonFormatter(logging.Formatter):
+    def __init__(self, max_length=0):
+        super().__init__()
+        self.max_length = max_length
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": redact(record.getMessage(), self.max_length)
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = "[redacted]" if key in REDACTED_FIELDS else value
+        if record.exc_info:
+            entry["exception"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str)
+
+
+# Plain text lines, with the same redaction as the JSON ones
+class TextFormatter(logging.Formatter):
+    def __init__(self, max_length=0):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s")
+        self.max_length = max_length
+
+    def format(self, record):
+        return redact(super().format(record), self.max_length)
+
+
+# Lets through one in `every` DEBUG records from each call site, and
+# everything at INFO and above
+class DebugSampler(logging.Filter):
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self._lock = threading.Lock()
+        self._seen = Counter()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            seen = self._seen[key]
+            self._seen[key] = seen + 1
+        return seen % self.every == 0
+
+
+# QueueHandler that leaves formatting to the listener thread. The stdlib one
+# formats in the logging thread so records can be pickled; ours stay in
+# process, so the message template and its arguments are queued as logged
+# (and so must not be mutated afterwards, which the app's never are).
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        return record
+
+
+# "slack_sdk=WARNING,approvals=DEBUG" -> {"slack_sdk": "WARNING", "approvals": "DEBUG"}
+def parse_levels(spec):
+    levels = {}
+    for part in (spec or "").split(","):
+        name, _, level = part.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+# Route all logging through a queue to a thread that formats and writes it,
+# so listener threads only pay for building a record. `levels` sets
+# per-logger levels over the root `level`, `format` is "json" or "text",
+# and DEBUG lines are sampled one in debug_sample_every per call site.
+def configure(level="INFO", levels="", format="json", debug_sample_every=1, max_length=0, stream=None):
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter(max_length) if format == "json" else TextFormatter(max_length))
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    if debug_sample_every > 1:
+        handler.addFilter(DebugSampler(debug_sample_every))
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name, name_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(name_level)
+
+    if _listener is None:
+        atexit.register(_stop)
+    _listener = logging.handlers.QueueListener(handler.queue, output)
+    _listener.start()
+    return _listener
+
+
+# Write out whatever is still queued
+def _stop():
+    if _listener is not None:
+        _listener.stop()
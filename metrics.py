@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds, in seconds for latencies
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+# (name, labels) -> value, labels being a sorted tuple of (label, value) pairs
+_counters = {}
+# (name, labels) -> [count per bucket, sum, count]
+_histograms = {}
+_buckets = {}
+# Functions called on each scrape, returning (name, labels dict, value) gauges
+_collectors = []
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _series(name, labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return name
+    return name + "{" + ",".join(f'{label}="{_escape(value)}"' for label, value in pairs) + "}"
+
+
+# Add to a named counter, optionally labelled (method="views.publish")
+def increment(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+# Current value of every counter, labelled ones under their series name
+def counters():
+    with _lock:
+        return {_series(name, labels): value for (name, labels), value in _counters.items()}
+
+
+# Record one observation in a histogram. A histogram keeps the buckets it
+# was first observed with.
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    key = _key(name, labels)
+    with _lock:
+        bounds = _buckets.setdefault(name, buckets)
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * len(bounds), 0.0, 0]
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                histogram[0][i] += 1
+                break
+        histogram[1] += value
+        histogram[2] += 1
+
+
+# Observe how long the block takes, in seconds
+@contextmanager
+def timer(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+# Count, sum and cumulative bucket counts of a histogram series, None if never observed
+def histogram(name, **labels):
+    key = _key(name, labels)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            return None
+        cumulative, total = [], 0
+        for count in entry[0]:
+            total += count
+            cumulative.append(total)
+        return {"buckets": dict(zip(_buckets[name], cumulative)), "sum": entry[1], "count": entry[2]}
+
+
+# Call `collect` on every scrape for gauges that are cheaper to read than to track
+def register_collector(collect):
+    with _lock:
+        _collectors.append(collect)
+
+
+# Every metric in the Prometheus text exposition format
+def render():
+    with _lock:
+        counter_items = sorted(_counters.items())
+        histogram_items = sorted((key, ([*entry[0]], entry[1], entry[2])) for key, entry in _histograms.items())
+        buckets = dict(_buckets)
+        collectors = list(_collectors)
+
+    lines = []
+    typed = set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in counter_items:
+        declare(f"{name}_total", "counter")
+        lines.append(f"{_series(name + '_total', labels)} {value}")
+    for (name, labels), (counts, total, count) in histogram_items:
+        declare(name, "histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(buckets[name], counts):
+            cumulative += bucket_count
+            lines.append(f"{_series(name + '_bucket', labels, (('le', bound),))} {cumulative}")
+        lines.append(f"{_series(name + '_bucket', labels, (('le', '+Inf'),))} {count}")
+        lines.append(f"{_series(name + '_sum', labels)} {total}")
+        lines.append(f"{_series(name + '_count', labels)} {count}")
+    for collect in collectors:
+        try:
+            gauges = sorted((name, tuple(sorted(labels.items())), value) for name, labels, value in collect())
+        except Exception as e:
+            logger.error("Error collecting metrics: %s", e)
+            continue
+        for name, labels, value in gauges:
+            declare(name, "gauge")
+            lines.append(f"{_series(name, labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        payload = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Serve /metrics for Prometheus from a background thread; returns the server
+def serve(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%s/metrics", host, server.server_address[1])
+    return server
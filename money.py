@@ -0,0 +1,100 @@
+import re
+
+from config import DEFAULT_CURRENCY
+
+# ISO 4217 code -> (digits after the decimal point, symbol shown before amounts)
+CURRENCIES = {
+    "AUD": (2, "$"),
+    "CAD": (2, "$"),
+    "CHF": (2, ""),
+    "CNY": (2, "¥"),
+    "EUR": (2, "€"),
+    "GBP": (2, "£"),
+    "HKD": (2, "$"),
+    "INR": (2, "₹"),
+    "JPY": (0, "¥"),
+    "KRW": (0, "₩"),
+    "NZD": (2, "$"),
+    "SGD": (2, "$"),
+    "USD": (2, "$")
+}
+
+# Symbols that name one currency; "$" and "¥" mean the default currency, if it uses them
+_SYMBOL_CURRENCIES = {"€": "EUR", "£": "GBP", "₹": "INR", "₩": "KRW"}
+
+# "AUD $1,250.50", "$1,250.50", "1250.5 usd", "€20", "JPY 1500"
+AMOUNT_PATTERN = re.compile(
+    r"^\s*(?P<code>[A-Za-z]{3})?\s*(?P<symbol>[^\w\s.,-]+)?\s*"
+    r"(?P<number>\d[\d,]*(?:\.\d*)?|\.\d+)\s*(?P<suffix>[A-Za-z]{3})?\s*$"
+)
+
+# Larger amounts are almost certainly typos, and beyond what a float keeps exactly
+MAX_MINOR_UNITS = 10 ** 15
+
+
+# An amount that couldn't be read; the message is shown to the user as is
+class AmountError(ValueError):
+    pass
+
+
+# (integer minor units, ISO currency code) from an amount as a user typed it
+def parse_amount(text, default_currency=DEFAULT_CURRENCY):
+    match = AMOUNT_PATTERN.match(text or "")
+    if not match:
+        raise AmountError("Enter an amount like 1,250.00 or AUD $1,250.00")
+    codes = {code.upper() for code in (match["code"], match["suffix"]) if code}
+    symbol = match["symbol"]
+    if symbol in _SYMBOL_CURRENCIES:
+        codes.add(_SYMBOL_CURRENCIES[symbol])
+    if len(codes) > 1:
+        raise AmountError(f"Use one currency, not {' and '.join(sorted(codes))}")
+    currency = codes.pop() if codes else default_currency
+    if currency not in CURRENCIES:
+        raise AmountError(f"{currency} isn't a supported currency")
+    digits, currency_symbol = CURRENCIES[currency]
+    if symbol and symbol not in _SYMBOL_CURRENCIES and symbol != currency_symbol:
+        raise AmountError(f"Add a currency code, {symbol} could mean several")
+    whole, _, fraction = match["number"].replace(",", "").partition(".")
+    if len(fraction) > digits:
+        raise AmountError(f"{currency} amounts are whole numbers" if not digits else f"{currency} amounts have at most {digits} decimal places")
+    minor = int(whole or "0") * 10 ** digits + int(fraction.ljust(digits, "0") or "0")
+    if minor > MAX_MINOR_UNITS:
+        raise AmountError("That amount is too large")
+    return minor, currency
+
+
+# "AUD $1,250.50" for 125050 AUD
+def format_amount(minor, currency):
+    digits, symbol = CURRENCIES.get(currency, (2, ""))
+    if not digits:
+        return f"{currency} {symbol}{minor:,}"
+    major, fraction = divmod(minor, 10 ** digits)
+    return f"{currency} {symbol}{major:,}.{fraction:0{digits}d}"
+
+
+# An approval's amount or total ("amount" or "total") for display, or the
+# text as entered for one whose amounts couldn't be read when it was migrated
+def display_amount(approval, field="amount"):
+    minor = approval.get(f"{field}_minor")
+    if minor is None:
+        return approval.get(field) or ""
+    return format_amount(minor, approval.get("currency"))
+
+
+# A copy of an expense approval from before amounts were stored as numbers,
+# with "amount" and "total" replaced by amount_minor, total_minor and
+# currency. None when it needs no change, or when its amounts can't be read
+# (they're left as text, and displayed as entered).
+def normalize_amounts(approval, default_currency=DEFAULT_CURRENCY):
+    if approval.get("type") != "expense" or "amount_minor" in approval or "amount" not in approval:
+        return None
+    try:
+        amount, currency = parse_amount(approval["amount"], default_currency)
+        total, total_currency = parse_amount(approval.get("total") or approval["amount"], currency)
+    except AmountError:
+        return None
+    if total_currency != currency:
+        return None
+    normalized = {key: value for key, value in approval.items() if key not in ("amount", "total")}
+    normalized.update(amount_minor=amount, total_minor=total, currency=currency)
+    return normalized
@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    __slots__ = ("name", "func", "args", "kwargs", "attempts")
+
+    def __init__(self, name, func, args, kwargs):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.attempts = 0
+
+
+# HTTP status of a failed Slack API call, None for network errors and timeouts
+def _status_code(error):
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+
+# Seconds Slack asked us to wait before retrying, if it said
+def retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# Rate limits, server errors and network failures are worth retrying;
+# other API errors (channel_not_found, invalid_arguments, ...) are not
+def is_retryable(error):
+    status = _status_code(error)
+    return status is None or status == 429 or status >= 500
+
+
+# Bounded queue of outbound Slack calls drained by a pool of worker threads,
+# so listeners only mutate state and enqueue. Failed jobs are retried with
+# jittered exponential backoff (or after Retry-After) and land in
+# dead_letters once they run out of attempts. Workers start on first use.
+class OutboundQueue:
+    def __init__(
+        self,
+        workers=4,
+        max_size=10000,
+        max_attempts=5,
+        base_delay=0.5,
+        max_delay=30.0,
+        enqueue_timeout=0.1,
+        dead_letter_size=1000,
+        retryable=is_retryable
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.enqueue_timeout = enqueue_timeout
+        self.retryable = retryable
+        self.dead_letters = deque(maxlen=dead_letter_size)
+        self._queue = queue.Queue(maxsize=max_size)
+        # Jobs waiting out their backoff: heap of (due, sequence, job)
+        self._delayed = []
+        self._delayed_condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stopping = False
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                self._threads.append(threading.Thread(target=self._work, name=f"outbound-{i}", daemon=True))
+            self._threads.append(threading.Thread(target=self._release_delayed, name="outbound-retry", daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=5):
+        with self._start_lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        with self._delayed_condition:
+            self._stopping = True
+            self._delayed_condition.notify_all()
+        for _ in range(self.workers):
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    # Queue a call; returns False if the queue stayed full for enqueue_timeout
+    def enqueue(self, name, func, *args, **kwargs):
+        self.start()
+        job = Job(name, func, args, kwargs)
+        try:
+            self._queue.put(job, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._dead_letter(job, "outbound queue full")
+            return False
+        metrics.increment("outbound_enqueued")
+        return True
+
+    # Queue a call only if there's room right now; returns False otherwise,
+    # without dead-lettering it, for callers that keep the work and try again
+    def offer(self, name, func, *args, **kwargs):
+        self.start()
+        try:
+            self._queue.put_nowait(Job(name, func, args, kwargs))
+        except queue.Full:
+            metrics.increment("outbound_refused")
+            return False
+        metrics.increment("outbound_enqueued")
+        return True
+
+    # Jobs queued or waiting to be retried
+    def depth(self):
+        with self._delayed_condition:
+            return self._queue.qsize() + len(self._delayed)
+
+    # Wait until every queued and retrying job has finished
+    def drain(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while self.depth() or self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def backoff(self, attempts, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempts - 1)))
+        return max(delay, retry_after(error) or 0)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                job.func(*job.args, **job.kwargs)
+                metrics.increment("outbound_completed")
+            except Exception as e:
+                self._failed(job, e)
+            finally:
+                self._queue.task_done()
+
+    def _failed(self, job, error):
+        job.attempts += 1
+        if job.attempts >= self.max_attempts or not self.retryable(error):
+            self._dead_letter(job, error)
+            return
+        delay = self.backoff(job.attempts, error)
+        logger.warning("Outbound %s failed (%s), retry %s in %.2fs", job.name, error, job.attempts, delay)
+        metrics.increment("outbound_retried")
+        with self._delayed_condition:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._sequence), job))
+            self._delayed_condition.notify()
+
+    def _release_delayed(self):
+        with self._delayed_condition:
+            while not self._stopping:
+                if not self._delayed:
+                    self._delayed_condition.wait()
+                    continue
+                wait = self._delayed[0][0] - time.monotonic()
+                if wait > 0:
+                    self._delayed_condition.wait(wait)
+                    continue
+                _, _, job = heapq.heappop(self._delayed)
+                try:
+                    self._queue.put_nowait(job)
+                except queue.Full:
+                    self._dead_letter(job, "outbound queue full")
+
+    def _dead_letter(self, job, error):
+        logger.error("Outbound %s dropped after %s attempt(s): %s", job.name, job.attempts, error)
+        metrics.increment("outbound_dead_lettered")
+        self.dead_letters.append({
+            "name": job.name,
+            "args": job.args,
+            "kwargs": job.kwargs,
+            "attempts": job.attempts,
+            "error": str(error),
+            "failed_at": time.time()
+        })
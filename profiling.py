@@ -0,0 +1,342 @@
+import contextvars
+import functools
+import glob
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Allocation sites listed per flush
+TOP_ALLOCATION_SITES = 50
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+# One thread's stack, outermost call first, as a collapsed-stack line
+def _collapsed_stack(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+# A sampled run of `name`: a request or background job, on however many
+# threads it reaches. It ends when nothing holds it any more (see
+# SamplingProfiler.hold); it starts held by whoever began it.
+class Run:
+    def __init__(self, name, traced_before):
+        self.name = name
+        self.traced_before = traced_before
+        self.holds = 1
+        self.ended = False
+
+
+# The run the current request or job is being sampled under, if any
+current_run = contextvars.ContextVar("current_run", default=None)
+
+# Per dispatch thread, the request run it is handing off (see start_request)
+_dispatch = threading.local()
+
+
+# Opt-in sampling profiler for requests and background jobs. Every
+# sample_every-th run of an allowlisted name has the stacks of the threads
+# working on it sampled every `interval` seconds. Samples are aggregated per
+# name and written every flush_interval seconds as collapsed stacks (for
+# flamegraph.pl or speedscope), keeping the newest `keep` files of each. With
+# trace_allocations, tracemalloc also runs: each sampled run records how much
+# traced memory grew while it ran (other threads included), and each flush
+# writes the lines that allocated most since the last one. Snapshot diffs
+# take seconds with the app loaded, so they happen on flush, not per run.
+class SamplingProfiler:
+    def __init__(
+        self,
+        directory,
+        names=("*",),
+        sample_every=100,
+        interval=0.005,
+        trace_allocations=False,
+        flush_interval=60,
+        keep=48
+    ):
+        self.directory = directory
+        self.names = set(names)
+        self.sample_every = max(1, sample_every)
+        self.interval = interval
+        self.trace_allocations = trace_allocations
+        self.flush_interval = flush_interval
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._runs = Counter()
+        # thread ID -> name being sampled on it
+        self._active = {}
+        # name -> Counter of collapsed stack -> samples
+        self._stacks = {}
+        # name -> [sampled runs, traced bytes gained while they ran]
+        self._allocations = {}
+        self._last_snapshot = None
+        self._threads = []
+        if trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._last_snapshot = self._snapshot()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True),
+                threading.Thread(target=self._flush_loop, name="profiler-flush", daemon=True)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    # Whether this run of `name` is one to sample
+    def wants(self, name):
+        if "*" not in self.names and name not in self.names:
+            return False
+        with self._lock:
+            self._runs[name] += 1
+            return (self._runs[name] - 1) % self.sample_every == 0
+
+    # A new Run of `name` if this one is picked for sampling, else None
+    def begin(self, name):
+        if not self.wants(name):
+            return None
+        return Run(name, tracemalloc.get_traced_memory()[0] if self.trace_allocations else None)
+
+    # Keep a run open, e.g. for work handed to another thread that hasn't
+    # started yet; every hold() that returns True is matched by a release().
+    # A run that has already ended can't be held again.
+    def hold(self, run):
+        with self._lock:
+            if run.ended:
+                return False
+            run.holds += 1
+            return True
+
+    def release(self, run):
+        with self._lock:
+            run.holds -= 1
+            if run.holds:
+                return
+            run.ended = True
+            if run.traced_before is not None:
+                entry = self._allocations.setdefault(run.name, [0, 0])
+                entry[0] += 1
+                entry[1] += tracemalloc.get_traced_memory()[0] - run.traced_before
+        metrics.increment("profiler_samples", listener=run.name)
+
+    # Start or stop sampling the calling thread under `name`. watch() is
+    # False, and changes nothing, if the thread is being sampled already.
+    def watch(self, name):
+        thread_id = threading.get_ident()
+        with self._condition:
+            if thread_id in self._active:
+                return False
+            self._active[thread_id] = name
+            self._condition.notify_all()
+            return True
+
+    def unwatch(self):
+        with self._lock:
+            del self._active[threading.get_ident()]
+
+    # Sample the calling thread under `run` while the block runs, with the
+    # run as current_run so work the block hands off can join it. A thread
+    # already being sampled stays under the run it's in.
+    @contextmanager
+    def attach(self, run):
+        if not self.hold(run):
+            yield
+            return
+        token = current_run.set(run)
+        watched = self.watch(run.name)
+        try:
+            yield
+        finally:
+            if watched:
+                self.unwatch()
+            current_run.reset(token)
+            self.release(run)
+
+    # Sample the calling thread while the block runs, if this run of `name`
+    # is picked and the thread isn't part of a sampled run already
+    @contextmanager
+    def sampling(self, name):
+        run = self.begin(name) if current_run.get() is None else None
+        if run is None:
+            yield
+            return
+        try:
+            with self.attach(run):
+                yield
+        finally:
+            self.release(run)
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def _sample_loop(self):
+        while True:
+            with self._condition:
+                while not self._active:
+                    self._condition.wait()
+                active = dict(self._active)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, name in active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        self._stacks.setdefault(name, Counter())[_collapsed_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Error writing profiles: %s", e)
+
+    # Write what has been sampled since the last flush, one file per name and kind
+    def flush(self):
+        with self._lock:
+            stacks, self._stacks = self._stacks, {}
+            allocations, self._allocations = self._allocations, {}
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        for name, samples in stacks.items():
+            lines = [f"{stack} {count}" for stack, count in samples.most_common()]
+            self._write("stacks", name, stamp, "folded", lines)
+        if self.trace_allocations:
+            self._write("allocations", "all", stamp, "txt", self._allocation_report(allocations))
+
+    # Traced memory gained per sampled run of each name, then the lines that
+    # allocated most since the previous flush
+    def _allocation_report(self, allocations):
+        lines = [
+            f"{name}: {gained // runs} bytes per run over {runs} sampled runs"
+            for name, (runs, gained) in sorted(allocations.items())
+        ]
+        snapshot = self._snapshot()
+        growth = [stat for stat in snapshot.compare_to(self._last_snapshot, "lineno") if stat.size_diff > 0]
+        self._last_snapshot = snapshot
+        lines.append("")
+        for stat in growth[:TOP_ALLOCATION_SITES]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size_diff} bytes in {stat.count_diff} blocks: {frame.filename}:{frame.lineno}")
+        return lines
+
+    def _write(self, kind, name, stamp, extension, lines):
+        prefix = os.path.join(self.directory, f"{kind}-{name}-")
+        with open(f"{prefix}{stamp}.{extension}", "a") as output:
+            output.write("\n".join(lines) + "\n")
+        for old_path in sorted(glob.glob(f"{prefix}*.{extension}"))[:-self.keep]:
+            os.remove(old_path)
+
+
+# The process-wide profiler, None until configure() turns profiling on
+profiler = None
+
+
+def configure(directory, names=("*",), sample_every=100, interval=0.005, trace_allocations=False, flush_interval=60, keep=48):
+    global profiler
+    profiler = SamplingProfiler(directory, names, sample_every, interval, trace_allocations, flush_interval, keep)
+    profiler.start()
+    logger.info("Profiling 1 in %s runs of %s into %s", sample_every, ', '.join(sorted(profiler.names)), directory)
+    return profiler
+
+
+# Sample the block under `name` when profiling is on. Samples are of
+# threads, so not for coroutines: every task on an event loop shares its
+# thread, and its stacks would mix theirs.
+@contextmanager
+def sampling(name):
+    if profiler is None:
+        yield
+        return
+    with profiler.sampling(name):
+        yield
+
+
+# Decorator form of sampling()
+def profiled(name):
+    def decorate(func):
+        @functools.wraps(func)
+        def sampled(*args, **kwargs):
+            with sampling(name):
+                return func(*args, **kwargs)
+        return sampled
+    return decorate
+
+
+# Profile the request the calling thread is dispatching as a run of `name`
+# (None for requests no profiled listener handles), if it's picked. Bolt
+# runs global middleware and then hands the listener (and any lazy
+# listeners) to its listener executor without returning to the middleware,
+# so the dispatch thread is sampled from here until it hands the request to
+# a ProfiledExecutor, whose tasks join the run; after that it only waits
+# for the ack. Starting a request first lets go of what the thread's
+# previous one left, in case it was never handed off.
+def start_request(name):
+    _hand_off()
+    _dispatch.run = None
+    if profiler is None or name is None:
+        return
+    run = profiler.begin(name)
+    if run is None:
+        return
+    _dispatch.run = run
+    _dispatch.held = True
+    _dispatch.watched = profiler.watch(name)
+
+
+# Stop sampling the dispatch thread and let go of its request's run. The
+# thread still hands later work (lazy listeners) to the run while it lasts.
+def _hand_off():
+    run = getattr(_dispatch, "run", None)
+    if run is None or not _dispatch.held:
+        return
+    _dispatch.held = False
+    if _dispatch.watched:
+        profiler.unwatch()
+    profiler.release(run)
+
+
+# ThreadPoolExecutor whose tasks join the sampled run they were submitted
+# from, or the request being dispatched, so what a request hands to Bolt's
+# listener executor (the listener itself, lazy listeners) is profiled with
+# the middleware before it
+class ProfiledExecutor(ThreadPoolExecutor):
+    def submit(self, fn, /, *args, **kwargs):
+        run = current_run.get() or getattr(_dispatch, "run", None)
+        # Held from now, so the run can't end before the task starts
+        if run is None or profiler is None or not profiler.hold(run):
+            return super().submit(fn, *args, **kwargs)
+
+        def attached():
+            try:
+                with profiler.attach(run):
+                    return fn(*args, **kwargs)
+            finally:
+                profiler.release(run)
+        future = super().submit(attached)
+        if run is getattr(_dispatch, "run", None):
+            _hand_off()
+        return future
@@ -0,0 +1,147 @@
+import math
+import re
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from urllib.parse import parse_qsl, urlencode
+
+from config import DEFAULT_CURRENCY
+from money import CURRENCIES
+
+# Filters the App Home list can be narrowed by, in the order they're encoded
+FILTERS = ("status", "type", "employee", "requestor", "date_from", "date_to", "currency", "amount_min", "amount_max", "text")
+
+# Filters that must equal an approval field of the same name
+EQUALITY_FILTERS = ("status", "type", "employee", "requestor", "currency")
+
+# Fields searched by the free-text filter
+SEARCH_FIELDS = ("title", "notes", "request_type")
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+# Lowercased words of a piece of text, as the free-text filter matches them
+def words(text):
+    return WORD_PATTERN.findall(text.lower()) if text else []
+
+
+# Every word in an approval's searchable fields
+def search_words(approval):
+    return {word for field in SEARCH_FIELDS for word in words(approval.get(field))}
+
+
+# Report date for expenses, requested-on date for time off
+def report_date(approval):
+    return approval.get("date") or approval.get("request_date")
+
+
+# Requested amount as (currency, minor units), so amounts only compare
+# within a currency, or None for approvals without one (time off, or
+# expenses whose amounts couldn't be migrated)
+def amount_value(approval):
+    minor = approval.get("amount_minor")
+    return None if minor is None else (approval.get("currency"), minor)
+
+
+# Range filters: (low filter, high filter, value of an approval to compare)
+RANGE_FILTERS = {
+    "date": ("date_from", "date_to", report_date),
+    "amount": ("amount_min", "amount_max", amount_value)
+}
+
+
+def _valid(name, value):
+    if name in ("date_from", "date_to"):
+        try:
+            date.fromisoformat(value)
+        except ValueError:
+            return False
+    elif name in ("amount_min", "amount_max"):
+        try:
+            return Decimal(value).is_finite()
+        except InvalidOperation:
+            return False
+    elif name == "currency":
+        return value in CURRENCIES
+    return True
+
+
+# A query as a dict of filter -> value from its encoded form. A bare status
+# ("pending", "all"), as App Home filters were before there were others, is
+# a query on status alone; unknown filters and malformed values are dropped.
+# An amount range is in one currency, the default unless the query names one.
+def parse_query(value):
+    if not value or value == "all":
+        return {}
+    if "=" not in value:
+        return {"status": value}
+    query = {}
+    for name, filter_value in parse_qsl(value):
+        filter_value = filter_value.strip()
+        if name in FILTERS and filter_value and filter_value != "all" and _valid(name, filter_value):
+            query[name] = filter_value
+    if (query.get("amount_min") or query.get("amount_max")) and not query.get("currency"):
+        query["currency"] = DEFAULT_CURRENCY
+    return query
+
+
+# The short string a query travels in, through button values and the page
+# each user was last shown. Never contains "|".
+def encode_query(query):
+    filters = [(name, query[name]) for name in FILTERS if query.get(name)]
+    if not filters:
+        return "all"
+    if len(filters) == 1 and filters[0][0] == "status":
+        return filters[0][1]
+    return urlencode(filters)
+
+
+# The query's amount range in minor units of its currency, (currency, low,
+# high) with low and high rounded inwards and either possibly None, or None
+# without an amount range
+def amount_bounds(query):
+    if not (query.get("amount_min") or query.get("amount_max")):
+        return None
+    currency = query.get("currency") or DEFAULT_CURRENCY
+    scale = 10 ** CURRENCIES.get(currency, (2, ""))[0]
+    low, high = (Decimal(query[name]) * scale if query.get(name) else None for name in ("amount_min", "amount_max"))
+    return currency, None if low is None else math.ceil(low), None if high is None else math.floor(high)
+
+
+# Bounds of each range filter the query sets, range name -> (low, high),
+# either of which may be None. Amount bounds are (currency, minor units),
+# as amount_value gives them, and always both set, to keep the range in
+# one currency.
+def query_ranges(query):
+    ranges = {}
+    for name, (low, high, _) in RANGE_FILTERS.items():
+        if name == "amount":
+            bounds = amount_bounds(query)
+            if bounds is not None:
+                currency, low_minor, high_minor = bounds
+                ranges[name] = (
+                    (currency,) if low_minor is None else (currency, low_minor),
+                    (currency, math.inf if high_minor is None else high_minor)
+                )
+        elif query.get(low) or query.get(high):
+            ranges[name] = (query.get(low) or None, query.get(high) or None)
+    return ranges
+
+
+# A function telling whether an approval passes every filter in a query.
+# Free text matches approvals containing each of its words.
+def matcher(query):
+    equal = [(name, query[name]) for name in EQUALITY_FILTERS if query.get(name)]
+    ranges = [(RANGE_FILTERS[name][2], low, high) for name, (low, high) in query_ranges(query).items()]
+    text = set(words(query.get("text")))
+
+    def matches(approval):
+        for name, value in equal:
+            if approval.get(name) != value:
+                return False
+        for value_of, low, high in ranges:
+            value = value_of(approval)
+            if value is None or (low is not None and value < low) or (high is not None and value > high):
+                return False
+        return not text or search_words(approval).issuperset(text)
+
+    return matches
@@ -0,0 +1,179 @@
+import hashlib
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import metrics
+
+
+# Rendered blocks for each approval, keyed by (approval ID, version, render
+# context). The store bumps an approval's version on every edit or status
+# change, so a stale fragment is never served; older versions of an approval
+# are dropped as soon as a newer one is rendered. Least recently used
+# fragments are evicted once max_entries is reached.
+#
+# Cached block lists are shared between views and must not be mutated.
+class FragmentCache:
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (blocks, seconds it took to render them)
+        self._fragments = OrderedDict()
+        # approval ID -> keys cached for it
+        self._keys_by_id = {}
+
+    def get_or_render(self, approval, context, render):
+        key = (approval["id"], approval.get("version", 0), context)
+        with self._lock:
+            entry = self._fragments.get(key)
+            if entry is not None:
+                self._fragments.move_to_end(key)
+        if entry is not None:
+            metrics.increment("fragment_cache_hits")
+            metrics.increment("fragment_cache_render_seconds_saved", entry[1])
+            return entry[0]
+
+        started = time.perf_counter()
+        blocks = render(approval)
+        elapsed = time.perf_counter() - started
+        metrics.increment("fragment_cache_misses")
+        metrics.increment("fragment_cache_render_seconds", elapsed)
+
+        with self._lock:
+            keys = self._keys_by_id.setdefault(approval["id"], set())
+            for stale_key in [k for k in keys if k[1] != key[1]]:
+                keys.discard(stale_key)
+                self._fragments.pop(stale_key, None)
+            keys.add(key)
+            self._fragments[key] = (blocks, elapsed)
+            while len(self._fragments) > self.max_entries:
+                evicted_key, _ = self._fragments.popitem(last=False)
+                self._discard_key(evicted_key)
+        return blocks
+
+    def _discard_key(self, key):
+        keys = self._keys_by_id.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_id[key[0]]
+
+    # Drop every cached fragment for an approval, e.g. once it is deleted
+    def invalidate(self, approval_id):
+        with self._lock:
+            for key in self._keys_by_id.pop(approval_id, ()):
+                self._fragments.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+            self._keys_by_id.clear()
+
+    # Hit rate and render time saved so far
+    def stats(self):
+        values = metrics.counters()
+        hits = values.get("fragment_cache_hits", 0)
+        misses = values.get("fragment_cache_misses", 0)
+        return {
+            "entries": len(self._fragments),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "render_seconds_saved": values.get("fragment_cache_render_seconds_saved", 0.0)
+        }
+
+
+# What each user currently has on their App Home: the hash of the last view
+# published to them, so a publish that would change nothing can be skipped,
+# and the page they were shown with the approvals on it, so a changed
+# approval can be traced back to everyone looking at it
+class PublishedViews:
+    def __init__(self, publish_lock_stripes=64):
+        self._lock = threading.Lock()
+        self._hashes = {}
+        # user ID -> (home_filter, cursor, direction)
+        self._pages = {}
+        # user ID -> approval IDs on their page, and the reverse
+        self._approval_ids = {}
+        self._viewers = {}
+        # Render tickets, handed out in order, and the newest published per user
+        self._tickets = itertools.count(1)
+        self._published_tickets = {}
+        # One publish at a time per user, with locks shared between users
+        self._publish_locks = [threading.Lock() for _ in range(publish_lock_stripes)]
+
+    @staticmethod
+    def view_hash(view):
+        payload = json.dumps(view, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # Taken just before rendering a user's App Home, for publishing()
+    def ticket(self):
+        return next(self._tickets)
+
+    # Hold the user's publish lock while the block publishes a view rendered
+    # under `ticket`. Yields False, and the block should skip publishing, if
+    # a view rendered after this one has been published already: refreshes
+    # of one user can run on several workers at once, and the slower render
+    # would otherwise overwrite the newer view.
+    @contextmanager
+    def publishing(self, user_id, ticket):
+        with self._publish_locks[hash(user_id) % len(self._publish_locks)]:
+            with self._lock:
+                newest = ticket > self._published_tickets.get(user_id, 0)
+            yield newest
+            if newest:
+                with self._lock:
+                    self._published_tickets[user_id] = ticket
+
+    def is_current(self, user_id, view_hash):
+        with self._lock:
+            return self._hashes.get(user_id) == view_hash
+
+    def record(self, user_id, view_hash, page=None, approval_ids=()):
+        with self._lock:
+            self._hashes[user_id] = view_hash
+            if page is not None:
+                self._pages[user_id] = page
+            self._set_approval_ids(user_id, set(approval_ids))
+
+    def _set_approval_ids(self, user_id, approval_ids):
+        previous = self._approval_ids.get(user_id, set())
+        for approval_id in previous - approval_ids:
+            viewers = self._viewers.get(approval_id)
+            if viewers is not None:
+                viewers.discard(user_id)
+                if not viewers:
+                    del self._viewers[approval_id]
+        for approval_id in approval_ids - previous:
+            self._viewers.setdefault(approval_id, set()).add(user_id)
+        if approval_ids:
+            self._approval_ids[user_id] = approval_ids
+        else:
+            self._approval_ids.pop(user_id, None)
+
+    # (home_filter, cursor, direction) of the page a user was last shown
+    def page(self, user_id):
+        with self._lock:
+            return self._pages.get(user_id)
+
+    # Users whose App Home currently shows an approval
+    def viewers_of(self, approval_id):
+        with self._lock:
+            return set(self._viewers.get(approval_id, ()))
+
+    # Forget one user's view, or everyone's, so the next publish always goes out
+    def forget(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._hashes.clear()
+                self._pages.clear()
+                self._approval_ids.clear()
+                self._viewers.clear()
+            else:
+                self._hashes.pop(user_id, None)
+                self._pages.pop(user_id, None)
+                self._set_approval_ids(user_id, set())
@@ -0,0 +1,240 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+import metrics
+from instrumentation import record_slack_call
+from outbound import retry_after
+
+logger = logging.getLogger(__name__)
+
+# Call priorities, lower runs first. DMs and fan-out publishes can wait.
+# Interactive calls (views_open, which has to beat the 3 second trigger_id
+# expiry) are made on listener threads, so they never wait: they go ahead
+# if their method has capacity and fail with SlackBusy if not.
+INTERACTIVE = 0
+FOREGROUND = 1
+BACKGROUND = 2
+
+# Requests per minute for Slack's rate limit tiers
+TIER_LIMITS = {1: 1, 2: 20, 3: 50, 4: 100}
+METHOD_TIERS = {
+    "views.publish": 4,
+    "views.open": 4,
+    "users.info": 4,
+    "users.list": 2
+}
+# chat.postMessage is in Slack's "special" tier, roughly one message per second
+SPECIAL_LIMITS = {"chat.postMessage": 60}
+DEFAULT_PER_MINUTE = TIER_LIMITS[3]
+
+DEFAULT_PRIORITIES = {
+    "views.open": INTERACTIVE,
+    "views.publish": FOREGROUND,
+    "chat.postMessage": BACKGROUND
+}
+
+
+# An interactive call that couldn't be made straight away: its method had no
+# capacity left, or Slack answered 429
+class SlackBusy(Exception):
+    pass
+
+
+# views_publish -> views.publish
+def api_method_name(method):
+    return method.replace("_", ".", 1)
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1.0, per_minute / 4.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.parked_until = 0.0
+        # Waiting callers: heap of (priority, sequence)
+        self.waiters = []
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Seconds until a call may be made, 0 if one can be made now
+    def wait_time(self, now):
+        if now < self.parked_until:
+            return self.parked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+# Central gate for the Slack Web API calls the app makes. Each method has a
+# token bucket sized to its Slack tier, callers wait their turn in priority
+# order, and a 429 parks the whole method for Retry-After seconds before
+# the call is retried. Slack's limits apply to the app as a whole, so with
+# `workers` processes each scheduler keeps to its share of them.
+class SlackApiScheduler:
+    def __init__(self, limits=None, max_rate_limit_retries=5, workers=1):
+        self.limits = limits or {}
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.workers = workers
+        self._condition = threading.Condition()
+        self._buckets = {}
+        self._sequence = itertools.count()
+
+    def _bucket(self, api_method):
+        bucket = self._buckets.get(api_method)
+        if bucket is None:
+            per_minute = self.limits.get(api_method) or SPECIAL_LIMITS.get(api_method) or TIER_LIMITS.get(METHOD_TIERS.get(api_method), DEFAULT_PER_MINUTE)
+            bucket = self._buckets[api_method] = TokenBucket(per_minute / self.workers)
+        return bucket
+
+    # Block until this caller may make one call to api_method
+    def acquire(self, api_method, priority=FOREGROUND):
+        entry = (priority, next(self._sequence))
+        with self._condition:
+            bucket = self._bucket(api_method)
+            heapq.heappush(bucket.waiters, entry)
+            try:
+                while True:
+                    wait = bucket.wait_time(time.monotonic()) if bucket.waiters[0] == entry else None
+                    if wait == 0:
+                        heapq.heappop(bucket.waiters)
+                        bucket.take()
+                        entry = None
+                        return
+                    self._condition.wait(wait)
+            finally:
+                if entry is not None:
+                    bucket.waiters.remove(entry)
+                    heapq.heapify(bucket.waiters)
+                self._condition.notify_all()
+
+    # Take a call to api_method if one can be made now, without waiting.
+    # Callers of the same or a higher priority already waiting go first.
+    def try_acquire(self, api_method, priority=INTERACTIVE):
+        with self._condition:
+            bucket = self._bucket(api_method)
+            if bucket.waiters and bucket.waiters[0][0] <= priority:
+                return False
+            if bucket.wait_time(time.monotonic()) > 0:
+                return False
+            bucket.take()
+            return True
+
+    # Wait for this caller's turn, or for an interactive one take a call now or raise SlackBusy
+    def _take_turn(self, api_method, priority):
+        if priority != INTERACTIVE:
+            self.acquire(api_method, priority)
+        elif not self.try_acquire(api_method, priority):
+            metrics.increment("slack_api_busy", method=api_method)
+            raise SlackBusy(f"No {api_method} capacity right now")
+
+    # Record a failed call, and park its method on a 429. Raises unless the
+    # call should be retried: interactive calls aren't (the caller can't
+    # wait), others are until they run out of retries.
+    def _failed(self, api_method, priority, attempt, seconds, error):
+        record_slack_call(api_method, seconds, error)
+        if getattr(getattr(error, "response", None), "status_code", None) != 429:
+            raise error
+        retry_seconds = retry_after(error) or 1.0
+        logger.warning("%s rate limited, parking for %ss", api_method, retry_seconds)
+        metrics.increment("slack_api_rate_limited")
+        self.park(api_method, retry_seconds)
+        if priority == INTERACTIVE:
+            metrics.increment("slack_api_busy", method=api_method)
+            raise SlackBusy(f"{api_method} rate limited for {retry_seconds}s") from error
+        if attempt == self.max_rate_limit_retries:
+            raise error
+
+    # Stop all calls to api_method until Slack's Retry-After has passed
+    def park(self, api_method, seconds):
+        with self._condition:
+            bucket = self._bucket(api_method)
+            bucket.parked_until = max(bucket.parked_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+    # Make one Web API call through the scheduler, retrying after 429s
+    def call(self, client, method, priority=None, **kwargs):
+        api_method = api_method_name(method)
+        if priority is None:
+            priority = DEFAULT_PRIORITIES.get(api_method, FOREGROUND)
+        for attempt in range(self.max_rate_limit_retries + 1):
+            self._take_turn(api_method, priority)
+            started = time.perf_counter()
+            try:
+                response = getattr(client, method)(**kwargs)
+            except Exception as e:
+                self._failed(api_method, priority, attempt, time.perf_counter() - started, e)
+                continue
+            record_slack_call(api_method, time.perf_counter() - started)
+            return response
+
+    # call() for an AsyncWebClient. Non-interactive calls wait for their
+    # turn on an executor thread, so the event loop never blocks.
+    async def call_async(self, client, method, priority=None, **kwargs):
+        api_method = api_method_name(method)
+        if priority is None:
+            priority = DEFAULT_PRIORITIES.get(api_method, FOREGROUND)
+        for attempt in range(self.max_rate_limit_retries + 1):
+            if priority == INTERACTIVE:
+                self._take_turn(api_method, priority)
+            else:
+                await asyncio.get_running_loop().run_in_executor(None, self.acquire, api_method, priority)
+            started = time.perf_counter()
+            try:
+                response = await getattr(client, method)(**kwargs)
+            except Exception as e:
+                self._failed(api_method, priority, attempt, time.perf_counter() - started, e)
+                continue
+            record_slack_call(api_method, time.perf_counter() - started)
+            return response
+
+    def wrap(self, client, priority=None):
+        return ScheduledClient(self, client, priority)
+
+    def wrap_async(self, client, priority=None):
+        return AsyncScheduledClient(self, client, priority)
+
+
+# WebClient stand-in that sends the methods the app uses through the
+# scheduler and passes everything else straight to the wrapped client
+class ScheduledClient:
+    SCHEDULED_METHODS = ("views_publish", "views_open", "chat_postMessage", "users_info", "users_list")
+
+    def __init__(self, scheduler, client, priority=None):
+        self._scheduler = scheduler
+        self._client = client
+        self._priority = priority
+
+    # Same client with every scheduled call made at the given priority
+    def with_priority(self, priority):
+        return ScheduledClient(self._scheduler, self._client, priority)
+
+    def __getattr__(self, name):
+        if name in self.SCHEDULED_METHODS:
+            def scheduled(**kwargs):
+                return self._scheduler.call(self._client, name, self._priority, **kwargs)
+            return scheduled
+        return getattr(self._client, name)
+
+
+# ScheduledClient for an AsyncWebClient
+class AsyncScheduledClient(ScheduledClient):
+    def with_priority(self, priority):
+        return AsyncScheduledClient(self._scheduler, self._client, priority)
+
+    def __getattr__(self, name):
+        if name in self.SCHEDULED_METHODS:
+            async def scheduled(**kwargs):
+                return await self._scheduler.call_async(self._client, name, self._priority, **kwargs)
+            return scheduled
+        return getattr(self._client, name)
@@ -0,0 +1,83 @@
+import threading
+
+
+# Approvals each user has ticked on their App Home for a bulk action. Slack
+# doesn't send a home tab's checkbox state along with a button click, so the
+# selection lives here, updated as each checkbox is toggled. A user can
+# select at most `limit` approvals at once. on_change, when set, is called
+# with the user ID and their whole selection after every change.
+class Selections:
+    def __init__(self, limit=1000, on_change=None):
+        self.limit = limit
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._selected = {}
+
+    def _changed(self, user_id, selected):
+        if self.on_change is not None:
+            self.on_change(user_id, selected)
+
+    def get(self, user_id):
+        with self._lock:
+            return frozenset(self._selected.get(user_id, ()))
+
+    # Tick or untick one approval; returns False if the user is at the limit
+    def set(self, user_id, approval_id, selected=True):
+        with self._lock:
+            current = self._selected.setdefault(user_id, set())
+            if (approval_id in current) == selected:
+                if not current:
+                    del self._selected[user_id]
+                return True
+            if not selected:
+                current.discard(approval_id)
+            else:
+                if len(current) >= self.limit:
+                    return False
+                current.add(approval_id)
+            if not current:
+                del self._selected[user_id]
+            snapshot = frozenset(current)
+        self._changed(user_id, snapshot)
+        return True
+
+    # Tick every one of approval_ids; returns False if the limit left some out
+    def select_all(self, user_id, approval_ids):
+        complete = True
+        with self._lock:
+            current = self._selected.setdefault(user_id, set())
+            for approval_id in approval_ids:
+                if approval_id in current:
+                    continue
+                if len(current) >= self.limit:
+                    complete = False
+                    break
+                current.add(approval_id)
+            if not current:
+                del self._selected[user_id]
+            snapshot = frozenset(current)
+        self._changed(user_id, snapshot)
+        return complete
+
+    def clear(self, user_id):
+        with self._lock:
+            cleared = self._selected.pop(user_id, None)
+        if cleared:
+            self._changed(user_id, frozenset())
+
+    # Remove and return a user's selection, so a bulk action runs on it once
+    def take(self, user_id):
+        with self._lock:
+            taken = self._selected.pop(user_id, set())
+        if taken:
+            self._changed(user_id, frozenset())
+        return taken
+
+    # Set a user's whole selection without calling on_change, e.g. to apply
+    # a change made in another worker
+    def replace(self, user_id, approval_ids):
+        with self._lock:
+            if approval_ids:
+                self._selected[user_id] = set(approval_ids)
+            else:
+                self._selected.pop(user_id, None)
@@ -0,0 +1,457 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from config import DEFAULT_CURRENCY
+from money import normalize_amounts
+from query import EQUALITY_FILTERS, SEARCH_FIELDS, amount_bounds, query_ranges, report_date, search_words, words
+from store import PAGE_SIZE, QUERY_TIME_LIMIT, BaseApprovalStore, VersionConflict, queue_entry, queue_summary, unchanged
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS approvals (
+    id TEXT PRIMARY KEY,
+    status TEXT,
+    employee TEXT,
+    requestor TEXT,
+    date TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    type TEXT,
+    amount_minor INTEGER,
+    currency TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS approvals_status ON approvals (status);
+CREATE INDEX IF NOT EXISTS approvals_employee ON approvals (employee);
+CREATE INDEX IF NOT EXISTS approvals_requestor ON approvals (requestor);
+CREATE INDEX IF NOT EXISTS approvals_date ON approvals (date);
+-- Pending approvals and their total amount in minor units, by type and
+-- currency ("" for none), kept up to date by every write
+CREATE TABLE IF NOT EXISTS approval_stats (
+    type TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    pending INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    PRIMARY KEY (type, currency)
+);
+"""
+
+# Created once the columns they cover exist, which in databases from before
+# queries is after _add_search_columns has run
+SEARCH_SCHEMA = (
+    "CREATE INDEX IF NOT EXISTS approvals_type ON approvals (type)",
+    # Inverted index of the words in each approval's searchable fields, by
+    # approval rowid, the same words the in-memory store indexes
+    """CREATE TABLE IF NOT EXISTS approval_words (
+        word TEXT NOT NULL,
+        approval INTEGER NOT NULL,
+        PRIMARY KEY (word, approval)
+    ) WITHOUT ROWID"""
+)
+
+# A free-text word on fewer approvals than this drives the query from its
+# entries in approval_words; commoner words are checked row by row
+RARE_WORD_LIMIT = 5000
+
+# SQLite virtual machine steps between checks of a query's QUERY_TIME_LIMIT
+PROGRESS_STEPS = 1000
+
+# Rowids checked per statement by a query finishing its page in rowid order
+SCAN_WINDOW = 2000
+
+
+# Durable approval store backed by SQLite in WAL mode. Each thread gets its
+# own connection so readers never wait on the writer, and writes outside an
+# explicit transaction() commit on their own.
+class SQLiteApprovalStore(BaseApprovalStore):
+    def __init__(self, path, approvals=None, busy_timeout=5000, default_currency=DEFAULT_CURRENCY):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._add_version_column(conn)
+        self._add_search_columns(conn)
+        self._add_currency_column(conn, default_currency)
+        self._rebuild_queue_stats(conn)
+        if approvals:
+            # Checked inside the write transaction, so of several workers starting together only one seeds
+            with self.transaction():
+                if len(self) == 0:
+                    for approval in approvals:
+                        self.create(approval)
+
+    # Databases created before approvals had a version column get one, filled
+    # in from the stored approvals
+    def _add_version_column(self, conn):
+        columns = [name for _, name, *_ in conn.execute("PRAGMA table_info(approvals)")]
+        if "version" not in columns:
+            with self.transaction():
+                conn.execute("ALTER TABLE approvals ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+                conn.execute("UPDATE approvals SET version = COALESCE(json_extract(data, '$.version'), 1)")
+
+    # Databases created before queries get the type column and the search
+    # table, filled in from the stored approvals
+    def _add_search_columns(self, conn):
+        with self.transaction():
+            columns = [name for _, name, *_ in conn.execute("PRAGMA table_info(approvals)")]
+            migrate = "type" not in columns or not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'approval_words'"
+            ).fetchone()
+            if "type" not in columns:
+                conn.execute("ALTER TABLE approvals ADD COLUMN type TEXT")
+            for statement in SEARCH_SCHEMA:
+                conn.execute(statement)
+            if migrate:
+                for rowid, data in conn.execute("SELECT rowid, data FROM approvals").fetchall():
+                    approval = json.loads(data)
+                    conn.execute("UPDATE approvals SET type = ? WHERE rowid = ?", (approval.get("type"), rowid))
+                    self._index_words(rowid, search_words(approval))
+
+    # Databases created before amounts were stored as numbers get currency
+    # and amount_minor columns, and their expenses' amount and total text is
+    # parsed into minor units in place. Versions are left alone: the
+    # approvals haven't changed.
+    def _add_currency_column(self, conn, default_currency):
+        with self.transaction():
+            columns = [name for _, name, *_ in conn.execute("PRAGMA table_info(approvals)")]
+            if "currency" not in columns:
+                conn.execute("ALTER TABLE approvals ADD COLUMN currency TEXT")
+                conn.execute("ALTER TABLE approvals ADD COLUMN amount_minor INTEGER")
+                rows = conn.execute("SELECT rowid, data FROM approvals WHERE type = 'expense'").fetchall()
+                for rowid, data in rows:
+                    approval = normalize_amounts(json.loads(data), default_currency)
+                    if approval is not None:
+                        conn.execute(
+                            "UPDATE approvals SET amount_minor = ?, currency = ?, data = ? WHERE rowid = ?",
+                            (approval["amount_minor"], approval["currency"], json.dumps(approval), rowid)
+                        )
+            # Amount ranges are only compared within one currency
+            conn.execute("CREATE INDEX IF NOT EXISTS approvals_currency_amount ON approvals (currency, amount_minor)")
+
+    # Recounted from the approvals at startup, in case they were changed by
+    # anything that didn't keep approval_stats up to date
+    def _rebuild_queue_stats(self, conn):
+        with self.transaction():
+            conn.execute("DELETE FROM approval_stats")
+            conn.execute(
+                """INSERT INTO approval_stats (type, currency, pending, amount)
+                SELECT COALESCE(type, ''), COALESCE(currency, ''), COUNT(*),
+                    COALESCE(SUM(json_extract(data, '$.amount_minor')), 0)
+                FROM approvals WHERE status = 'pending' GROUP BY 1, 2"""
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None leaves transaction control to transaction()
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self._connection()
+        if self._local.depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.execute("ROLLBACK")
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            conn.execute("COMMIT")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _insert(self, approval):
+        conn = self._connection()
+        inserted = conn.execute(
+            "INSERT INTO approvals (id, status, employee, requestor, date, version, type, amount_minor, currency, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                approval["id"],
+                approval.get("status"),
+                approval.get("employee"),
+                approval.get("requestor"),
+                report_date(approval),
+                approval.get("version", 1),
+                approval.get("type"),
+                approval.get("amount_minor"),
+                approval.get("currency"),
+                json.dumps(approval)
+            )
+        )
+        self._index_words(inserted.lastrowid, search_words(approval))
+        self._change_queue(None, queue_entry(approval))
+
+    # Move an approval's queue_entry in approval_stats from `removed` to
+    # `added`, either of which may be None
+    def _change_queue(self, removed, added):
+        if removed == added:
+            return
+        conn = self._connection()
+        for entry, sign in ((removed, -1), (added, 1)):
+            if entry is not None:
+                (approval_type, currency), amount = entry
+                conn.execute(
+                    """INSERT INTO approval_stats (type, currency, pending, amount) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (type, currency) DO UPDATE
+                    SET pending = pending + excluded.pending, amount = amount + excluded.amount""",
+                    (approval_type, currency, sign, sign * amount)
+                )
+
+    def _index_words(self, rowid, added=(), removed=()):
+        conn = self._connection()
+        conn.executemany("DELETE FROM approval_words WHERE word = ? AND approval = ?", [(word, rowid) for word in removed])
+        conn.executemany("INSERT OR IGNORE INTO approval_words (word, approval) VALUES (?, ?)", [(word, rowid) for word in added])
+
+    def _rowid(self, approval_id):
+        row = self._connection().execute("SELECT rowid FROM approvals WHERE id = ?", (approval_id,)).fetchone()
+        return row[0] if row else None
+
+    def _select(self, where="", params=()):
+        rows = self._connection().execute(f"SELECT data FROM approvals {where} ORDER BY rowid", params)
+        return [json.loads(data) for (data,) in rows]
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM approvals").fetchone()[0]
+
+    def get(self, approval_id):
+        row = self._connection().execute("SELECT data FROM approvals WHERE id = ?", (approval_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def create(self, approval, actor=None):
+        approval.setdefault("version", 1)
+        try:
+            with self.transaction():
+                self._insert(approval)
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Approval {approval['id']} already exists")
+        return approval
+
+    # The write only goes through if the version column still holds the version
+    # that was read, which BEGIN IMMEDIATE already guarantees between workers
+    # sharing the database; the check makes it explicit
+    def update(self, approval_id, actor=None, expected_version=None, **fields):
+        with self.transaction():
+            approval = self.get(approval_id)
+            if approval is None:
+                return None
+            before = search_words(approval) if any(field in fields for field in SEARCH_FIELDS) else None
+            version = approval.get("version", 1)
+            if expected_version is not None and version != expected_version:
+                raise VersionConflict(approval, expected_version)
+            if unchanged(approval, fields):
+                return approval
+            queued = queue_entry(approval)
+            approval.update(fields)
+            approval["version"] = version + 1
+            # UPDATE rather than REPLACE keeps the rowid, and with it the display order
+            conn = self._connection()
+            updated = conn.execute(
+                "UPDATE approvals SET status = ?, employee = ?, requestor = ?, date = ?, version = ?, type = ?, amount_minor = ?, currency = ?, data = ? WHERE id = ? AND version = ?",
+                (
+                    approval.get("status"),
+                    approval.get("employee"),
+                    approval.get("requestor"),
+                    report_date(approval),
+                    approval["version"],
+                    approval.get("type"),
+                    approval.get("amount_minor"),
+                    approval.get("currency"),
+                    json.dumps(approval),
+                    approval_id,
+                    version
+                )
+            )
+            if updated.rowcount != 1:
+                raise VersionConflict(self.get(approval_id), version)
+            self._change_queue(queued, queue_entry(approval))
+            if before is not None:
+                after = search_words(approval)
+                self._index_words(self._rowid(approval_id), after - before, before - after)
+        return approval
+
+    def delete(self, approval_id, actor=None, expected_version=None):
+        with self.transaction():
+            approval = self.get(approval_id)
+            if approval is not None:
+                if expected_version is not None and approval.get("version", 1) != expected_version:
+                    raise VersionConflict(approval, expected_version)
+                self._index_words(self._rowid(approval_id), removed=search_words(approval))
+                self._connection().execute("DELETE FROM approvals WHERE id = ?", (approval_id,))
+                self._change_queue(queue_entry(approval), None)
+        return approval
+
+    def filter(self, status="all"):
+        if status == "all":
+            return self._select()
+        return self._select("WHERE status = ?", (status,))
+
+    def by_employee(self, user_id):
+        return self._select("WHERE employee = ?", (user_id,))
+
+    def count_by_status(self):
+        return dict(self._connection().execute("SELECT status, COUNT(*) FROM approvals GROUP BY status"))
+
+    def by_requestor(self, user_id):
+        return self._select("WHERE requestor = ?", (user_id,))
+
+    # From approval_stats, plus one seek on the status index for the oldest
+    def queue_stats(self):
+        conn = self._connection()
+        totals = [((approval_type, currency), (pending, amount)) for approval_type, currency, pending, amount in conn.execute(
+            "SELECT type, currency, pending, amount FROM approval_stats"
+        )]
+        oldest = conn.execute("SELECT data FROM approvals WHERE status = 'pending' ORDER BY rowid LIMIT 1").fetchone()
+        return queue_summary(totals, json.loads(oldest[0]) if oldest else None)
+
+    # Cursors are rowids, which follow insertion order and are covered by every index
+    def page(self, status="all", cursor=None, direction="next", limit=PAGE_SIZE):
+        return self.query({} if status == "all" else {"status": status}, cursor, direction, limit)
+
+    # Filters become WHERE conditions on the indexed columns and free-text
+    # words lookups in approval_words, leaving SQLite to pick the index. One
+    # that picks an index covering many approvals that mostly fail the other
+    # conditions is interrupted halfway through QUERY_TIME_LIMIT, and the
+    # page finished from the cursor in rowid order (see _scan) in the rest.
+    def query(self, query, cursor=None, direction="next", limit=PAGE_SIZE):
+        conditions, params = [], []
+        for field in EQUALITY_FILTERS:
+            if query.get(field):
+                conditions.append(f"{field} = ?")
+                params.append(query[field])
+        for column, (low, high) in query_ranges(query).items():
+            if column == "amount":
+                # Compared in minor units within the one currency, on
+                # approvals_currency_amount
+                currency, low, high = amount_bounds(query)
+                if not query.get("currency"):
+                    conditions.append("currency = ?")
+                    params.append(currency)
+                column = "amount_minor"
+            if low is not None:
+                conditions.append(f"{column} >= ?")
+                params.append(low)
+            if high is not None:
+                conditions.append(f"{column} <= ?")
+                params.append(high)
+        for word in set(words(query.get("text"))):
+            if self._is_rare(word):
+                conditions.append("rowid IN (SELECT approval FROM approval_words WHERE word = ?)")
+            else:
+                conditions.append("EXISTS (SELECT 1 FROM approval_words WHERE word = ? AND approval = approvals.rowid)")
+            params.append(word)
+        backwards = cursor is not None and direction == "prev"
+        started = time.perf_counter()
+        where = conditions + (["rowid < ?" if backwards else "rowid > ?"] if cursor is not None else [])
+        rows = self._fetch_until(
+            f"SELECT rowid, data FROM approvals {'WHERE ' + ' AND '.join(where) if where else ''}"
+            f" ORDER BY rowid {'DESC' if backwards else 'ASC'} LIMIT ?",
+            (*params, *([int(cursor)] if cursor is not None else []), limit + 1),
+            started + QUERY_TIME_LIMIT / 2
+        )
+        stopped_at = None
+        if rows is None:
+            rows, stopped_at = self._scan(conditions, params, cursor, backwards, limit + 1, started + QUERY_TIME_LIMIT)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            if not has_more and stopped_at is None:
+                # Back at the beginning, show a full first page
+                return self.query(query, None, "next", limit)
+            rows.reverse()
+        approvals = [json.loads(data) for _, data in rows]
+        first, last = (str(rows[0][0]), str(rows[-1][0])) if rows else (None, None)
+        if backwards:
+            if stopped_at is None:
+                return approvals, first, last
+            # Nothing matched between where it stopped and the cursor
+            return approvals, str(stopped_at), last or str(stopped_at - 1)
+        if stopped_at is not None:
+            next_cursor = str(stopped_at)
+        else:
+            next_cursor = last if has_more else None
+        prev_cursor = None
+        if cursor is not None:
+            # Nothing after the cursor matched, so go back from just after it
+            prev_cursor = first or str(int(cursor) + 1)
+        return approvals, prev_cursor, next_cursor
+
+    # Rows of a statement, or None if it was still running at `deadline`
+    def _fetch_until(self, sql, params, deadline):
+        conn = self._connection()
+        interrupted = []
+
+        def past_deadline():
+            if time.perf_counter() > deadline:
+                interrupted.append(True)
+                return 1
+            return 0
+
+        conn.set_progress_handler(past_deadline, PROGRESS_STEPS)
+        try:
+            return conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            if interrupted:
+                return None
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    # Up to `count` rows passing the query's conditions, checking SCAN_WINDOW
+    # rowids at a time after the cursor (or before it, backwards), at least
+    # once and then until `deadline`. Every index ends in the rowid, so a
+    # window is a short range of whichever index SQLite picks. Returns
+    # the rows and, if it stopped with rowids still to check, the last rowid
+    # it checked (rowids below it, backwards), else None.
+    def _scan(self, conditions, params, cursor, backwards, count, deadline):
+        conn = self._connection()
+        rows = []
+        if backwards:
+            position = int(cursor)
+            window = "rowid >= ? AND rowid < ?"
+        else:
+            position = 0 if cursor is None else int(cursor)
+            window = "rowid > ? AND rowid <= ?"
+            end = conn.execute("SELECT MAX(rowid) FROM approvals").fetchone()[0] or 0
+        sql = (
+            f"SELECT rowid, data FROM approvals WHERE {' AND '.join([window, *conditions])}"
+            f" ORDER BY rowid {'DESC' if backwards else 'ASC'} LIMIT ?"
+        )
+        while True:
+            if backwards:
+                bounds = (max(position - SCAN_WINDOW, 1), position)
+                position = bounds[0]
+                finished = position <= 1
+            else:
+                bounds = (position, position + SCAN_WINDOW)
+                position = bounds[1]
+                finished = position >= end
+            rows.extend(conn.execute(sql, (*bounds, *params, count - len(rows))).fetchall())
+            if len(rows) == count or finished:
+                return rows, None
+            if time.perf_counter() > deadline:
+                return rows, position
+
+    def _is_rare(self, word):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM approval_words WHERE word = ? LIMIT ?)",
+            (word, RARE_WORD_LIMIT)
+        ).fetchone()[0] < RARE_WORD_LIMIT
+
+    def between_dates(self, start, end):
+        return self._select("WHERE date BETWEEN ? AND ?", (start, end))
@@ -0,0 +1,209 @@
+from datetime import datetime, timezone
+from cluster import ChangeFeed
+from config import (
+    APPROVALS_DB_PATH,
+    APPROVALS_JOURNAL_DIR,
+    CLUSTER_POLL_MS,
+    DEFAULT_CURRENCY,
+    JOURNAL_FSYNC_INTERVAL_MS,
+    JOURNAL_SNAPSHOT_EVERY,
+    WORKERS
+)
+from directory import UserDirectory
+from ids import SnowflakeIdAllocator, worker_id_from_env
+from journal import JournaledApprovalStore
+from money import AmountError, parse_amount
+from render_cache import PublishedViews
+from selection import Selections
+from sqlite_store import SQLiteApprovalStore
+from store import TIMESTAMP_FORMAT, ApprovalStore
+from views import fragment_cache
+
+# Mock data for approvals with initial state as "pending"
+mock_approvals = [
+    {
+        "id": "1",
+        "title": "May Expenses",
+        "requestor": "U02PGRD77E1",  # Use Slack user IDs
+        "amount_minor": 100000,  # Cents
+        "total_minor": 100000,
+        "currency": "AUD",
+        "date": "2024-05-27",
+        "employee": "U02PGRD77E1",  # Use Slack user IDs
+        "status": "pending",
+        "file_url": "",
+        "custom_file_name": "",  # Add custom file name
+        "image_url": "https://example.com/image.png",  # Add image URL
+        "home_ts": "",
+        "type": "expense",
+        "submitted": "2024-05-27 09:00 UTC"
+    }
+    # Add more mock approvals here
+]
+
+# Keep approvals in SQLite when a database path is configured so they survive
+# restarts, or in memory backed by an event journal that also records who
+# changed what
+if APPROVALS_JOURNAL_DIR:
+    store = JournaledApprovalStore(
+        APPROVALS_JOURNAL_DIR,
+        mock_approvals,
+        fsync_interval=JOURNAL_FSYNC_INTERVAL_MS / 1000,
+        snapshot_every=JOURNAL_SNAPSHOT_EVERY,
+        default_currency=DEFAULT_CURRENCY
+    )
+elif APPROVALS_DB_PATH:
+    store = SQLiteApprovalStore(APPROVALS_DB_PATH, mock_approvals, default_currency=DEFAULT_CURRENCY)
+else:
+    store = ApprovalStore(mock_approvals)
+
+# Hash of the view each user currently has on their App Home
+published_views = PublishedViews()
+
+# Approvals each user has ticked for a bulk approve or reject
+selections = Selections()
+
+# Names and time zones of workspace users, warmed at startup
+user_directory = UserDirectory()
+
+# Approval IDs stay unique across deletes and across worker processes. A
+# SQLite database could have other writers; with WORKERS > 1 each worker is
+# started with its own WORKER_ID (see app.py), and the parent allocates none.
+id_allocator = SnowflakeIdAllocator(worker_id_from_env(shared=bool(APPROVALS_DB_PATH) and WORKERS == 1))
+
+# Worker processes sharing the SQLite store keep their per-process state in
+# step through a feed in the same database
+change_feed = None
+if WORKERS > 1 and APPROVALS_DB_PATH and not APPROVALS_JOURNAL_DIR:
+    change_feed = ChangeFeed(APPROVALS_DB_PATH, id_allocator.worker_id, CLUSTER_POLL_MS / 1000)
+
+# Share what this worker knows with the others, and apply what they share:
+# which page each user's App Home shows (so publishes are skipped and
+# changes fanned out as if one process had published every view), bulk
+# selections, and changed approvals, whose cached fragments are dropped
+def join_cluster(feed):
+    feed.subscribe(
+        "home",
+        lambda user_id, view_hash, page, approval_ids: published_views.record(
+            user_id, view_hash, tuple(page) if page else None, approval_ids
+        )
+    )
+    feed.subscribe("selection", selections.replace)
+    feed.subscribe("approvals", lambda approval_ids: [fragment_cache.invalidate(approval_id) for approval_id in approval_ids])
+    selections.on_change = lambda user_id, approval_ids: feed.publish("selection", user_id=user_id, approval_ids=sorted(approval_ids))
+    feed.start()
+
+# Tell the other workers about a home tab this one published
+def share_home(user_id, view_hash, page, approval_ids):
+    if change_feed is not None:
+        change_feed.publish("home", user_id=user_id, view_hash=view_hash, page=page, approval_ids=sorted(approval_ids))
+
+# Tell the other workers which approvals this one changed
+def share_approvals(approvals):
+    if change_feed is not None:
+        approval_ids = [approval["id"] for approval in approvals if approval is not None]
+        if approval_ids:
+            change_feed.publish("approvals", approval_ids=approval_ids)
+
+# Function to generate a unique ID for new approvals
+def generate_approval_id():
+    return str(id_allocator.next_id())
+
+# When a new approval was submitted, which the App Home ages the queue by
+def submitted_now():
+    return datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+# A modal submission that can't be saved as entered; errors maps the block_id
+# of each offending input to the message Slack shows under it
+class InvalidSubmission(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+# Expense fields from the new/edit expense modal, with the amount and total
+# as integer minor units of one currency. Raises InvalidSubmission when
+# either can't be read.
+def expense_fields(state_values):
+    errors = {}
+    amounts = {}
+    currency = None
+    for field in ("amount", "total"):
+        try:
+            amounts[field], field_currency = parse_amount(
+                state_values[f"{field}_input"][field]["value"], currency or DEFAULT_CURRENCY
+            )
+        except AmountError as e:
+            errors[f"{field}_input"] = str(e)
+            continue
+        if currency and field_currency != currency:
+            errors[f"{field}_input"] = f"Use the same currency as the requested amount ({currency})"
+        currency = currency or field_currency
+    if errors:
+        raise InvalidSubmission(errors)
+
+    return {
+        "title": state_values["title_input"]["title"]["value"],
+        "requestor": state_values["requestor_input"]["requestor"]["selected_user"],
+        "amount_minor": amounts["amount"],
+        "total_minor": amounts["total"],
+        "currency": currency,
+        "date": state_values["date_input"]["date"]["selected_date"],
+        "employee": state_values["employee_input"]["employee"]["selected_user"],
+        "file_url": state_values["file_input"]["file_url"]["value"] if "file_input" in state_values else "",
+        "custom_file_name": state_values["custom_file_name_input"]["custom_file_name"]["value"] if "custom_file_name_input" in state_values else "",
+        "image_url": state_values["image_url_input"]["image_url"]["value"] if "image_url_input" in state_values else ""
+    }
+
+# Time off fields from the new/edit time off modal
+def time_off_fields(state_values):
+    start_date = datetime.strptime(state_values["start_date_input"]["start_date"]["selected_date"], "%Y-%m-%d")
+    end_date = datetime.strptime(state_values["end_date_input"]["end_date"]["selected_date"], "%Y-%m-%d")
+    days_requested = (end_date - start_date).days + 1
+
+    return {
+        "request_date": state_values["request_date_input"]["request_date"]["selected_date"],
+        "request_type": state_values["request_type_input"]["request_type"]["value"],
+        "time_requested": f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
+        "summary": str(days_requested),
+        "notes": state_values["notes_input"]["notes"]["value"],
+        "employee": state_values["employee_input"]["employee"]["selected_user"],
+        "image_url": state_values["image_url_input"]["image_url"]["value"] if "image_url_input" in state_values else ""
+    }
+
+def new_expense_approval(state_values):
+    fields = expense_fields(state_values)
+    return {
+        "id": generate_approval_id(),
+        **fields,
+        "status": "pending",
+        "type": "expense",
+        "home_ts": "",
+        "submitted": submitted_now()
+    }
+
+def new_time_off_approval(state_values, user_id):
+    return {
+        "id": generate_approval_id(),
+        "title": "Time Off Request",
+        "requestor": user_id,
+        **time_off_fields(state_values),
+        "status": "pending",
+        "type": "time_off",
+        "home_ts": "",
+        "submitted": submitted_now()
+    }
+
+# Merge two pending refreshes of one user's App Home, each (client, page,
+# foreground). A page the user asked for (filter, pagination) beats a refresh
+# of whatever they were last shown, and a refresh the user triggered keeps
+# its client and priority over a fan-out one.
+def merge_home_refresh(pending, request):
+    client, page, foreground = request
+    if pending[2] and not foreground:
+        client = pending[0]
+    return client, page or pending[1], foreground or pending[2]
+
+# A refresh the user triggered doesn't wait behind fan-out work: if it merges
+# into one queued for the fan-out, it goes on the outbound queue as well
+def reissue_home_refresh(queued, merged):
+    return merged[2] and not queued[2]
@@ -0,0 +1,585 @@
+import math
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from query import RANGE_FILTERS, SEARCH_FIELDS, matcher, query_ranges, search_words, words
+
+# Fields that get a secondary index in the approval store
+INDEXED_FIELDS = ("status", "employee", "requestor", "type", "currency")
+
+# How decision times are stamped on approvals
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M UTC"
+
+# Approvals shown per App Home page, keeps the view well under Slack's 100 block limit
+PAGE_SIZE = 10
+
+# Writers to approvals that hash to the same stripe take turns
+LOCK_STRIPES = 64
+
+# A query intersects the indexes covering its filters. A range index (date,
+# amount) only joins in when this few approvals fall in the range, since its
+# matches have to be put back in ID order first; wider ranges are checked
+# approval by approval instead.
+RANGE_SORT_LIMIT = 5000
+
+# Seconds a query looks for one page's approvals before it settles for a
+# short one, so filters that each match many approvals but together few
+# can't walk the whole store
+QUERY_TIME_LIMIT = 0.005
+
+# Index keys copied at a time while walking one for a query, and looked
+# through between checks of QUERY_TIME_LIMIT
+WALK_CHUNK = 64
+
+# Entries per chunk of a range index, which splits chunks at twice this
+RANGE_CHUNK = 1000
+
+# Keys past its last position a walk looks through first for its next key
+# in another index, before searching all of it
+SEEK_WINDOW = 64
+
+# Sorts after every (int id, id) key
+_LAST_KEY = (math.inf,)
+
+
+# An update that expected a version of an approval other than the current
+# one: someone else changed it first. `approval` is the current version.
+class VersionConflict(Exception):
+    def __init__(self, approval, expected_version):
+        super().__init__(f"Approval {approval['id']} is at version {approval.get('version')}, not {expected_version}")
+        self.approval = approval
+        self.expected_version = expected_version
+
+
+# Whether applying `fields` to an approval would leave it as it is
+def unchanged(approval, fields):
+    return all(field in approval and approval[field] == value for field, value in fields.items())
+
+
+# Approval IDs are numeric strings, ordering them numerically keeps creation order
+def _sort_key(approval_id):
+    return (int(approval_id), approval_id)
+
+
+# Remove a key from the sorted keys stored under `value`, and the value once it has none
+def _discard(index, value, key):
+    keys = index.get(value)
+    if keys is None:
+        return
+    position = bisect_left(keys, key)
+    if position < len(keys) and keys[position] == key:
+        del keys[position]
+    if not keys:
+        del index[value]
+
+
+# Position of the first of the sorted `keys` not below `key`, or (backwards)
+# just after the last not above it, trying the SEEK_WINDOW keys from the
+# position `hint` a walk last found first: its next key is usually close by,
+# and a short search stays in memory it just read. A hint a concurrent write
+# has left pointing past the key falls back to searching every key.
+def _seek(keys, key, hint, backwards):
+    size = len(keys)
+    if hint > size:
+        hint = size
+    if backwards:
+        after = keys[hint:hint + 1]
+        if after and after[0] <= key:
+            return bisect_right(keys, key, hint)
+        low = hint - SEEK_WINDOW if hint > SEEK_WINDOW else 0
+        position = bisect_right(keys, key, low, hint)
+        return bisect_right(keys, key, 0, low) if position == low and low else position
+    before = keys[hint - 1:hint] if hint else None
+    if before and before[0] >= key:
+        return bisect_left(keys, key, 0, hint)
+    high = hint + SEEK_WINDOW
+    if high > size:
+        high = size
+    position = bisect_left(keys, key, hint, high)
+    return bisect_left(keys, key, high) if position == high else position
+
+
+# Sorted (value, key) entries for one range filter. Values arrive in any
+# order, so rather than one list, where an insert in the middle moves half
+# the index, entries are kept in sorted chunks of up to 2 * RANGE_CHUNK and
+# an insert moves at most one chunk. Readers take no lock: they copy the
+# list of chunks, and a chunk changing under them moves them by at most the
+# entry being added or removed.
+class RangeIndex:
+    def __init__(self):
+        self._chunks = []
+        # Last entry of each chunk, for finding where an entry goes
+        self._maxes = []
+
+    def add(self, entry):
+        if not self._chunks:
+            self._chunks.append([entry])
+            self._maxes.append(entry)
+            return
+        i = min(bisect_left(self._maxes, entry), len(self._chunks) - 1)
+        chunk = self._chunks[i]
+        insort(chunk, entry)
+        self._maxes[i] = chunk[-1]
+        if len(chunk) > 2 * RANGE_CHUNK:
+            # New lists, so a reader holding the old one still sees all of it
+            self._chunks[i:i + 1] = [chunk[:RANGE_CHUNK], chunk[RANGE_CHUNK:]]
+            self._maxes[i:i + 1] = [chunk[RANGE_CHUNK - 1], chunk[-1]]
+
+    def remove(self, entry):
+        i = bisect_left(self._maxes, entry)
+        if i == len(self._chunks):
+            return
+        chunk = self._chunks[i]
+        position = bisect_left(chunk, entry)
+        if position < len(chunk) and chunk[position] == entry:
+            del chunk[position]
+            if chunk:
+                self._maxes[i] = chunk[-1]
+            else:
+                del self._chunks[i]
+                del self._maxes[i]
+
+    # (chunk, start, end) for each chunk with entries between low and high
+    # (inclusive, either may be None)
+    def _spans(self, low, high):
+        low_entry = None if low is None else (low,)
+        high_entry = None if high is None else (high, _LAST_KEY)
+        # A split can leave _maxes a step behind _chunks, so this may start a chunk early
+        first_chunk = 0 if low_entry is None else max(bisect_left(self._maxes, low_entry) - 1, 0)
+        for chunk in self._chunks[first_chunk:]:
+            # Slices rather than indexes, a chunk may empty in between
+            last, first = chunk[-1:], chunk[:1]
+            if not last or (low_entry is not None and last[0] < low_entry):
+                continue
+            if high_entry is not None and first[0] > high_entry:
+                break
+            start = 0 if low_entry is None else bisect_left(chunk, low_entry)
+            end = len(chunk) if high_entry is None else bisect_right(chunk, high_entry)
+            yield chunk, start, end
+
+    # Entries between low and high, give or take the chunks at either end,
+    # which is all planning a query needs
+    def estimate(self, low, high):
+        maxes = self._maxes[:]
+        first = 0 if low is None else bisect_left(maxes, (low,))
+        last = len(maxes) if high is None else bisect_right(maxes, (high, _LAST_KEY)) + 1
+        return sum(len(chunk) for chunk in self._chunks[first:last])
+
+    # Sorted keys of the entries between low and high
+    def keys(self, low, high):
+        return sorted(key for chunk, start, end in self._spans(low, high) for _, key in chunk[start:end])
+
+
+# ((type, currency), amount in minor units) that a pending approval adds to
+# the queue totals, or None for one that isn't pending. Currency is "" for
+# approvals without an amount.
+def queue_entry(approval):
+    if approval is None or approval.get("status") != "pending":
+        return None
+    return (approval.get("type") or "", approval.get("currency") or ""), approval.get("amount_minor") or 0
+
+
+# The App Home queue summary from (type, currency) -> (pending count, amount)
+# totals and the oldest pending approval: {"pending": count, "oldest":
+# approval or None, "amounts": {currency: minor units}, "types": {type:
+# {"pending": count, "amounts": {currency: minor units}}}}
+def queue_summary(totals, oldest):
+    summary = {"pending": 0, "oldest": oldest, "amounts": {}, "types": {}}
+    for (approval_type, currency), (count, amount) in totals:
+        if not count:
+            continue
+        by_type = summary["types"].setdefault(approval_type, {"pending": 0, "amounts": {}})
+        by_type["pending"] += count
+        summary["pending"] += count
+        if currency:
+            by_type["amounts"][currency] = amount
+            summary["amounts"][currency] = summary["amounts"].get(currency, 0) + amount
+    return summary
+
+
+# Running totals of the pending approvals by type and currency, adjusted on
+# every change so the App Home summary never counts the approvals. Changes
+# swap in a new dict, so readers take no lock; callers serialise changes.
+class QueueStats:
+    def __init__(self, approvals=()):
+        self._totals = {}
+        for approval in approvals:
+            self.change(None, approval)
+
+    # Account for an approval going from `before` to `after`, either of
+    # which is None when it's being created or deleted
+    def change(self, before, after):
+        removed, added = queue_entry(before), queue_entry(after)
+        if removed == added:
+            return
+        totals = dict(self._totals)
+        for entry, sign in ((removed, -1), (added, 1)):
+            if entry is not None:
+                key, amount = entry
+                count, total = totals.get(key, (0, 0))
+                totals[key] = (count + sign, total + sign * amount)
+                if not totals[key][0]:
+                    del totals[key]
+        self._totals = totals
+
+    def summary(self, oldest=None):
+        return queue_summary(self._totals.items(), oldest)
+
+
+# Storage interface shared by every approval store backend
+class BaseApprovalStore:
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, approval_id):
+        return self.get(approval_id) is not None
+
+    # Group several writes into one short transaction
+    @contextmanager
+    def transaction(self):
+        yield self
+
+    def get(self, approval_id):
+        raise NotImplementedError
+
+    # `actor` on the write methods is the user making the change, recorded by
+    # stores that keep a history of changes
+    def create(self, approval, actor=None):
+        raise NotImplementedError
+
+    # With expected_version, raises VersionConflict unless the approval is
+    # still at that version, so of two users acting on the same version of
+    # an approval only the first wins. An update that would leave every field
+    # as it is changes nothing, not even the version, and returns the
+    # approval as it stands.
+    def update(self, approval_id, actor=None, expected_version=None, **fields):
+        raise NotImplementedError
+
+    # Move an approval to a new status and stamp the time of the change
+    def transition(self, approval_id, status, actor=None, expected_version=None, **fields):
+        return self.update(
+            approval_id,
+            actor=actor,
+            expected_version=expected_version,
+            status=status,
+            timestamp=datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT),
+            **fields
+        )
+
+    # expected_version is checked as in update()
+    def delete(self, approval_id, actor=None, expected_version=None):
+        raise NotImplementedError
+
+    # Approvals matching a status filter, "all" returns every approval
+    def filter(self, status="all"):
+        raise NotImplementedError
+
+    def by_employee(self, user_id):
+        raise NotImplementedError
+
+    # Number of approvals in each status
+    def count_by_status(self):
+        counts = {}
+        for approval in self.filter("all"):
+            counts[approval.get("status")] = counts.get(approval.get("status"), 0) + 1
+        return counts
+
+    def by_requestor(self, user_id):
+        raise NotImplementedError
+
+    # Pending approvals summarised for the App Home header (see queue_summary)
+    def queue_stats(self):
+        pending = self.filter("pending")
+        return QueueStats(pending).summary(pending[0] if pending else None)
+
+    # One page of approvals matching a status filter, oldest first. Returns
+    # (approvals, prev_cursor, next_cursor); pass a cursor back with
+    # direction "next" or "prev" to move between pages. A cursor is None
+    # when there is nothing further in that direction.
+    def page(self, status="all", cursor=None, direction="next", limit=PAGE_SIZE):
+        raise NotImplementedError
+
+    # Like page(), for the approvals passing every filter in a query (a dict
+    # from query.parse_query). A store may stop looking before it fills a
+    # page, returning fewer approvals (even none) and a cursor to carry on
+    # from where it stopped.
+    def query(self, query, cursor=None, direction="next", limit=PAGE_SIZE):
+        raise NotImplementedError
+
+
+# In-memory approval store keyed by approval ID, with secondary indexes
+# by status, employee, requestor, type and currency, sorted indexes by
+# report date and by currency and amount, and an index of the words in each approval's searchable fields,
+# so neither handlers nor queries scan every approval.
+#
+# Safe to share between listener threads. A writer holds its approval's
+# lock (one of LOCK_STRIPES) from reading the current version to storing
+# the next, and takes the store-wide lock only while it swaps the approval
+# and its index entries. Approvals are copy-on-write: an update stores a new
+# dict rather than changing the old one, so readers take no lock and every
+# approval they get is a consistent snapshot, which callers must not mutate.
+# A listing that races a write may show that approval as it was just before
+# or just after it.
+class ApprovalStore(BaseApprovalStore):
+    def __init__(self, approvals=None):
+        self._write_lock = threading.Lock()
+        self._approval_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._approvals = {}
+        # Sorted (int id, id) keys of every approval, used for paging "all"
+        self._ordered = []
+        # field -> value -> sorted (int id, id) keys of matching approvals
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        # word -> sorted keys of approvals with it in a searchable field
+        self._words = {}
+        # range name -> RangeIndex of approvals that have a value for it
+        self._ranges = {name: RangeIndex() for name in RANGE_FILTERS}
+        self._queue = QueueStats()
+        for approval in approvals or []:
+            self.create(approval)
+
+    def __len__(self):
+        return len(self._approvals)
+
+    def __contains__(self, approval_id):
+        return approval_id in self._approvals
+
+    def _index(self, approval, fields=INDEXED_FIELDS, search=(), ranges=RANGE_FILTERS):
+        key = _sort_key(approval["id"])
+        # New IDs are monotonic, so this is almost always an append
+        for field in fields:
+            insort(self._indexes[field].setdefault(approval.get(field), []), key)
+        for word in search:
+            insort(self._words.setdefault(word, []), key)
+        for name in ranges:
+            value = RANGE_FILTERS[name][2](approval)
+            if value is not None:
+                self._ranges[name].add((value, key))
+
+    def _unindex(self, approval, fields=INDEXED_FIELDS, search=(), ranges=RANGE_FILTERS):
+        key = _sort_key(approval["id"])
+        for field in fields:
+            _discard(self._indexes[field], approval.get(field), key)
+        for word in search:
+            _discard(self._words, word, key)
+        for name in ranges:
+            value = RANGE_FILTERS[name][2](approval)
+            if value is not None:
+                self._ranges[name].remove((value, key))
+
+    def _approval_lock(self, approval_id):
+        return self._approval_locks[hash(approval_id) % LOCK_STRIPES]
+
+    # Approvals for index keys, skipping any deleted since the keys were read
+    def _resolve(self, keys):
+        approvals = self._approvals
+        return [approval for approval in (approvals.get(approval_id) for _, approval_id in keys) if approval is not None]
+
+    # Slicing copies an index list in one step, so a concurrent insort or
+    # delete can't shift it mid-read
+    def _lookup(self, field, value):
+        return self._resolve(self._indexes[field].get(value, [])[:])
+
+    def get(self, approval_id):
+        return self._approvals.get(approval_id)
+
+    def create(self, approval, actor=None):
+        approval.setdefault("version", 1)
+        search = search_words(approval)
+        with self._write_lock:
+            if approval["id"] in self._approvals:
+                raise ValueError(f"Approval {approval['id']} already exists")
+            # Indexed before it can be found by ID, so readers never see it half added
+            insort(self._ordered, _sort_key(approval["id"]))
+            self._index(approval, search=search)
+            self._approvals[approval["id"]] = approval
+            self._queue.change(None, approval)
+        return approval
+
+    # Store a copy of the approval with the field changes and the next
+    # version, re-indexing only the fields that changed
+    def update(self, approval_id, actor=None, expected_version=None, **fields):
+        with self._approval_lock(approval_id):
+            current = self._approvals.get(approval_id)
+            if current is None:
+                return None
+            if expected_version is not None and current.get("version") != expected_version:
+                raise VersionConflict(current, expected_version)
+            if unchanged(current, fields):
+                return current
+            approval = {**current, **fields, "version": current.get("version", 0) + 1}
+            changed = [field for field in INDEXED_FIELDS if field in fields and fields[field] != current.get(field)]
+            removed = added = ()
+            if any(field in fields for field in SEARCH_FIELDS):
+                before, after = search_words(current), search_words(approval)
+                removed, added = before - after, after - before
+            ranges = [name for name, (_, _, value_of) in RANGE_FILTERS.items() if value_of(current) != value_of(approval)]
+            with self._write_lock:
+                self._approvals[approval_id] = approval
+                self._unindex(current, changed, removed, ranges)
+                self._index(approval, changed, added, ranges)
+                self._queue.change(current, approval)
+        return approval
+
+    def delete(self, approval_id, actor=None, expected_version=None):
+        with self._approval_lock(approval_id):
+            current = self._approvals.get(approval_id)
+            if current is not None and expected_version is not None and current.get("version") != expected_version:
+                raise VersionConflict(current, expected_version)
+            with self._write_lock:
+                approval = self._approvals.pop(approval_id, None)
+                if approval is not None:
+                    key = _sort_key(approval_id)
+                    del self._ordered[bisect_left(self._ordered, key)]
+                    self._unindex(approval, search=search_words(approval))
+                    self._queue.change(approval, None)
+        return approval
+
+    def filter(self, status="all"):
+        if status == "all":
+            return self._resolve(self._ordered[:])
+        return self._lookup("status", status)
+
+    def page(self, status="all", cursor=None, direction="next", limit=PAGE_SIZE):
+        keys = self._ordered if status == "all" else self._indexes["status"].get(status, [])
+        if cursor is None:
+            start = 0
+        elif direction == "prev":
+            start = bisect_left(keys, _sort_key(cursor)) - limit
+            if start <= 0:
+                # Back at the beginning, show a full first page
+                return self.page(status, None, "next", limit)
+        else:
+            start = bisect_right(keys, _sort_key(cursor))
+        window = keys[start:start + limit]
+        approvals = self._resolve(window)
+        prev_cursor = window[0][1] if window and start > 0 else None
+        next_cursor = window[-1][1] if window and start + limit < len(keys) else None
+        return approvals, prev_cursor, next_cursor
+
+    # Pages through the approvals on every index covering one of the query's
+    # filters (see _walk), checking each against the rest. A page that takes
+    # longer than QUERY_TIME_LIMIT stops short, with a cursor at the last key
+    # it looked at.
+    def query(self, query, cursor=None, direction="next", limit=PAGE_SIZE):
+        if set(query) <= {"status"}:
+            return self.page(query.get("status", "all"), cursor, direction, limit)
+        postings = self._plan(query)
+        # Free text is settled by the word indexes
+        passes = matcher({name: value for name, value in query.items() if name != "text"})
+        if cursor is not None and direction == "prev":
+            found, last, stopped = self._walk(postings, passes, _sort_key(cursor), True, limit + 1)
+            if not stopped and len(found) <= limit:
+                # Back at the beginning, show a full first page
+                return self.query(query, None, "next", limit)
+            approvals = found[:limit][::-1]
+            if not stopped:
+                return approvals, approvals[0]["id"], approvals[-1]["id"]
+            # Nothing matched between where it stopped and the cursor
+            return approvals, last[1], approvals[-1]["id"] if approvals else last[1]
+        found, last, stopped = self._walk(postings, passes, None if cursor is None else _sort_key(cursor), False, limit + 1)
+        approvals = found[:limit]
+        if stopped:
+            next_cursor = last[1]
+        else:
+            next_cursor = approvals[-1]["id"] if len(found) > limit else None
+        prev_cursor = None
+        if cursor is not None:
+            # An empty page goes back from the last approval it looked at, which didn't match
+            prev_cursor = approvals[0]["id"] if approvals else last[1] if last is not None else cursor
+        return approvals, prev_cursor, next_cursor
+
+    # Sorted keys of the approvals on each index covering one of the query's
+    # filters, smallest first, or of every approval when none does
+    def _plan(self, query):
+        postings = []
+        for field in INDEXED_FIELDS:
+            if query.get(field):
+                postings.append(self._indexes[field].get(query[field], []))
+        for word in set(words(query.get("text"))):
+            postings.append(self._words.get(word, []))
+        postings.sort(key=len)
+        smallest = len(postings[0]) if postings else len(self._ordered)
+        for name, (low, high) in query_ranges(query).items():
+            if self._ranges[name].estimate(low, high) < min(smallest, RANGE_SORT_LIMIT):
+                postings.insert(0, self._ranges[name].keys(low, high))
+        return postings or [self._ordered]
+
+    # Up to `count` approvals on every one of `postings` that pass
+    # `passes(approval)`, walking forwards from after the key `after` (or from
+    # the start when None), or backwards from before it. Returns the
+    # approvals, the last key it looked at (None if none) and whether it ran
+    # out of QUERY_TIME_LIMIT with keys still to look at.
+    #
+    # The first posting drives the walk. A key missing from another posting
+    # moves the walk on to that posting's next key, so postings that rarely
+    # agree are crossed in steps rather than key by key. Keys are copied a
+    # chunk at a time and the position found again from the last key seen,
+    # so concurrent writes can't shift the walk.
+    def _walk(self, postings, passes, after, backwards, count):
+        found = []
+        approvals = self._approvals
+        driver, others = postings[0], postings[1:]
+        deadline = time.perf_counter() + QUERY_TIME_LIMIT
+        key, last, skip_to = after, None, None
+        # Where the walk last was in each of the other postings
+        hints = [len(keys) if backwards else 0 for keys in others]
+        while True:
+            if backwards:
+                end = bisect_left(driver, key) if skip_to is None else bisect_right(driver, skip_to)
+                chunk = driver[max(0, end - WALK_CHUNK):end][::-1]
+            else:
+                if skip_to is not None:
+                    start = bisect_left(driver, skip_to)
+                else:
+                    start = 0 if key is None else bisect_right(driver, key)
+                chunk = driver[start:start + WALK_CHUNK]
+            if not chunk:
+                return found, last, False
+            for key in chunk:
+                last = key
+                if skip_to is not None and (key > skip_to if backwards else key < skip_to):
+                    continue
+                skip_to = None
+                for j, keys in enumerate(others):
+                    position = hints[j] = _seek(keys, key, hints[j], backwards)
+                    if backwards:
+                        nearest = keys[position - 1:position] if position else None
+                    else:
+                        nearest = keys[position:position + 1]
+                    if not nearest:
+                        # Past the end of one of the postings, so nothing further matches
+                        return found, last, False
+                    if nearest[0] != key:
+                        skip_to = nearest[0]
+                        break
+                if skip_to is None:
+                    approval = approvals.get(key[1])
+                    if approval is not None and passes(approval):
+                        found.append(approval)
+                        if len(found) == count:
+                            return found, last, False
+            if time.perf_counter() > deadline:
+                if backwards:
+                    more = bisect_left(driver, key) > 0
+                else:
+                    more = bisect_right(driver, key) < len(driver)
+                return found, last, more
+
+    def by_employee(self, user_id):
+        return self._lookup("employee", user_id)
+
+    def count_by_status(self):
+        # list() copies the items in one step, so a status appearing or disappearing can't break the loop
+        return {status: len(keys) for status, keys in list(self._indexes["status"].items())}
+
+    def by_requestor(self, user_id):
+        return self._lookup("requestor", user_id)
+
+    # From the running totals, and the first pending key, since IDs follow
+    # creation order
+    def queue_stats(self):
+        oldest = self._resolve(self._indexes["status"].get("pending", [])[:1])
+        return self._queue.summary(oldest[0] if oldest else None)
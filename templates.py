@@ -0,0 +1,62 @@
+# Placeholder for a per-request value in a view template
+class Slot:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Slot({self.name!r})"
+
+
+# A view built once, with Slot placeholders where per-request values go.
+# The path to every slot is worked out up front, and with it the skeleton
+# of dicts and lists along those paths: rendering copies just that skeleton
+# and patches each slot's value into its copy. The rest of the tree is
+# shared by every view rendered from the template, so rendered views must
+# not be mutated. A template without slots renders the same view every time.
+class ViewTemplate:
+    def __init__(self, view):
+        self.view = view
+        # Slot name -> paths (tuples of keys and indexes) where it appears
+        self.paths = {}
+        self._collect(view, ())
+        self._plan()
+
+    def _collect(self, node, path):
+        if isinstance(node, Slot):
+            self.paths.setdefault(node.name, []).append(path)
+        elif isinstance(node, dict):
+            for key, value in node.items():
+                self._collect(value, path + (key,))
+        elif isinstance(node, list):
+            for index, value in enumerate(node):
+                self._collect(value, path + (index,))
+
+    # The skeleton as a list of containers, the view first, each copied in
+    # turn from (index of its parent, key in it); and each slot as (index of
+    # its container, key in it, slot name)
+    def _plan(self):
+        self._copies = []
+        self._patches = []
+        # Path prefix -> index of the container at it
+        containers = {(): 0}
+        for name, paths in self.paths.items():
+            for path in paths:
+                for depth in range(1, len(path)):
+                    prefix = path[:depth]
+                    if prefix not in containers:
+                        containers[prefix] = len(containers)
+                        self._copies.append((containers[prefix[:-1]], prefix[-1]))
+                self._patches.append((containers[path[:-1]], path[-1], name))
+
+    def render(self, **values):
+        if not self.paths:
+            return self.view
+        nodes = [self.view.copy()]
+        for parent, key in self._copies:
+            node = nodes[parent][key] = nodes[parent][key].copy()
+            nodes.append(node)
+        for container, key, name in self._patches:
+            nodes[container][key] = values[name]
+        return nodes[0]
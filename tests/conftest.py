@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import JournaledApprovalStore
+from sqlite_store import SQLiteApprovalStore
+from store import ApprovalStore
+
+
+# A pending expense approval, with any field overridden
+def expense(approval_id, **fields):
+    return {
+        "id": str(approval_id),
+        "title": "May Expenses",
+        "requestor": "U0001",
+        "amount_minor": 10000,
+        "total_minor": 10000,
+        "currency": "AUD",
+        "date": "2024-05-27",
+        "employee": "U0002",
+        "status": "pending",
+        "file_url": "",
+        "custom_file_name": "",
+        "image_url": "",
+        "home_ts": "",
+        "type": "expense",
+        **fields
+    }
+
+
+# A pending time off approval, with any field overridden
+def time_off(approval_id, **fields):
+    return {
+        "id": str(approval_id),
+        "title": "Time Off Request",
+        "requestor": "U0001",
+        "request_date": "2024-05-20",
+        "time_requested": "2024-06-03 to 2024-06-07",
+        "request_type": "Vacation",
+        "notes": "Family trip",
+        "employee": "U0002",
+        "status": "pending",
+        "image_url": "",
+        "home_ts": "",
+        "type": "time_off",
+        **fields
+    }
+
+
+# A new, empty store of each backend
+@pytest.fixture(params=["memory", "sqlite", "journal"])
+def make_store(request, tmp_path):
+    stores = []
+
+    def make(approvals=None):
+        if request.param == "memory":
+            store = ApprovalStore(approvals)
+        elif request.param == "sqlite":
+            store = SQLiteApprovalStore(str(tmp_path / f"approvals-{len(stores)}.db"), approvals)
+        else:
+            store = JournaledApprovalStore(str(tmp_path / f"journal-{len(stores)}"), approvals, fsync_interval=3600)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        if hasattr(store, "close"):
+            store.close()
@@ -0,0 +1,131 @@
+import threading
+import time
+
+from coalesce import Debouncer
+from state import merge_home_refresh, reissue_home_refresh
+
+WINDOW = 0.1
+
+
+# Flush target that records each job and, unless told otherwise, starts it
+# straight away, as an idle queue would
+class Jobs:
+    def __init__(self, start=True):
+        self.start = start
+        self.flushed = []
+        self.claims = []
+        self.lock = threading.Lock()
+
+    def __call__(self, key, request, claim):
+        with self.lock:
+            self.claims.append(claim)
+            if self.start:
+                self.flushed.append((key, claim(), time.monotonic()))
+
+    def requests(self):
+        with self.lock:
+            return [request for _, request, _ in self.flushed]
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+def test_first_request_flushes_and_the_rest_merge_until_the_key_is_quiet():
+    jobs = Jobs()
+    debouncer = Debouncer(jobs, window=WINDOW, max_delay=10, merge=lambda pending, request: pending + request)
+    debouncer.submit("U1", [1])
+    assert jobs.requests() == [[1]]
+    for request in ([2], [3], [4]):
+        debouncer.submit("U1", request)
+    debouncer.submit("U2", [5])
+    assert jobs.requests() == [[1], [5]]
+    wait_for(lambda: len(jobs.flushed) == 3)
+    assert jobs.requests()[2] == [2, 3, 4]
+    assert debouncer.pending() == 0
+
+
+def test_a_busy_key_still_flushes_after_max_delay():
+    jobs = Jobs()
+    debouncer = Debouncer(jobs, window=WINDOW, max_delay=0.3)
+    debouncer.submit("U1", 0)
+    started = time.monotonic()
+    for i in range(1, 20):
+        time.sleep(WINDOW / 4)
+        debouncer.submit("U1", i)
+    flushed_at = [at for _, _, at in jobs.flushed]
+    assert len(flushed_at) >= 2
+    assert flushed_at[1] - started < 0.3 + WINDOW
+
+
+def test_zero_window_flushes_every_request():
+    jobs = Jobs()
+    debouncer = Debouncer(jobs, window=0)
+    for i in range(3):
+        debouncer.submit("U1", i)
+    assert jobs.requests() == [0, 1, 2]
+
+
+def test_requests_merge_into_a_queued_job_until_it_starts():
+    jobs = Jobs(start=False)
+    debouncer = Debouncer(jobs, window=0, merge=lambda pending, request: pending + request)
+    for i in range(5):
+        debouncer.submit("U1", [i])
+    assert len(jobs.claims) == 1
+    assert debouncer.pending() == 1
+    claim = jobs.claims[0]
+    assert claim() == [0, 1, 2, 3, 4]
+    assert debouncer.pending() == 0
+    # A retry of the job gets the same request back
+    assert claim() == [0, 1, 2, 3, 4]
+    debouncer.submit("U1", [5])
+    assert len(jobs.claims) == 2
+    # ...unless a newer job has been queued for the key since
+    assert claim() is None
+    assert jobs.claims[1]() == [5]
+
+
+def test_reissued_requests_are_claimed_by_whichever_job_starts_first():
+    jobs = Jobs(start=False)
+    debouncer = Debouncer(jobs, window=0, merge=lambda pending, request: max(pending, request), reissue=lambda queued, merged: merged > queued)
+    debouncer.submit("U1", 1)
+    debouncer.submit("U1", 1)
+    debouncer.submit("U1", 2)
+    first, second = jobs.claims
+    assert second() == 2
+    assert first() is None
+
+
+def test_a_refused_flush_is_kept_and_tried_again():
+    refusals = [False]
+    flushed = []
+
+    def flush(key, request, claim):
+        if refusals:
+            return refusals.pop()
+        flushed.append(claim())
+
+    debouncer = Debouncer(flush, window=0, merge=lambda pending, request: pending + request, retry_delay=WINDOW)
+    debouncer.submit("U1", [1])
+    debouncer.submit("U1", [2])
+    assert debouncer.pending() == 1
+    wait_for(lambda: flushed)
+    assert flushed == [[1, 2]]
+    assert debouncer.pending() == 0
+
+
+def test_home_refresh_merge_rules():
+    user_client, fanout_client = object(), object()
+    page = ("status=pending", "42", "next")
+    # A page the user asked for beats a refresh of whatever they last saw
+    assert merge_home_refresh((user_client, page, True), (fanout_client, None, False)) == (user_client, page, True)
+    assert merge_home_refresh((fanout_client, None, False), (user_client, page, True)) == (user_client, page, True)
+    # A refresh the user triggered keeps its client and priority
+    assert merge_home_refresh((user_client, None, True), (fanout_client, None, False)) == (user_client, None, True)
+    assert merge_home_refresh((fanout_client, None, False), (fanout_client, None, False)) == (fanout_client, None, False)
+    assert reissue_home_refresh((fanout_client, None, False), (user_client, None, True))
+    assert not reissue_home_refresh((user_client, None, True), (user_client, page, True))
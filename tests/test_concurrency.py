@@ -0,0 +1,96 @@
+import random
+import sys
+import threading
+from collections import Counter
+
+import pytest
+
+from conftest import expense
+from store import VersionConflict
+
+SECONDS = 1.0
+THREADS = 6
+
+
+# A cut-down benchmarks/stress_store.py: writers approve, revert and edit
+# approvals at the version they read while readers check every approval
+# they see, then each approval's version must account for exactly the
+# writes that succeeded on it
+class Stress:
+    def __init__(self, store, ids):
+        self.store = store
+        self.ids = ids
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.writes = Counter()
+        self.failures = []
+
+    # title and notes are always written together, so a read seeing them differ is torn
+    def check(self, approval):
+        if approval is not None and approval["title"] != approval["notes"]:
+            raise AssertionError(f"Torn read of approval {approval['id']}: {approval['title']!r} vs {approval['notes']!r}")
+
+    def write(self, rng):
+        approval_id = rng.choice(self.ids)
+        approval = self.store.get(approval_id)
+        self.check(approval)
+        if rng.random() < 0.5:
+            revision = f"rev {rng.random():.6f}"
+            fields = {"title": revision, "notes": revision}
+        else:
+            fields = {"status": "pending" if approval["status"] != "pending" else rng.choice(("approved", "rejected"))}
+        try:
+            self.store.update(approval_id, expected_version=approval["version"], **fields)
+        except VersionConflict:
+            return
+        with self.lock:
+            self.writes[approval_id] += 1
+
+    def read(self, rng):
+        self.check(self.store.get(rng.choice(self.ids)))
+        for approval in self.store.filter(rng.choice(("pending", "approved", "rejected"))):
+            self.check(approval)
+
+    def run(self, action, index):
+        rng = random.Random(index)
+        try:
+            while not self.stop.is_set():
+                action(rng)
+        except Exception as e:
+            self.failures.append(f"{action.__name__} thread {index}: {e!r}")
+            self.stop.set()
+
+
+@pytest.fixture
+def fast_switching():
+    interval = sys.getswitchinterval()
+    # Switch threads often, so races show up in a short run
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_no_torn_reads_or_lost_updates(make_store, fast_switching):
+    store = make_store([expense(i, notes="May Expenses") for i in range(1, 51)])
+    stress = Stress(store, [str(i) for i in range(1, 51)])
+    threads = [
+        threading.Thread(target=stress.run, args=((stress.write, stress.read)[i % 2], i), daemon=True)
+        for i in range(THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    stress.stop.wait(SECONDS)
+    stress.stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert stress.failures == []
+    assert sum(stress.writes.values()) > 0
+    for approval_id in stress.ids:
+        approval = store.get(approval_id)
+        stress.check(approval)
+        assert approval["version"] == 1 + stress.writes[approval_id]
+    everything = store.filter("all")
+    for status in ("pending", "approved", "rejected"):
+        expected = [approval["id"] for approval in everything if approval["status"] == status]
+        assert [approval["id"] for approval in store.filter(status)] == expected
@@ -0,0 +1,73 @@
+import logging
+import threading
+
+import pytest
+
+from ids import EPOCH_MS, SnowflakeIdAllocator, worker_id_from_env
+
+
+# A clock that returns the given times in turn, then keeps returning the last
+def clock(*seconds):
+    times = list(seconds)
+
+    def now():
+        return times.pop(0) if len(times) > 1 else times[0]
+    return now
+
+
+def test_ids_are_unique_and_increasing_across_threads():
+    allocator = SnowflakeIdAllocator(7)
+    allocated = [[] for _ in range(8)]
+
+    def allocate(ids):
+        for _ in range(5000):
+            ids.append(allocator.next_id())
+
+    threads = [threading.Thread(target=allocate, args=(ids,)) for ids in allocated]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for ids in allocated:
+        assert ids == sorted(ids)
+    everything = [approval_id for ids in allocated for approval_id in ids]
+    assert len(set(everything)) == len(everything)
+
+
+def test_ids_keep_increasing_when_the_clock_goes_backwards():
+    start = EPOCH_MS / 1000 + 100
+    allocator = SnowflakeIdAllocator(1, clock=clock(start, start + 0.005, start - 2, start - 1, start + 0.001, start + 0.010))
+    ids = [allocator.next_id() for _ in range(6)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == 6
+
+
+def test_an_exhausted_sequence_borrows_the_next_millisecond():
+    allocator = SnowflakeIdAllocator(1, clock=clock(EPOCH_MS / 1000 + 100))
+    ids = [allocator.next_id() for _ in range(10000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_workers_never_share_an_id():
+    now = clock(EPOCH_MS / 1000 + 100)
+    first, second = SnowflakeIdAllocator(1, clock=now), SnowflakeIdAllocator(2, clock=now)
+    assert not {first.next_id() for _ in range(100)} & {second.next_id() for _ in range(100)}
+
+
+def test_worker_id_must_fit_in_its_bits():
+    with pytest.raises(ValueError):
+        SnowflakeIdAllocator(1024)
+    with pytest.raises(ValueError):
+        SnowflakeIdAllocator(-1)
+
+
+def test_worker_id_from_env(monkeypatch, caplog):
+    monkeypatch.setenv("WORKER_ID", "12")
+    assert worker_id_from_env(shared=True) == 12
+    monkeypatch.delenv("WORKER_ID")
+    with caplog.at_level(logging.WARNING, logger="ids"):
+        assert 0 <= worker_id_from_env() <= 1023
+        assert not caplog.records
+        worker_id_from_env(shared=True)
+    assert "WORKER_ID is not set" in caplog.text
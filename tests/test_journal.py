@@ -0,0 +1,118 @@
+import glob
+import os
+
+import pytest
+
+from conftest import expense
+from journal import JournaledApprovalStore, audit_trail, read_events
+from store import VersionConflict
+
+
+def open_store(directory, approvals=None):
+    return JournaledApprovalStore(str(directory), approvals, fsync_interval=3600)
+
+
+def segments(directory):
+    return sorted(glob.glob(os.path.join(str(directory), "journal-*.jsonl")))
+
+
+def test_reopening_replays_the_journal(tmp_path):
+    store = open_store(tmp_path, [expense(1), expense(2), expense(3)])
+    store.transition("1", "approved", actor="U0003", expected_version=1)
+    store.update("2", actor="U0001", title="June Expenses")
+    store.delete("3", actor="U0001")
+    before = store.filter("all")
+    store.close()
+
+    reopened = open_store(tmp_path)
+    assert reopened.filter("all") == before
+    assert reopened.get("1")["version"] == 2
+    assert "3" not in reopened
+    reopened.close()
+
+
+def test_changes_are_on_disk_once_the_transaction_exits(tmp_path):
+    store = open_store(tmp_path, [expense(1)])
+    with store.transaction():
+        store.transition("1", "approved")
+    # Read without closing, as after a crash
+    assert [event["op"] for event in read_events(str(tmp_path))] == ["create", "update"]
+    store.close()
+
+
+def test_torn_tail_is_dropped_and_appends_continue(tmp_path):
+    store = open_store(tmp_path, [expense(1), expense(2)])
+    store.transition("1", "approved")
+    store.close()
+    with open(segments(tmp_path)[-1], "ab") as segment:
+        segment.write(b'{"seq":4,"at":1.0,"op":"update","id":"2","fie')
+
+    # The partial line is ignored when read...
+    assert [event["seq"] for event in read_events(str(tmp_path))] == [1, 2, 3]
+    # ...and cut off when the store reopens, so the next event starts a line
+    reopened = open_store(tmp_path)
+    assert reopened.get("2")["version"] == 1
+    with open(segments(tmp_path)[-1], "rb") as segment:
+        assert segment.read().endswith(b"}\n")
+    reopened.transition("2", "rejected", comments="Missing receipts")
+    reopened.close()
+
+    assert [event["seq"] for event in read_events(str(tmp_path))] == [1, 2, 3, 4]
+    recovered = open_store(tmp_path)
+    assert recovered.get("2")["status"] == "rejected"
+    assert recovered.get("2")["comments"] == "Missing receipts"
+    recovered.close()
+
+
+def test_noop_updates_and_conflicts_are_not_journaled(tmp_path):
+    store = open_store(tmp_path, [expense(1)])
+    seq = store.journal.seq
+    assert store.update("1", status="pending")["version"] == 1
+    store.transition("1", "approved", expected_version=1)
+    with pytest.raises(VersionConflict):
+        store.transition("1", "rejected", expected_version=1)
+    with pytest.raises(VersionConflict):
+        store.delete("1", expected_version=1)
+    assert store.journal.seq == seq + 1
+    store.close()
+
+
+def test_recovery_starts_from_the_latest_snapshot(tmp_path):
+    store = open_store(tmp_path, [expense(1), expense(2)])
+    store.transition("1", "approved")
+    store.snapshot()
+    store.update("2", title="June Expenses")
+    store.close()
+
+    # Events up to the snapshot aren't needed any more, but are kept for auditing
+    assert len(glob.glob(os.path.join(str(tmp_path), "snapshot-*.jsonl"))) == 1
+    assert len(segments(tmp_path)) == 2
+    reopened = open_store(tmp_path)
+    assert reopened.get("1")["status"] == "approved"
+    assert reopened.get("2")["title"] == "June Expenses"
+    assert reopened.journal.seq == 4
+    reopened.close()
+
+
+def test_audit_trail_lists_one_approvals_changes(tmp_path):
+    store = open_store(tmp_path, [expense(1), expense(2)])
+    store.transition("1", "approved", actor="U0003")
+    store.update("2", actor="U0001", title="June Expenses")
+    store.delete("1", actor="U0004")
+    store.close()
+    trail = audit_trail(str(tmp_path), "1")
+    assert [(event["op"], event["actor"]) for event in trail] == [("create", None), ("update", "U0003"), ("delete", "U0004")]
+    assert trail[1]["fields"]["status"] == "approved"
+
+
+def test_text_amounts_are_migrated_and_snapshotted(tmp_path):
+    legacy = {**expense(1), "amount": "USD 12.50", "total": "USD 20"}
+    del legacy["amount_minor"], legacy["total_minor"], legacy["currency"]
+    open_store(tmp_path, [legacy]).close()
+
+    migrated = open_store(tmp_path)
+    approval = migrated.get("1")
+    assert (approval["amount_minor"], approval["total_minor"], approval["currency"]) == (1250, 2000, "USD")
+    assert "amount" not in approval
+    migrated.close()
+    assert glob.glob(os.path.join(str(tmp_path), "snapshot-*.jsonl"))
@@ -0,0 +1,73 @@
+import pytest
+
+from money import AmountError, display_amount, format_amount, normalize_amounts, parse_amount
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,250.50", (125050, "AUD")),
+    ("AUD $1,250.50", (125050, "AUD")),
+    ("$1,250.5", (125050, "AUD")),
+    ("1250.5 usd", (125050, "USD")),
+    ("€20", (2000, "EUR")),
+    ("£0.99", (99, "GBP")),
+    ("JPY 1500", (1500, "JPY")),
+    ("KRW ₩15,000", (15000, "KRW")),
+    (".5", (50, "AUD")),
+    ("  12  ", (1200, "AUD"))
+])
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == expected
+
+
+def test_parse_amount_uses_the_given_default_currency():
+    assert parse_amount("10", default_currency="NZD") == (1000, "NZD")
+
+
+@pytest.mark.parametrize("text, message", [
+    ("", "Enter an amount"),
+    ("ten dollars", "Enter an amount"),
+    ("-5", "Enter an amount"),
+    ("AUD 5 USD", "Use one currency"),
+    ("€5 GBP", "Use one currency"),
+    ("XYZ 5", "isn't a supported currency"),
+    ("USD ₩5", "Use one currency"),
+    ("CHF $5", "could mean several"),
+    ("1.005", "at most 2 decimal places"),
+    ("JPY 1.5", "whole numbers"),
+    ("99999999999999999", "too large")
+])
+def test_parse_amount_rejects(text, message):
+    with pytest.raises(AmountError, match=message):
+        parse_amount(text)
+
+
+def test_format_amount():
+    assert format_amount(125050, "AUD") == "AUD $1,250.50"
+    assert format_amount(5, "EUR") == "EUR €0.05"
+    assert format_amount(1500000, "JPY") == "JPY ¥1,500,000"
+    assert format_amount(1000, "CHF") == "CHF 10.00"
+
+
+def test_formatted_amounts_parse_back():
+    for minor, currency in ((125050, "AUD"), (99, "GBP"), (1500, "JPY"), (100000000, "INR")):
+        assert parse_amount(format_amount(minor, currency)) == (minor, currency)
+
+
+def test_display_amount_falls_back_to_the_text_entered():
+    assert display_amount({"amount_minor": 2000, "currency": "USD"}) == "USD $20.00"
+    assert display_amount({"total_minor": 150, "currency": "AUD"}, "total") == "AUD $1.50"
+    assert display_amount({"amount": "about 20 bucks"}) == "about 20 bucks"
+    assert display_amount({}) == ""
+
+
+def test_normalize_amounts():
+    legacy = {"id": "1", "type": "expense", "amount": "$1,000", "total": "1,200.00"}
+    assert normalize_amounts(legacy) == {
+        "id": "1", "type": "expense", "amount_minor": 100000, "total_minor": 120000, "currency": "AUD"
+    }
+    assert normalize_amounts({"id": "2", "type": "expense", "amount": "USD 5"})["total_minor"] == 500
+    # Already migrated, not an expense, unreadable, or in two currencies
+    assert normalize_amounts({"id": "3", "type": "expense", "amount_minor": 1, "currency": "AUD"}) is None
+    assert normalize_amounts({"id": "4", "type": "time_off"}) is None
+    assert normalize_amounts({"id": "5", "type": "expense", "amount": "lots"}) is None
+    assert normalize_amounts({"id": "6", "type": "expense", "amount": "USD 5", "total": "EUR 5"}) is None
@@ -0,0 +1,112 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import outbound
+from outbound import OutboundQueue, is_retryable, retry_after
+
+
+# A failed Slack API call, as slack_sdk raises it
+class ApiError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+# A job that fails with each of `errors` in turn, then succeeds; records when it ran
+class Flaky:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(time.monotonic())
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+@pytest.fixture
+def outbound_queue():
+    queues = []
+
+    def make(**options):
+        queues.append(OutboundQueue(**{"workers": 2, "base_delay": 0.001, "max_delay": 0.01, **options}))
+        return queues[-1]
+
+    yield make
+    for outbound_queue in queues:
+        outbound_queue.stop()
+
+
+def test_retryable_errors():
+    assert is_retryable(ApiError(429))
+    assert is_retryable(ApiError(503))
+    assert is_retryable(ConnectionError())
+    assert not is_retryable(ApiError(404))
+    assert retry_after(ApiError(429, {"Retry-After": "3"})) == 3.0
+    assert retry_after(ApiError(429, {"retry-after": "soon"})) is None
+    assert retry_after(ConnectionError()) is None
+
+
+def test_failures_are_retried_until_the_job_succeeds(outbound_queue):
+    jobs = outbound_queue(max_attempts=5)
+    job = Flaky(ApiError(500), ConnectionError())
+    jobs.enqueue("publish_home", job)
+    assert jobs.drain(timeout=5)
+    assert len(job.calls) == 3
+    assert not jobs.dead_letters
+
+
+def test_retry_after_is_waited_out(outbound_queue):
+    jobs = outbound_queue()
+    job = Flaky(ApiError(429, {"Retry-After": "0.2"}))
+    jobs.enqueue("publish_home", job)
+    assert jobs.drain(timeout=5)
+    assert len(job.calls) == 2
+    assert job.calls[1] - job.calls[0] >= 0.2
+
+
+def test_backoff_is_jittered_exponential_and_capped(monkeypatch):
+    jobs = OutboundQueue(base_delay=0.5, max_delay=4.0)
+    monkeypatch.setattr(outbound.random, "uniform", lambda low, high: high)
+    assert [jobs.backoff(attempts, ApiError(500)) for attempts in range(1, 6)] == [0.5, 1.0, 2.0, 4.0, 4.0]
+    # Never sooner than Slack asked
+    assert jobs.backoff(1, ApiError(429, {"Retry-After": "10"})) == 10.0
+    monkeypatch.setattr(outbound.random, "uniform", lambda low, high: low)
+    assert jobs.backoff(3, ApiError(500)) == 0
+
+
+def test_jobs_out_of_attempts_are_dead_lettered(outbound_queue):
+    jobs = outbound_queue(max_attempts=3)
+    job = Flaky(*[ApiError(500)] * 5)
+    jobs.enqueue("dm_notification", job, channel="U0001")
+    assert jobs.drain(timeout=5)
+    assert len(job.calls) == 3
+    (dead,) = jobs.dead_letters
+    assert (dead["name"], dead["attempts"], dead["kwargs"]) == ("dm_notification", 3, {"channel": "U0001"})
+
+
+def test_errors_that_wont_go_away_are_not_retried(outbound_queue):
+    jobs = outbound_queue()
+    job = Flaky(ApiError(404))
+    jobs.enqueue("dm_notification", job)
+    assert jobs.drain(timeout=5)
+    assert len(job.calls) == 1
+    assert jobs.dead_letters[0]["error"] == "HTTP 404"
+
+
+def test_a_full_queue_dead_letters_enqueues_and_refuses_offers(outbound_queue):
+    jobs = outbound_queue(workers=1, max_size=1, enqueue_timeout=0.01)
+    release = threading.Event()
+    started = threading.Event()
+    jobs.enqueue("blocker", lambda: (started.set(), release.wait(5)))
+    assert started.wait(5)
+    assert jobs.enqueue("queued", lambda: None)
+    assert not jobs.offer("offered", lambda: None)
+    assert not jobs.dead_letters
+    assert not jobs.enqueue("dropped", lambda: None)
+    assert [dead["name"] for dead in jobs.dead_letters] == ["dropped"]
+    release.set()
+    assert jobs.drain(timeout=5)
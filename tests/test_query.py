@@ -0,0 +1,137 @@
+import pytest
+
+import sqlite_store
+import store as memory_store
+from conftest import expense, time_off
+from query import amount_bounds, encode_query, matcher, parse_query
+
+
+def test_bare_status_is_a_status_query():
+    assert parse_query("pending") == {"status": "pending"}
+    assert parse_query("all") == {}
+    assert parse_query("") == {}
+
+
+def test_parse_drops_unknown_filters_and_bad_values():
+    query = parse_query("status=approved&colour=red&date_from=2024-13-01&amount_min=abc&currency=XYZ&text=+taxi+")
+    assert query == {"status": "approved", "text": "taxi"}
+
+
+def test_amount_range_defaults_to_the_default_currency():
+    assert parse_query("amount_min=10")["currency"] == "AUD"
+    assert parse_query("currency=USD&amount_max=10")["currency"] == "USD"
+    assert "currency" not in parse_query("status=pending")
+
+
+def test_encode_round_trips():
+    for value in ("all", "pending", "status=pending&type=expense", "currency=JPY&amount_min=100&text=taxi+fare"):
+        assert encode_query(parse_query(value)) == value
+
+
+def test_amount_bounds_round_inwards_in_minor_units():
+    assert amount_bounds(parse_query("amount_min=10.005&amount_max=20.009")) == ("AUD", 1001, 2000)
+    assert amount_bounds(parse_query("currency=JPY&amount_min=1500")) == ("JPY", 1500, None)
+    assert amount_bounds(parse_query("status=pending")) is None
+
+
+def test_matcher_compares_amounts_within_one_currency():
+    matches = matcher(parse_query("currency=USD&amount_min=50&amount_max=100"))
+    assert matches(expense(1, amount_minor=7500, currency="USD"))
+    assert not matches(expense(2, amount_minor=7500, currency="AUD"))
+    assert not matches(expense(3, amount_minor=20000, currency="USD"))
+    assert not matches(time_off(4))
+
+
+# Expenses in three currencies with overlapping minor-unit amounts, and time off
+def mixed_approvals():
+    approvals = []
+    for i in range(1, 61):
+        if i % 5 == 0:
+            approvals.append(time_off(i, notes=f"Trip {i}", status="pending" if i % 2 else "approved"))
+            continue
+        approvals.append(expense(
+            i,
+            title=f"Taxi fare {i}" if i % 3 == 0 else f"Hotel {i}",
+            amount_minor=i * 1000,
+            currency=("AUD", "USD", "JPY")[i % 3],
+            date=f"2024-{i % 12 + 1:02d}-01",
+            status="pending" if i % 2 else "approved"
+        ))
+    return approvals
+
+
+# Every approval a query matches, following next cursors from the start.
+# With backwards, then following prev cursors back from the last page; the
+# page they end on is a full first page, which may repeat some of the next.
+def follow_pages(store, query, limit=10, backwards=False):
+    found, cursor = [], None
+    for _ in range(1000):
+        approvals, prev_cursor, cursor = store.query(query, cursor, "next", limit)
+        found += [approval["id"] for approval in approvals]
+        if cursor is None:
+            break
+    else:
+        raise AssertionError("query pages never ended")
+    if not backwards:
+        return found
+    found, cursor = [approval["id"] for approval in approvals], prev_cursor
+    for _ in range(1000):
+        if cursor is None:
+            return found
+        approvals, cursor, _ = store.query(query, cursor, "prev", limit)
+        page = [approval["id"] for approval in approvals]
+        found = page + [approval_id for approval_id in found if approval_id not in page]
+    raise AssertionError("query pages never ended")
+
+
+def expected_ids(approvals, query):
+    matches = matcher(query)
+    return [approval["id"] for approval in approvals if matches(approval)]
+
+
+QUERIES = [
+    "currency=USD&amount_min=10&amount_max=400",
+    "amount_min=100",
+    "currency=JPY&amount_max=30000",
+    "status=pending&currency=AUD&amount_min=50",
+    "type=time_off&status=pending",
+    "text=taxi&status=approved",
+    "date_from=2024-03-01&date_to=2024-06-30&type=expense"
+]
+
+
+@pytest.mark.parametrize("value", QUERIES)
+def test_queries_match_a_scan(make_store, value):
+    approvals = mixed_approvals()
+    store = make_store([dict(approval) for approval in approvals])
+    query = parse_query(value)
+    assert follow_pages(store, query) == expected_ids(approvals, query)
+
+
+def test_mixed_currency_range_only_returns_that_currency(make_store):
+    store = make_store([
+        expense(1, amount_minor=5000, currency="AUD"),
+        expense(2, amount_minor=5000, currency="USD"),
+        expense(3, amount_minor=5000, currency="JPY"),
+        expense(4, amount_minor=900000, currency="USD")
+    ])
+    assert follow_pages(store, parse_query("currency=USD&amount_min=10&amount_max=100")) == ["2"]
+    # JPY has no minor units: 5000 yen is in a 1000-10000 range
+    assert follow_pages(store, parse_query("currency=JPY&amount_min=1000&amount_max=10000")) == ["3"]
+    assert follow_pages(store, parse_query("amount_min=10")) == ["1"]
+
+
+# With no time to search, pages stop short, but paging either way still
+# finds every match once and in order
+@pytest.mark.parametrize("value", QUERIES)
+def test_short_pages_resume_where_they_stopped(make_store, monkeypatch, value):
+    monkeypatch.setattr(memory_store, "QUERY_TIME_LIMIT", 0)
+    monkeypatch.setattr(memory_store, "WALK_CHUNK", 4)
+    monkeypatch.setattr(sqlite_store, "QUERY_TIME_LIMIT", 0)
+    monkeypatch.setattr(sqlite_store, "PROGRESS_STEPS", 1)
+    monkeypatch.setattr(sqlite_store, "SCAN_WINDOW", 8)
+    approvals = mixed_approvals()
+    store = make_store([dict(approval) for approval in approvals])
+    query = parse_query(value)
+    assert follow_pages(store, query, limit=3) == expected_ids(approvals, query)
+    assert follow_pages(store, query, limit=3, backwards=True) == expected_ids(approvals, query)
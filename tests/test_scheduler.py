@@ -0,0 +1,101 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from scheduler import BACKGROUND, INTERACTIVE, SlackApiScheduler, SlackBusy, TokenBucket
+
+
+class ApiError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+# WebClient stand-in whose calls fail with each of `errors` in turn, then succeed
+class FakeClient:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def views_publish(self, **kwargs):
+        return self._call("views.publish")
+
+    def views_open(self, **kwargs):
+        return self._call("views.open")
+
+    def _call(self, method):
+        self.calls.append((method, time.monotonic()))
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"ok": True}
+
+
+def test_bucket_refills_at_its_rate_up_to_capacity():
+    bucket = TokenBucket(60, burst=2)
+    now = bucket.updated
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_time(now) == pytest.approx(1.0)
+    assert bucket.wait_time(now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(now + 1.0) == 0
+    assert bucket.wait_time(now + 1000) == 0
+    assert bucket.tokens == 2
+
+
+def test_parked_bucket_waits_out_the_park():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    bucket.parked_until = now + 5
+    assert bucket.wait_time(now + 1) == pytest.approx(4)
+    assert bucket.wait_time(now + 5) == 0
+
+
+def test_limits_are_shared_between_workers():
+    scheduler = SlackApiScheduler(limits={"views.publish": 120}, workers=4)
+    assert scheduler._bucket("views.publish").rate == pytest.approx(0.5)
+
+
+def test_interactive_calls_raise_slack_busy_instead_of_waiting():
+    scheduler = SlackApiScheduler(limits={"views.open": 4})
+    client = FakeClient()
+    assert scheduler.call(client, "views_open", INTERACTIVE) == {"ok": True}
+    started = time.monotonic()
+    with pytest.raises(SlackBusy):
+        scheduler.call(client, "views_open", INTERACTIVE)
+    assert time.monotonic() - started < 0.1
+    assert len(client.calls) == 1
+
+
+def test_rate_limited_calls_park_the_method_for_retry_after():
+    scheduler = SlackApiScheduler(limits={"views.publish": 6000})
+    client = FakeClient(ApiError(429, {"Retry-After": "0.2"}))
+    assert scheduler.call(client, "views_publish", BACKGROUND) == {"ok": True}
+    (_, first), (_, retried) = client.calls
+    assert retried - first >= 0.2
+
+
+def test_rate_limited_interactive_call_parks_the_method_and_raises():
+    scheduler = SlackApiScheduler(limits={"views.open": 6000})
+    with pytest.raises(SlackBusy):
+        scheduler.call(FakeClient(ApiError(429, {"Retry-After": "30"})), "views_open", INTERACTIVE)
+    # Parked for everyone until Retry-After has passed
+    assert scheduler._bucket("views.open").wait_time(time.monotonic()) > 29
+    with pytest.raises(SlackBusy):
+        scheduler.call(FakeClient(), "views_open", INTERACTIVE)
+
+
+def test_calls_give_up_after_their_rate_limit_retries():
+    scheduler = SlackApiScheduler(limits={"views.publish": 6000}, max_rate_limit_retries=2)
+    client = FakeClient(*[ApiError(429, {"Retry-After": "0.01"})] * 5)
+    with pytest.raises(ApiError):
+        scheduler.call(client, "views_publish", BACKGROUND)
+    assert len(client.calls) == 3
+
+
+def test_other_errors_are_not_retried():
+    scheduler = SlackApiScheduler()
+    client = FakeClient(ApiError(404))
+    with pytest.raises(ApiError):
+        scheduler.call(client, "views_publish")
+    assert len(client.calls) == 1
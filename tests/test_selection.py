@@ -0,0 +1,54 @@
+import handlers
+from conftest import expense
+from selection import Selections
+from store import ApprovalStore
+
+
+def test_selection_stops_at_the_limit():
+    changes = []
+    selections = Selections(limit=2, on_change=lambda user_id, selected: changes.append(selected))
+    assert selections.set("U1", "1")
+    assert selections.set("U1", "2")
+    assert not selections.set("U1", "3")
+    assert selections.get("U1") == {"1", "2"}
+    # Unticking makes room again, and other users have their own limit
+    assert selections.set("U1", "2", False)
+    assert selections.set("U1", "3")
+    assert selections.set("U2", "1")
+    assert changes == [{"1"}, {"1", "2"}, {"1"}, {"1", "3"}, {"1"}]
+
+
+def test_select_all_fills_up_to_the_limit():
+    selections = Selections(limit=3)
+    selections.set("U1", "1")
+    assert selections.select_all("U1", ["1", "2"])
+    assert not selections.select_all("U1", ["3", "4", "5"])
+    assert selections.get("U1") == {"1", "2", "3"}
+
+
+def test_take_hands_a_selection_over_once():
+    selections = Selections()
+    selections.select_all("U1", ["1", "2"])
+    assert selections.take("U1") == {"1", "2"}
+    assert selections.take("U1") == set()
+    assert selections.get("U1") == frozenset()
+
+
+def test_bulk_decisions_skip_approvals_that_are_no_longer_pending(monkeypatch):
+    store = ApprovalStore([expense(1), expense(2), expense(3), expense(4, employee="U0005")])
+    store.transition("2", "rejected", actor="U0003")
+    store.delete("3")
+    fanned_out, queued = [], []
+    monkeypatch.setattr(handlers, "store", store)
+    monkeypatch.setattr(handlers, "fan_out_home_refresh", lambda approvals, actor_id: fanned_out.extend(approvals))
+    monkeypatch.setattr(handlers.outbound_queue, "enqueue", lambda name, func, *args: queued.append(args[1]))
+
+    handlers.apply_bulk_decision({"1", "2", "3", "4"}, "approved", "U0009")
+
+    assert store.get("1")["status"] == "approved"
+    assert store.get("4")["status"] == "approved"
+    # Rejected by someone else first, and left that way
+    assert (store.get("2")["status"], store.get("2")["version"]) == ("rejected", 2)
+    assert sorted(approval["id"] for approval in fanned_out) == ["1", "4"]
+    # One DM per employee
+    assert sorted(len(approvals) for approvals in queued) == [1, 1]
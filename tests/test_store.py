@@ -0,0 +1,120 @@
+import pytest
+
+from conftest import expense, time_off
+from store import VersionConflict
+
+
+def test_create_starts_at_version_one(make_store):
+    store = make_store([expense(1)])
+    assert store.get("1")["version"] == 1
+    assert "1" in store and "2" not in store
+    assert len(store) == 1
+
+
+def test_create_rejects_a_duplicate_id(make_store):
+    store = make_store([expense(1)])
+    with pytest.raises(ValueError):
+        store.create(expense(1))
+
+
+def test_transition_bumps_the_version(make_store):
+    store = make_store([expense(1)])
+    approved = store.transition("1", "approved", actor="U0003", expected_version=1)
+    assert approved["status"] == "approved"
+    assert approved["version"] == 2
+    assert approved["timestamp"]
+    assert store.get("1")["status"] == "approved"
+
+
+def test_stale_approve_raises_version_conflict(make_store):
+    store = make_store([expense(1)])
+    store.transition("1", "rejected", actor="U0003", expected_version=1, comments="Over budget")
+    with pytest.raises(VersionConflict) as conflict:
+        store.transition("1", "approved", actor="U0004", expected_version=1)
+    assert conflict.value.expected_version == 1
+    assert conflict.value.approval["status"] == "rejected"
+    assert conflict.value.approval["version"] == 2
+    # The first decision stands
+    assert store.get("1")["status"] == "rejected"
+    assert store.get("1")["version"] == 2
+
+
+def test_update_without_expected_version_always_applies(make_store):
+    store = make_store([expense(1)])
+    store.update("1", title="June Expenses")
+    assert store.update("1", title="July Expenses")["version"] == 3
+
+
+def test_noop_revert_keeps_the_version(make_store):
+    store = make_store([expense(1)])
+    before = store.get("1")
+    reverted = store.update("1", actor="U0003", expected_version=1, status="pending")
+    assert reverted["version"] == 1
+    assert reverted == before
+    assert store.get("1")["version"] == 1
+
+
+def test_update_of_a_missing_approval_returns_none(make_store):
+    store = make_store()
+    assert store.update("1", status="approved") is None
+    assert store.delete("1") is None
+
+
+def test_stale_delete_raises_version_conflict(make_store):
+    store = make_store([expense(1)])
+    store.update("1", title="June Expenses")
+    with pytest.raises(VersionConflict):
+        store.delete("1", expected_version=1)
+    assert "1" in store
+    assert store.delete("1", expected_version=2)["title"] == "June Expenses"
+    assert "1" not in store
+    assert store.filter("all") == []
+
+
+def test_filters_follow_status_changes(make_store):
+    store = make_store([expense(1), expense(2, employee="U0005"), time_off(3)])
+    store.transition("2", "approved")
+    assert [a["id"] for a in store.filter("pending")] == ["1", "3"]
+    assert [a["id"] for a in store.filter("approved")] == ["2"]
+    assert [a["id"] for a in store.by_employee("U0005")] == ["2"]
+    assert [a["id"] for a in store.by_requestor("U0001")] == ["1", "2", "3"]
+    assert store.count_by_status() == {"pending": 2, "approved": 1}
+
+
+def test_queue_stats_total_pending_amounts_per_currency(make_store):
+    store = make_store([
+        expense(1, amount_minor=10000),
+        expense(2, amount_minor=2550),
+        expense(3, amount_minor=500, currency="USD"),
+        time_off(4)
+    ])
+    stats = store.queue_stats()
+    assert stats["pending"] == 4
+    assert stats["oldest"]["id"] == "1"
+    assert stats["amounts"] == {"AUD": 12550, "USD": 500}
+    assert stats["types"]["expense"] == {"pending": 3, "amounts": {"AUD": 12550, "USD": 500}}
+    assert stats["types"]["time_off"] == {"pending": 1, "amounts": {}}
+
+    store.transition("1", "approved")
+    store.update("3", amount_minor=700)
+    store.delete("4")
+    stats = store.queue_stats()
+    assert stats["pending"] == 2
+    assert stats["oldest"]["id"] == "2"
+    assert stats["amounts"] == {"AUD": 2550, "USD": 700}
+    assert "time_off" not in stats["types"]
+
+
+def test_pages_walk_every_approval_in_id_order(make_store):
+    store = make_store([expense(i) for i in range(1, 26)])
+    approvals, prev_cursor, next_cursor = store.page("all", limit=10)
+    assert [a["id"] for a in approvals] == [str(i) for i in range(1, 11)]
+    assert prev_cursor is None
+    approvals, prev_cursor, next_cursor = store.page("all", next_cursor, "next", limit=10)
+    assert [a["id"] for a in approvals] == [str(i) for i in range(11, 21)]
+    approvals, _, last_cursor = store.page("all", next_cursor, "next", limit=10)
+    assert [a["id"] for a in approvals] == [str(i) for i in range(21, 26)]
+    assert last_cursor is None
+    approvals, first_prev, _ = store.page("all", prev_cursor, "prev", limit=10)
+    assert [a["id"] for a in approvals] == [str(i) for i in range(1, 11)]
+    assert first_prev is None
@@ -0,0 +1,1493 @@
+import time
+from datetime import datetime, timezone
+from functools import partial
+from zoneinfo import ZoneInfo
+import metrics
+from config import DEFAULT_CURRENCY
+from money import CURRENCIES, display_amount, format_amount
+from query import encode_query, parse_query, report_date
+from render_cache import FragmentCache
+from store import PAGE_SIZE, TIMESTAMP_FORMAT
+from templates import Slot, ViewTemplate
+
+# Rendered App Home blocks per approval version, reused across renders
+fragment_cache = FragmentCache()
+
+# Home tab sizes, up to Slack's 100 block limit
+BLOCK_COUNT_BUCKETS = (10, 20, 30, 40, 50, 60, 70, 80, 90, 100)
+
+# A decision time as a Slack date token, which every reader sees in their own
+# time zone. The fallback text, for clients that can't render the token, is
+# in `tz` when given. `token` is how Slack shows it, "{ago}" for "3 hours ago".
+def slack_date(timestamp, tz=None, token="{date_short_pretty} at {time}"):
+    try:
+        moment = datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return timestamp
+    fallback = timestamp
+    if tz:
+        try:
+            fallback = moment.astimezone(ZoneInfo(tz)).strftime("%Y-%m-%d %H:%M %Z")
+        except (KeyError, ValueError):
+            pass
+    return f"<!date^{int(moment.timestamp())}^{token}|{fallback}>"
+
+# Button value naming an approval and the version the user saw, so acting on
+# it fails if someone else changed it first
+def versioned_value(approval):
+    return f"{approval['id']}:{approval.get('version', 1)}"
+
+# (approval ID, version) from a versioned_value; buttons rendered before
+# values carried a version give the ID and None
+def parse_versioned_value(value):
+    approval_id, _, version = value.partition(":")
+    return approval_id, int(version) if version else None
+
+# A user in a heading: their name when the user directory knows it, otherwise a mention
+def user_label(user_id, names=None):
+    name = (names or {}).get(user_id)
+    return f"*{name}*" if name else f"<@{user_id}>"
+
+# Blocks for a single approval on the App Home. Pending approvals get a
+# checkbox for bulk actions, ticked when the viewer has selected them.
+# `names` maps user IDs to display names for the heading.
+def approval_blocks(approval, selected=False, names=None):
+    blocks = []
+    requestor_name = f"<@{approval['requestor']}>"
+    employee_name = f"<@{approval['employee']}>"
+
+    if approval["type"] == "expense":
+        section_block = {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"{user_label(approval['requestor'], names)} requests your approval for an Expense:"
+            }
+        }
+    elif approval["type"] == "time_off":
+        section_block = {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"{user_label(approval['employee'], names)} requests your approval for Time Off:"
+            }
+        }
+    if approval["status"] == "pending":
+        select_option = {
+            "text": {
+                "type": "plain_text",
+                "text": "Select"
+            },
+            "value": approval["id"]
+        }
+        section_block["block_id"] = f"select_{approval['id']}"
+        section_block["accessory"] = {
+            "type": "checkboxes",
+            "action_id": "select_approval",
+            "options": [select_option]
+        }
+        if selected:
+            section_block["accessory"]["initial_options"] = [select_option]
+    blocks.append(section_block)
+
+    if approval["type"] == "expense":
+        section_block = {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"*Expense | {approval['title']}*\n\n*Requestor:* {requestor_name}\n*Requested Amount:* {display_amount(approval, 'amount')}\n*Report Total:* {display_amount(approval, 'total')}\n*Report Date:* {approval['date']}\n*Employee Name:* {employee_name}"
+            }
+        }
+        if approval.get("image_url"):
+            section_block["accessory"] = {
+                "type": "image",
+                "image_url": approval["image_url"],
+                "alt_text": "Approval Image"
+            }
+        blocks.append(section_block)
+        if approval.get("file_url"):
+            file_display_name = approval["custom_file_name"] or approval["file_url"].split('/')[-1]
+            blocks.append(
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": f"*Attachments:* <{approval['file_url']}|{file_display_name}>"
+                    }
+                }
+            )
+    elif approval["type"] == "time_off":
+        section_block = {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"*Time Off Request*\n\n*Employee Name:* {employee_name}\n*Requested On:* {approval['request_date']}\n*Request Type:* {approval['request_type']}\n*Time Requested:* {approval['time_requested']}\n*Summary:* {approval['summary']} days\n*Notes:* {approval['notes']}"
+            }
+        }
+        if approval.get("image_url"):
+            section_block["accessory"] = {
+                "type": "image",
+                "image_url": approval["image_url"],
+                "alt_text": "Approval Image"
+            }
+        blocks.append(section_block)
+
+    if approval["status"] == "pending":
+        blocks.append(
+            {
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "button",
+                        "style": "primary",
+                        "text": {
+                            "type": "plain_text",
+                            "text": "Approve",
+                            "emoji": True
+                        },
+                        "value": versioned_value(approval),
+                        "action_id": "approve"
+                    },
+                    {
+                        "type": "button",
+                        "style": "danger",
+                        "text": {
+                            "type": "plain_text",
+                            "text": "Reject",
+                            "emoji": True
+                        },
+                        "value": versioned_value(approval),
+                        "action_id": "reject"
+                    },
+                    {
+                        "type": "button",
+                        "text": {
+                            "type": "plain_text",
+                            "text": "View Details",
+                            "emoji": True
+                        },
+                        "value": approval['id'],
+                        "action_id": "view_details"
+                    },
+                    {
+                        "type": "overflow",
+                        "action_id": "overflow",
+                        "options": [
+                            {
+                                "text": {
+                                    "type": "plain_text",
+                                    "text": "Revert to Pending"
+                                },
+                                "value": f"revert-{versioned_value(approval)}"
+                            },
+                            {
+                                "text": {
+                                    "type": "plain_text",
+                                    "text": "Edit"
+                                },
+                                "value": f"edit-{approval['id']}"
+                            },
+                            {
+                                "text": {
+                                    "type": "plain_text",
+                                    "text": "Delete"
+                                },
+                                "value": f"delete-{versioned_value(approval)}"
+                            }
+                        ]
+                    }
+                ]
+            }
+        )
+    else:
+        status_text = approval["status"].capitalize()
+        if approval["status"] == "approved":
+            status_text = "Approved ✅"
+        elif approval["status"] == "rejected":
+            status_text = "Rejected ❌"
+
+        blocks.append(
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*Status:* {status_text} on {slack_date(approval['timestamp'])}"
+                }
+            }
+        )
+        if approval["status"] == "rejected" and approval.get("comments"):
+            blocks.append(
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": f"*Comments:* {approval['comments']}"
+                    }
+                }
+            )
+        blocks.append(
+            {
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "overflow",
+                        "action_id": "overflow",
+                        "options": [
+                            {
+                                "text": {
+                                    "type": "plain_text",
+                                    "text": "Revert to Pending"
+                                },
+                                "value": f"revert-{versioned_value(approval)}"
+                            },
+                            {
+                                "text": {
+                                    "type": "plain_text",
+                                    "text": "Edit"
+                                },
+                                "value": f"edit-{approval['id']}"
+                            },
+                            {
+                                "text": {
+                                    "type": "plain_text",
+                                    "text": "Delete"
+                                },
+                                "value": f"delete-{versioned_value(approval)}"
+                            }
+                        ]
+                    }
+                ]
+            }
+        )
+    blocks.append(
+        {
+            "type": "divider"
+        }
+    )
+    return blocks
+
+# Cached blocks for an approval, as seen by a viewer who has it selected or
+# not. `people` looks up a user ID's directory profile (or None); the names
+# it returns are part of the cache key.
+def approval_fragment(approval, selected=False, people=None):
+    selected = selected and approval["status"] == "pending"
+    names = {}
+    if people is not None:
+        for user_id in (approval["requestor"], approval["employee"]):
+            profile = people(user_id)
+            if profile is not None:
+                names[user_id] = profile["name"]
+    context = (selected, tuple(sorted(names.items())))
+    return fragment_cache.get_or_render(approval, context, partial(approval_blocks, selected=selected, names=names))
+
+
+# Render an approval's App Home blocks once, so concurrent renders of it all hit the cache
+def warm_fragment(approval, people=None):
+    approval_fragment(approval, people=people)
+
+# Home Tab view
+def home_tab_view(client, store, home_filter, cursor=None, direction="next", selected=(), people=None, notice=None):
+    return home_tab_page(client, store, home_filter, cursor, direction, selected, people, notice)[0]
+
+# Status and type choices in the App Home filters, (label, value)
+STATUS_FILTER_OPTIONS = (
+    ("All approvals", "all"),
+    ("Approved", "approved"),
+    ("Pending", "pending"),
+    ("Rejected", "rejected"),
+    ("Recalled", "recalled")
+)
+TYPE_FILTER_OPTIONS = (("All types", "all"), ("Expense", "expense"), ("Time off", "time_off"))
+CURRENCY_FILTER_OPTIONS = (("All currencies", "all"), *((currency, currency) for currency in sorted(CURRENCIES)))
+
+# App Home filter control -> the query filter it sets
+FILTER_ACTIONS = {
+    "filter_approvals": "status",
+    "filter_type": "type",
+    "filter_employee": "employee",
+    "filter_requestor": "requestor",
+    "filter_date_from": "date_from",
+    "filter_date_to": "date_to",
+    "filter_currency": "currency",
+    "filter_amount_min": "amount_min",
+    "filter_amount_max": "amount_max",
+    "filter_text": "text"
+}
+
+def filter_option(label, value):
+    return {
+        "text": {
+            "type": "plain_text",
+            "text": label
+        },
+        "value": value
+    }
+
+# A static select over `options`, showing the query's current value
+def filter_select(action_id, options, current, placeholder):
+    element = {
+        "type": "static_select",
+        "action_id": action_id,
+        "placeholder": {
+            "type": "plain_text",
+            "text": placeholder
+        },
+        "options": [filter_option(label, value) for label, value in options]
+    }
+    for label, value in options:
+        if value == current:
+            element["initial_option"] = filter_option(label, value)
+    return element
+
+# A text or number input that applies its filter when the user presses enter
+def filter_input(action_id, label, current, element_type="plain_text_input", **element):
+    element = {"type": element_type, "action_id": action_id, **element}
+    if current:
+        element["initial_value"] = current
+    return {
+        "type": "input",
+        "block_id": f"{action_id}_input",
+        "dispatch_action": True,
+        "optional": True,
+        "label": {
+            "type": "plain_text",
+            "text": label
+        },
+        "element": element
+    }
+
+# App Home header: the filters, each showing the query's value for it, and
+# the overflow menu for new approvals
+def filter_blocks(query):
+    currency = query.get("currency") or DEFAULT_CURRENCY
+    elements = []
+    for action_id, element_type, initial, placeholder in (
+        ("filter_employee", "users_select", "initial_user", "Employee"),
+        ("filter_requestor", "users_select", "initial_user", "Requestor"),
+        ("filter_date_from", "datepicker", "initial_date", "Report date from"),
+        ("filter_date_to", "datepicker", "initial_date", "Report date to")
+    ):
+        element = {
+            "type": element_type,
+            "action_id": action_id,
+            "placeholder": {
+                "type": "plain_text",
+                "text": placeholder
+            }
+        }
+        if query.get(FILTER_ACTIONS[action_id]):
+            element[initial] = query[FILTER_ACTIONS[action_id]]
+        elements.append(element)
+    elements.append(filter_select("filter_currency", CURRENCY_FILTER_OPTIONS, query.get("currency", "all"), "Currency"))
+    if set(query) - {"status"}:
+        elements.append(
+            {
+                "type": "button",
+                "text": {
+                    "type": "plain_text",
+                    "text": "Clear Filters",
+                    "emoji": True
+                },
+                "action_id": "filter_clear"
+            }
+        )
+    return [
+        {
+            "type": "actions",
+            "block_id": "filter_section",
+            "elements": [
+                filter_select("filter_approvals", STATUS_FILTER_OPTIONS, query.get("status", "all"), "All Approvals"),
+                filter_select("filter_type", TYPE_FILTER_OPTIONS, query.get("type", "all"), "All types"),
+                {
+                    "type": "overflow",
+                    "action_id": "actions_overflow",
+                    "options": [
+                        {
+                            "text": {
+                                "type": "plain_text",
+                                "text": "New Approval"
+                            },
+                            "value": "new_approval"
+                        }
+                    ]
+                }
+            ]
+        },
+        {
+            "type": "actions",
+            "block_id": "filter_details",
+            "elements": elements
+        },
+        filter_input("filter_text", "Search titles, notes and request types", query.get("text"), max_length=200),
+        # Amount ranges are in one currency, the default until one is picked
+        filter_input("filter_amount_min", f"Minimum amount ({currency})", query.get("amount_min"), "number_input", is_decimal_allowed=True),
+        filter_input("filter_amount_max", f"Maximum amount ({currency})", query.get("amount_max"), "number_input", is_decimal_allowed=True)
+    ]
+
+TYPE_LABELS = {value: label for label, value in TYPE_FILTER_OPTIONS if value != "all"}
+
+# "AUD $1,000.00 + USD $20.00"
+def amount_totals(amounts):
+    return " + ".join(format_amount(minor, currency) for currency, minor in sorted(amounts.items()))
+
+# App Home summary of the approval queue from store.queue_stats(): how many
+# approvals are pending, their total by currency, the oldest and a line per
+# type. Ages are Slack date tokens, so the view doesn't change as time passes.
+def queue_summary_blocks(stats):
+    if not stats["pending"]:
+        return [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": "*Nothing is awaiting approval.*"
+                }
+            }
+        ]
+    text = f"*{stats['pending']:,} pending*"
+    if stats["amounts"]:
+        text += f" totalling {amount_totals(stats['amounts'])}"
+    oldest = stats["oldest"]
+    if oldest is not None:
+        since = slack_date(oldest["submitted"], token="{ago}") if oldest.get("submitted") else report_date(oldest)
+        text += f"\n*Oldest:* {oldest.get('title', '')}" + (f", submitted {since}" if since else "")
+    elements = []
+    for approval_type, by_type in sorted(stats["types"].items()):
+        label = TYPE_LABELS.get(approval_type, approval_type.replace("_", " ").capitalize())
+        line = f"*{label}:* {by_type['pending']:,} pending"
+        if by_type["amounts"]:
+            line += f", {amount_totals(by_type['amounts'])}"
+        elements.append({"type": "mrkdwn", "text": line})
+    return [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": text
+            }
+        },
+        {
+            "type": "context",
+            # Context blocks take at most 10 elements
+            "elements": elements[:10]
+        }
+    ]
+
+# The encoded query after a user changes one App Home filter control, from
+# the encoded query their App Home was showing
+def apply_filter_action(home_filter, action):
+    if action["action_id"] == "filter_clear":
+        return encode_query({key: value for key, value in parse_query(home_filter).items() if key == "status"})
+    value = (
+        (action.get("selected_option") or {}).get("value")
+        or action.get("selected_user")
+        or action.get("selected_date")
+        or action.get("value")
+    )
+    query = parse_query(home_filter)
+    query[FILTER_ACTIONS[action["action_id"]]] = value
+    # Round-tripped through parse_query, which drops values that don't make sense
+    return encode_query(parse_query(encode_query(query)))
+
+# Home Tab view, plus the IDs of the approvals on the rendered page.
+# `home_filter` is an encoded query (see query.py), a bare status or "all";
+# it rides along in private_metadata for the actions taken on the page.
+# `notice` is shown above everything else, e.g. that a modal couldn't be opened.
+def home_tab_page(client, store, home_filter, cursor=None, direction="next", selected=(), people=None, notice=None):
+    started = time.perf_counter()
+    query = parse_query(home_filter)
+    blocks = []
+    if notice:
+        blocks.append(
+            {
+                "type": "context",
+                "elements": [
+                    {
+                        "type": "mrkdwn",
+                        "text": f":warning: {notice}"
+                    }
+                ]
+            }
+        )
+    # Read from totals the store keeps as approvals change, not counted here
+    blocks.extend(queue_summary_blocks(store.queue_stats()))
+    blocks.extend(filter_blocks(query))
+    blocks.append(
+        {
+            "type": "divider"
+        }
+    )
+
+    # Only the visible page is pulled from the store and rendered
+    page_approvals, prev_cursor, next_cursor = store.query(query, cursor, direction)
+
+    if selected or any(approval["status"] == "pending" for approval in page_approvals):
+        # Between the filters and the divider
+        blocks[-1:-1] = bulk_actions_blocks(len(selected))
+
+    filter_status = query.get("status", "all")
+    # The store stopped looking before it filled the page (see store.query)
+    searched_part = next_cursor is not None and len(page_approvals) < PAGE_SIZE
+    if not page_approvals:
+        no_approvals_message = "*You have no approval requests right now.*"
+        if searched_part:
+            no_approvals_message = "*No approval requests match these filters yet.* Select *Next* to keep searching."
+        elif set(query) - {"status"}:
+            no_approvals_message = "*No approval requests match these filters.*"
+        elif filter_status == "approved":
+            no_approvals_message = "*You have no _approved_ approval requests right now.*"
+        elif filter_status == "pending":
+            no_approvals_message = "*You have no _pending_ approval requests right now.*"
+        elif filter_status == "rejected":
+            no_approvals_message = "*You have no _rejected_ approval requests right now.*"
+        elif filter_status == "recalled":
+            no_approvals_message = "*You have no _recalled_ approval requests right now.*"
+
+        blocks.append(
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": no_approvals_message
+                }
+            }
+        )
+    else:
+        for approval in page_approvals:
+            blocks.extend(approval_fragment(approval, approval["id"] in selected, people))
+        if searched_part:
+            blocks.append(
+                {
+                    "type": "context",
+                    "elements": [
+                        {
+                            "type": "mrkdwn",
+                            "text": "Only some approvals were searched for this page. Select *Next* to keep searching."
+                        }
+                    ]
+                }
+            )
+
+    pagination_elements = []
+    if prev_cursor:
+        pagination_elements.append(
+            {
+                "type": "button",
+                "text": {
+                    "type": "plain_text",
+                    "text": "Previous",
+                    "emoji": True
+                },
+                "value": f"{home_filter}|{prev_cursor}",
+                "action_id": "home_prev_page"
+            }
+        )
+    if next_cursor:
+        pagination_elements.append(
+            {
+                "type": "button",
+                "text": {
+                    "type": "plain_text",
+                    "text": "Next",
+                    "emoji": True
+                },
+                "value": f"{home_filter}|{next_cursor}",
+                "action_id": "home_next_page"
+            }
+        )
+    if pagination_elements:
+        blocks.append(
+            {
+                "type": "actions",
+                "block_id": "pagination",
+                "elements": pagination_elements
+            }
+        )
+    metrics.observe("home_tab_render_seconds", time.perf_counter() - started)
+    metrics.observe("home_tab_blocks", len(blocks), buckets=BLOCK_COUNT_BUCKETS)
+    return {"type": "home", "private_metadata": home_filter, "blocks": blocks}, [approval["id"] for approval in page_approvals]
+
+# App Home header actions for the approvals a user has ticked
+def bulk_actions_blocks(selected_count):
+    elements = [
+        {
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": "Select All Pending",
+                "emoji": True
+            },
+            "action_id": "bulk_select_all"
+        }
+    ]
+    if selected_count:
+        elements = [
+            {
+                "type": "button",
+                "style": "primary",
+                "text": {
+                    "type": "plain_text",
+                    "text": "Approve Selected",
+                    "emoji": True
+                },
+                "action_id": "bulk_approve"
+            },
+            {
+                "type": "button",
+                "style": "danger",
+                "text": {
+                    "type": "plain_text",
+                    "text": "Reject Selected",
+                    "emoji": True
+                },
+                "action_id": "bulk_reject"
+            },
+            {
+                "type": "button",
+                "text": {
+                    "type": "plain_text",
+                    "text": "Clear Selection",
+                    "emoji": True
+                },
+                "action_id": "bulk_clear"
+            }
+        ] + elements
+    return [
+        {
+            "type": "context",
+            "elements": [
+                {
+                    "type": "mrkdwn",
+                    "text": f"*{selected_count}* selected" if selected_count else "Tick pending approvals to approve or reject them together."
+                }
+            ]
+        },
+        {
+            "type": "actions",
+            "block_id": "bulk_actions",
+            "elements": elements
+        }
+    ]
+
+# Blocks and fallback text for the DM sent when an approval is decided.
+# `tz` is the employee's time zone, for the decision time's fallback text.
+def dm_notification_message(approval, status, tz=None):
+    status_text = "Approved ✅" if status == "approved" else "Rejected ❌"
+    requestor_name = f"<@{approval['requestor']}>"
+    employee_name = f"<@{approval['employee']}>"
+
+    if approval["type"] == "time_off":
+        message_blocks = [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*Time Off Request*\n\n*Employee Name:* {employee_name}\n*Requested On:* {approval['request_date']}\n*Request Type:* {approval['request_type']}\n*Time Requested:* {approval['time_requested']}\n*Summary:* {approval['summary']} days\n*Notes:* {approval['notes']}"
+                }
+            },
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*Status:* {status_text} on {slack_date(approval['timestamp'], tz)}"
+                }
+            }
+        ]
+    else:
+        message_blocks = [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*{approval['type'].capitalize()} | {approval['title']}*\n\n*Requestor:* {requestor_name}\n*Requested Amount:* {display_amount(approval, 'amount')}\n*Report Total:* {display_amount(approval, 'total')}\n*Report Date:* {approval.get('date', '')}\n*Employee Name:* {employee_name}"
+                }
+            },
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*Status:* {status_text} on {slack_date(approval['timestamp'], tz)}"
+                }
+            }
+        ]
+
+        if approval.get("file_url"):
+            file_display_name = approval["custom_file_name"] or approval["file_url"].split('/')[-1]
+            message_blocks.insert(1, 
+                {
+                    "type": "section",
+                    "text": {
+                        "type": "mrkdwn",
+                        "text": f"*Attachments:* <{approval['file_url']}|{file_display_name}>"
+                    }
+                }
+            )
+
+    if approval.get("image_url"):
+        message_blocks[0]["accessory"] = {
+            "type": "image",
+            "image_url": approval["image_url"],
+            "alt_text": "Approval Image"
+        }
+
+    if status == "rejected" and approval.get("comments"):
+        message_blocks.append(
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*Comments:* {approval['comments']}"
+                }
+            }
+        )
+
+    return message_blocks, f"Your {approval['type']} request has been {status_text.lower()}."
+
+# One DM covering several of an employee's approvals decided together, one
+# line per approval. Lines are packed into sections under Slack's 3000
+# character section limit, and past the 50 block limit the rest are counted.
+def bulk_dm_notification_message(approvals, status, tz=None, max_blocks=50, max_section_chars=3000):
+    if len(approvals) == 1:
+        return dm_notification_message(approvals[0], status, tz)
+    status_text = "Approved ✅" if status == "approved" else "Rejected ❌"
+    message_blocks = [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"*{len(approvals)} of your requests have been {status_text.lower()}* on {slack_date(approvals[0]['timestamp'], tz)}"
+            }
+        }
+    ]
+    if status == "rejected" and approvals[0].get("comments"):
+        message_blocks.append(
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*Comments:* {approvals[0]['comments']}"
+                }
+            }
+        )
+
+    lines = []
+    for approval in approvals:
+        if approval["type"] == "time_off":
+            lines.append(f"• *Time Off* | {approval.get('time_requested', '')}")
+        else:
+            lines.append(f"• *{approval['type'].capitalize()} | {approval['title']}* ({display_amount(approval, 'amount')})")
+
+    chunk = []
+    chunk_chars = 0
+    for i, line in enumerate(lines):
+        if chunk and chunk_chars + len(line) + 1 > max_section_chars:
+            if len(message_blocks) == max_blocks - 2:
+                break
+            message_blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": "\n".join(chunk)}})
+            chunk, chunk_chars = [], 0
+        chunk.append(line)
+        chunk_chars += len(line) + 1
+    else:
+        i = len(lines)
+    message_blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": "\n".join(chunk)}})
+    if i < len(lines):
+        message_blocks.append({"type": "context", "elements": [{"type": "mrkdwn", "text": f"…and {len(lines) - i} more"}]})
+
+    return message_blocks, f"{len(approvals)} of your requests have been {status_text.lower()}."
+
+# Details modal for an approval
+def approval_details_modal(approval):
+    detail_blocks = [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": f"*{approval['type'].capitalize()} | {approval['title']}*\n\n*Requestor:* <@{approval['requestor']}>\n*Requested Amount:* {display_amount(approval, 'amount')}\n*Report Total:* {display_amount(approval, 'total')}\n*Report Date:* {approval.get('date', '')}\n*Employee Name:* <@{approval['employee']}>"
+            }
+        }
+    ]
+    
+    if approval["type"] == "expense" and approval.get("file_url"):
+        file_display_name = approval["custom_file_name"] or approval["file_url"].split('/')[-1]
+        detail_blocks.append(
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*Attachments:* <{approval['file_url']}|{file_display_name}>"
+                }
+            }
+        )
+
+    if approval["type"] == "time_off":
+        detail_blocks = [
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*Time Off Request*\n\n*Employee Name:* <@{approval['employee']}>\n*Requested On:* {approval['request_date']}\n*Request Type:* {approval['request_type']}\n*Time Requested:* {approval['time_requested']}\n*Summary:* {approval['summary']} days\n*Notes:* {approval['notes']}"
+                }
+            }
+        ]
+
+    if approval.get("image_url"):
+        detail_blocks[0]["accessory"] = {
+            "type": "image",
+            "image_url": approval["image_url"],
+            "alt_text": "Approval Image"
+        }
+
+    return {
+        "type": "modal",
+        "callback_id": f"view_details_modal-{approval['id']}",
+        "title": {
+            "type": "plain_text",
+            "text": "Details"
+        },
+        "blocks": detail_blocks
+    }
+
+# Modal asking for rejection comments
+reject_modal_template = ViewTemplate({
+    "type": "modal",
+    "callback_id": Slot("callback_id"),
+    "private_metadata": Slot("private_metadata"),
+    "title": {
+        "type": "plain_text",
+        "text": "Add Comments"
+    },
+    "blocks": [
+        {
+            "type": "input",
+            "block_id": "comments_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "comments",
+                "multiline": True
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Comments"
+            }
+        }
+    ],
+    "submit": {
+        "type": "plain_text",
+        "text": "Submit"
+    }
+})
+
+# The version being rejected rides along in private_metadata
+def reject_modal(approval_id, version=None):
+    return reject_modal_template.render(
+        callback_id=f"reject_modal-{approval_id}",
+        private_metadata="" if version is None else str(version)
+    )
+
+# Modal asking for the comments to reject every selected approval with
+bulk_reject_modal_template = ViewTemplate({
+    "type": "modal",
+    "callback_id": "bulk_reject_modal",
+    "title": {
+        "type": "plain_text",
+        "text": "Reject Selected"
+    },
+    "blocks": [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": Slot("summary")
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "comments_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "comments",
+                "multiline": True
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Comments"
+            }
+        }
+    ],
+    "submit": {
+        "type": "plain_text",
+        "text": "Reject"
+    }
+})
+
+def bulk_reject_modal(selected_count):
+    return bulk_reject_modal_template.render(summary=f"Reject *{selected_count}* selected approval{'s' if selected_count != 1 else ''}?")
+
+# Edit modals, one per approval type
+edit_expense_modal_template = ViewTemplate({
+    "type": "modal",
+    "callback_id": Slot("callback_id"),
+    "private_metadata": Slot("private_metadata"),
+    "title": {
+        "type": "plain_text",
+        "text": "Edit Approval"
+    },
+    "blocks": [
+        {
+            "type": "input",
+            "block_id": "title_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "title",
+                "initial_value": Slot("title")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Title"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "requestor_input",
+            "element": {
+                "type": "users_select",
+                "action_id": "requestor",
+                "initial_user": Slot("requestor")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Requestor"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "amount_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "amount",
+                "initial_value": Slot("amount")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Requested Amount"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "total_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "total",
+                "initial_value": Slot("total")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Report Total"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "date_input",
+            "element": {
+                "type": "datepicker",
+                "action_id": "date",
+                "initial_date": Slot("date")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Report Date"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "employee_input",
+            "element": {
+                "type": "users_select",
+                "action_id": "employee",
+                "initial_user": Slot("employee")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Employee Name"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "file_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "file_url",
+                "initial_value": Slot("file_url")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "File URL"
+            },
+            "optional": True
+        },
+        {
+            "type": "input",
+            "block_id": "custom_file_name_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "custom_file_name",
+                "initial_value": Slot("custom_file_name")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Custom File Name"
+            },
+            "optional": True
+        },
+        {
+            "type": "input",
+            "block_id": "image_url_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "image_url",
+                "initial_value": Slot("image_url")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Image URL"
+            },
+            "optional": True
+        }
+    ],
+    "submit": {
+        "type": "plain_text",
+        "text": "Update"
+    }
+})
+
+edit_time_off_modal_template = ViewTemplate({
+    "type": "modal",
+    "callback_id": Slot("callback_id"),
+    "private_metadata": Slot("private_metadata"),
+    "title": {
+        "type": "plain_text",
+        "text": "Edit Time Off"
+    },
+    "blocks": [
+        {
+            "type": "input",
+            "block_id": "employee_input",
+            "element": {
+                "type": "users_select",
+                "action_id": "employee",
+                "initial_user": Slot("employee")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Employee Name"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "request_date_input",
+            "element": {
+                "type": "datepicker",
+                "action_id": "request_date",
+                "initial_date": Slot("request_date")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Requested On"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "start_date_input",
+            "element": {
+                "type": "datepicker",
+                "action_id": "start_date",
+                "initial_date": Slot("start_date")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Start Date"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "end_date_input",
+            "element": {
+                "type": "datepicker",
+                "action_id": "end_date",
+                "initial_date": Slot("end_date")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "End Date"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "request_type_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "request_type",
+                "initial_value": Slot("request_type")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Request Type"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "notes_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "notes",
+                "initial_value": Slot("notes")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Notes"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "image_url_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "image_url",
+                "initial_value": Slot("image_url")
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Image URL"
+            },
+            "optional": True
+        }
+    ],
+    "submit": {
+        "type": "plain_text",
+        "text": "Update"
+    }
+})
+
+# Modal for editing an existing approval. The version being edited rides
+# along in private_metadata, so saving fails if someone changed it meanwhile.
+def edit_approval_modal(approval):
+    if approval["type"] == "expense":
+        return edit_expense_modal_template.render(
+            callback_id=f"edit_approval_modal-{approval['id']}",
+            private_metadata=str(approval.get("version", 1)),
+            title=approval["title"] or "",
+            requestor=approval["requestor"],
+            amount=display_amount(approval, "amount"),
+            total=display_amount(approval, "total"),
+            date=approval["date"],
+            employee=approval["employee"],
+            file_url=approval["file_url"] or "",
+            custom_file_name=approval["custom_file_name"] or "",
+            image_url=approval["image_url"] or ""
+        )
+    elif approval["type"] == "time_off":
+        return edit_time_off_modal_template.render(
+            callback_id=f"edit_approval_modal-{approval['id']}",
+            private_metadata=str(approval.get("version", 1)),
+            employee=approval["employee"],
+            request_date=approval["request_date"],
+            start_date=approval["time_requested"].split(" to ")[0],
+            end_date=approval["time_requested"].split(" to ")[1],
+            request_type=approval["request_type"],
+            notes=approval["notes"],
+            image_url=approval["image_url"] or ""
+        )
+    return None
+
+# Modal for choosing the type of a new approval
+new_approval_modal_template = ViewTemplate({
+    "type": "modal",
+    "callback_id": "new_approval_modal",
+    "title": {
+        "type": "plain_text",
+        "text": "New Approval"
+    },
+    "blocks": [
+        {
+            "type": "input",
+            "block_id": "type_input",
+            "element": {
+                "type": "static_select",
+                "action_id": "type",
+                "placeholder": {
+                    "type": "plain_text",
+                    "text": "Select approval type"
+                },
+                "options": [
+                    {
+                        "text": {
+                            "type": "plain_text",
+                            "text": "Expense"
+                        },
+                        "value": "expense"
+                    },
+                    {
+                        "text": {
+                            "type": "plain_text",
+                            "text": "Time Off"
+                        },
+                        "value": "time_off"
+                    }
+                ]
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Approval Type"
+            }
+        }
+    ],
+    "submit": {
+        "type": "plain_text",
+        "text": "Next"
+    }
+})
+
+def new_approval_modal():
+    return new_approval_modal_template.render()
+
+# Modal for creating a new expense approval
+new_expense_approval_modal_template = ViewTemplate({
+    "type": "modal",
+    "callback_id": "new_expense_approval_modal",
+    "title": {
+        "type": "plain_text",
+        "text": "New Expense Approval"
+    },
+    "blocks": [
+        {
+            "type": "input",
+            "block_id": "title_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "title"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Title"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "requestor_input",
+            "element": {
+                "type": "users_select",
+                "action_id": "requestor"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Requestor"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "amount_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "amount",
+                "placeholder": {
+                    "type": "plain_text",
+                    "text": "1,250.00 or USD $1,250.00"
+                }
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Requested Amount"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "total_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "total",
+                "placeholder": {
+                    "type": "plain_text",
+                    "text": "1,250.00 or USD $1,250.00"
+                }
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Report Total"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "date_input",
+            "element": {
+                "type": "datepicker",
+                "action_id": "date"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Report Date"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "employee_input",
+            "element": {
+                "type": "users_select",
+                "action_id": "employee"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Employee Name"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "file_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "file_url"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "File URL"
+            },
+            "optional": True
+        },
+        {
+            "type": "input",
+            "block_id": "custom_file_name_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "custom_file_name"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Custom File Name"
+            },
+            "optional": True
+        },
+        {
+            "type": "input",
+            "block_id": "image_url_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "image_url"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Image URL"
+            },
+            "optional": True
+        }
+    ],
+    "submit": {
+        "type": "plain_text",
+        "text": "Create"
+    }
+})
+
+def new_expense_approval_modal():
+    return new_expense_approval_modal_template.render()
+
+# Modal for creating a new time off approval
+new_time_off_approval_modal_template = ViewTemplate({
+    "type": "modal",
+    "callback_id": "new_time_off_approval_modal",
+    "title": {
+        "type": "plain_text",
+        "text": "New Time Off Approval"
+    },
+    "blocks": [
+        {
+            "type": "input",
+            "block_id": "employee_input",
+            "element": {
+                "type": "users_select",
+                "action_id": "employee"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Employee Name"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "request_date_input",
+            "element": {
+                "type": "datepicker",
+                "action_id": "request_date"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Requested On"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "start_date_input",
+            "element": {
+                "type": "datepicker",
+                "action_id": "start_date"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Start Date"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "end_date_input",
+            "element": {
+                "type": "datepicker",
+                "action_id": "end_date"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "End Date"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "request_type_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "request_type"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Request Type"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "notes_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "notes"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Notes"
+            }
+        },
+        {
+            "type": "input",
+            "block_id": "image_url_input",
+            "element": {
+                "type": "plain_text_input",
+                "action_id": "image_url"
+            },
+            "label": {
+                "type": "plain_text",
+                "text": "Image URL"
+            },
+            "optional": True
+        }
+    ],
+    "submit": {
+        "type": "plain_text",
+        "text": "Create"
+    }
+})
+
+def new_time_off_approval_modal():
+    return new_time_off_approval_modal_template.render()